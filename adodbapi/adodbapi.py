@@ -33,6 +33,11 @@ import sys
 import copy
 import decimal
 import os
+import re
+import itertools
+import array
+import threading
+from collections import deque
 
 import process_connect_string
 import ado_consts as adc
@@ -74,6 +79,15 @@ try:
     from collections import Mapping
 except ImportError:  # Python 2.5
     Mapping = dict   # this will handle the most common case
+try:
+    from collections import OrderedDict
+except ImportError:  # Python 2.5 and 2.6
+    OrderedDict = None  # the prepared command cache will be disabled
+try:
+    _sizeof = sys.getsizeof
+except AttributeError:  # Python 2.5
+    def _sizeof(value):
+        return 64  # a rough guess, only used to choose the size of read-ahead chunks
 
 # --- define objects to smooth out Python3000 <-> Python 2.x differences
 unicodeType = unicode  #this line will be altered by 2to3.py to '= str'
@@ -95,6 +109,9 @@ def make_COM_connecter():
         raise api.InterfaceError ("Windows COM Error: Dispatch('ADODB.Connection') failed.")
     return c
 
+def make_COM_command():
+    return Dispatch('ADODB.Command')
+
 def connect(*args, **kwargs): # --> a db-api connection object
     """Connect to a database.
 
@@ -104,12 +121,18 @@ def connect(*args, **kwargs): # --> a db-api connection object
          * http://www.asp101.com/articles/john/connstring/default.asp
     :timeout -- A command timeout value, in seconds (default 30 seconds)
     """
-    co = Connection() # make an empty connection object
-
     kwargs = process_connect_string.process(args, kwargs, True)
+    return _open_connection(kwargs)
+
+def _open_connection(kwargs, connection_maker=make_COM_connecter, command_maker=make_COM_command):
+    """Open a new connection using keyword arguments already processed by process_connect_string
+
+    connection_maker and command_maker are passed on to Connection.connect().
+    """
+    co = Connection() # make an empty connection object
 
     try:  # connect to the database, using the connection information in kwargs
-       co.connect(kwargs)
+       co.connect(kwargs, connection_maker, command_maker)
        return co
     except (Exception), e:
         message =  'Error opening connection to "%s"' % co.connection_string
@@ -132,9 +155,28 @@ defaultIsolationLevel = adc.adXactReadCommitted
 #  Set defaultCursorLocation on module level before creating the connection.
 # It may be one of the "adUse..." consts.
 defaultCursorLocation = adc.adUseClient   # changed from adUseServer as of v 2.3.0
+#
+#  Set defaultCommandCacheSize on module level before creating the connection.
+# It is the number of prepared ADODB.Command objects each connection will keep for re-use
+# by cursor.execute(). Zero disables the cache.
+# It may also be set using the "command_cache_size" keyword argument of connect().
+defaultCommandCacheSize = 20 if OrderedDict else 0
 
 dateconverter = api.pythonDateTimeConverter() # default
 
+# the largest number of parameters executemany() will put into one multi-row INSERT (SQL Server allows 2100)
+maxBatchParameters = 2000
+# the largest number of rows executemany() will put into one multi-row INSERT (the most a
+# SQL Server VALUES row constructor allows)
+maxBatchRows = 1000
+
+# the number of result set layouts each connection remembers for build_column_info()
+columnInfoCacheSize = 100
+_ddl_re = re.compile(r'^\s*(CREATE|ALTER|DROP)\b', re.IGNORECASE)
+
+# iterating over a cursor reads rows ahead in chunks which grow to about this many bytes
+iterationBufferSize = 1024 * 1024
+
 def format_parameters(ADOparameters, show_value=False):
     """Format a collection of ADO Command Parameters.
 
@@ -214,6 +256,203 @@ def _configure_parameter(p, value, adotype, settings_known):
         p.Value = value
 
 
+_insert_values_re = re.compile(r'^(\s*INSERT\s+INTO\s.+?\sVALUES\s*)(\(.*\))\s*;?\s*$',
+                               re.IGNORECASE | re.DOTALL)
+
+def _split_insert_values(operation):
+    """Split a simple "INSERT INTO ... VALUES (...)" statement into its prefix and its row of values.
+
+    Returns None if the operation is anything else.
+    """
+    m = _insert_values_re.match(operation)
+    if m is None:
+        return None
+    prefix, row = m.groups()
+    depth = 0
+    quote = None
+    for i, c in enumerate(row):  # the row must be exactly one parenthesized list
+        if quote:
+            if c == quote:
+                quote = None
+        elif c in '\'"':
+            quote = c
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+            if depth == 0 and i != len(row) - 1:
+                return None
+    if depth or quote:
+        return None
+    return prefix, row
+
+# array.array typecodes for the columns returned by cursor.fetch_columns()
+_arrayTypecodes = {adc.adTinyInt: 'b', adc.adUnsignedTinyInt: 'B',
+                   adc.adSmallInt: 'h', adc.adUnsignedSmallInt: 'H',
+                   adc.adInteger: 'i', adc.adUnsignedInt: 'I',
+                   adc.adSingle: 'd', adc.adDouble: 'd'}
+try:
+    array.array('q')
+    _arrayTypecodes[adc.adBigInt] = 'q'
+    _arrayTypecodes[adc.adUnsignedBigInt] = 'Q'
+except ValueError:  # Python 2 has no long long arrays
+    pass
+
+def _make_column(values, adotype, numpy_arrays=False):
+    """Store one column of fetched values in an array.array, or a numpy array if numpy_arrays is true.
+
+    Columns containing NULLs, or of types without a typecode, are returned as a list (or a numpy object array).
+    """
+    typecode = _arrayTypecodes.get(adotype)
+    if typecode is not None and None in values:  # numpy would quietly make NULLs nan in a float array
+        typecode = None
+    if numpy_arrays:
+        import numpy
+        if typecode is not None:
+            try:
+                return numpy.array(values, dtype=typecode)
+            except (TypeError, ValueError, OverflowError):  # an unusual conversion function
+                pass
+        column = numpy.empty(len(values), dtype=object)
+        column[:] = values
+        return column
+    if typecode is not None:
+        try:
+            return array.array(typecode, values)
+        except (TypeError, OverflowError):
+            pass
+    return list(values)
+
+# the tokens of an operation holding double quoted identifiers, for _scan_to_qmark()
+_qmark_token_re = re.compile(r"""
+      ('[^']*'?|"[^"]*"?)   # 1: a quoted literal or identifier, passed through unchanged
+    | (::)                  # 2: a PostgreSQL type cast, not a parameter
+    | :(\w+)                # 3: a 'named' parameter
+    | %\((\w+)\)s           # 4: a 'pyformat' parameter
+    | (%s)                  # 5: a 'format' parameter
+    | (%\()                 # 6: a malformed 'pyformat' parameter
+    """, re.VERBOSE | re.UNICODE)
+_name_re = re.compile(r'\w+', re.UNICODE)
+
+def _to_qmark(operation, style):
+    """Convert an operation in 'named' or 'format' (including 'pyformat') style to ADO's '?' markers.
+
+    Quoted literals and identifiers are passed through unchanged, as are PostgreSQL '::' type casts.
+    Returns a tuple of (qmark operation, tuple of parameter names).
+    """
+    if style == 'named':
+        marker, replace = ':', _named_to_qmark
+    else:
+        marker, replace = '%', _format_to_qmark
+    if marker not in operation:
+        return operation, ()
+    names = []
+    if '"' in operation:  # look for both kinds of quotes as they come
+        return _scan_to_qmark(operation, style, names), tuple(names)
+    if "'" not in operation:
+        return replace(operation, names), tuple(names)
+    # str methods do most of the work: split off the quoted literals, and convert the SQL between them
+    chunks = operation.split("'")
+    chunks[::2] = [replace(chunk, names) if marker in chunk else chunk for chunk in chunks[::2]]
+    return "'".join(chunks), tuple(names)
+
+# convert the markers in SQL holding no quotes, appending the names of the parameters to names
+def _format_to_qmark(sql, names):
+    if '%(' not in sql:
+        return '?'.join(sql.split('%s'))
+    parts = sql.split('%(')
+    first = parts[0]
+    pieces = ['?'.join(first.split('%s')) if '%s' in first else first]
+    for part in parts[1:]:
+        name, found, rest = part.partition(')s')
+        if not (found and (name.isalnum() or name.replace('_', 'a').isalnum())):
+            raise api.ProgrammingError('Pyformat SQL has incorrect format near "%%(%s"' % part)
+        names.append(name)
+        if '%s' in rest:
+            rest = '?'.join(rest.split('%s'))
+        pieces.append(rest)
+    return '?'.join(pieces)  # a marker between each piece
+
+def _named_to_qmark(sql, names):
+    parts = sql.split(':')
+    pieces = [parts[0]]
+    i = 1
+    while i < len(parts):
+        part = parts[i]
+        if not part and i + 1 < len(parts):  # '::' - a type cast
+            pieces.append('::')
+            pieces.append(parts[i + 1])
+            i += 2
+            continue
+        m = _name_re.match(part)
+        if m is None:
+            pieces.append(':')
+            pieces.append(part)
+        else:
+            names.append(m.group())
+            pieces.append('?')
+            pieces.append(part[m.end():])
+        i += 1
+    return ''.join(pieces)
+
+# convert an operation one token at a time, skipping both kinds of quotes (slower, but rarely needed)
+def _scan_to_qmark(operation, style, names):
+    wanted = (3,) if style == 'named' else (4, 5, 6)
+    pieces = []
+    position = 0
+    for m in _qmark_token_re.finditer(operation):
+        kind = m.lastindex
+        if kind not in wanted:
+            continue
+        if kind == 6:
+            raise api.ProgrammingError('Pyformat SQL has incorrect format near "%s"' % operation[m.start():])
+        pieces.append(operation[position:m.start()])
+        pieces.append('?')
+        if kind != 5:
+            names.append(m.group(kind))
+        position = m.end()
+    pieces.append(operation[position:])
+    return ''.join(pieces)
+
+# the number of converted operations remembered by _qmark_operation()
+qmarkCacheSize = 500
+_qmark_cache = OrderedDict() if OrderedDict else {}
+_qmark_cache_lock = threading.Lock()  # cursors in several threads share the cache
+
+def _qmark_operation(operation, style):
+    "_to_qmark(), remembering the most recently used conversions"
+    key = (operation, style)
+    _qmark_cache_lock.acquire()
+    try:
+        result = _qmark_cache.pop(key, None)
+    finally:
+        _qmark_cache_lock.release()
+    if result is None:
+        result = _to_qmark(operation, style)  # (outside the lock, as it may raise ProgrammingError)
+    if qmarkCacheSize <= 0:
+        return result
+    _qmark_cache_lock.acquire()
+    try:
+        if key not in _qmark_cache and len(_qmark_cache) >= qmarkCacheSize:
+            if OrderedDict:
+                _qmark_cache.popitem(last=False)  # forget the least recently used
+            else:
+                _qmark_cache.clear()
+        _qmark_cache[key] = result  # (re-)insert as the most recently used
+    finally:
+        _qmark_cache_lock.release()
+    return result
+
+class _ColumnInfo(object):
+    "the layout of a result set, which the connection remembers to describe repeated queries without COM calls"
+    def __init__(self, names, types):
+        self.names = names  # of the columns
+        self.types = types  # the ADO type of each column
+        self.columnNames = {}  # {lowercase name : number,...}
+        for i, name in enumerate(names):
+            self.columnNames[name.lower()] = i
+        self.description = None  # cursor.description, once it has been asked for
+
 def counter():
     i = 0
     while True:
@@ -244,6 +483,7 @@ class Connection(object):
 
     def __init__(self): # now define the instance attributes
         self.connector = None
+        self.command_maker = make_COM_command
         self.paramstyle = api.paramstyle
         self.supportsTransactions = False
         self.connection_string = ''
@@ -254,8 +494,20 @@ class Connection(object):
         self.errorhandler = None # use the standard error handler for this instance
         self.transaction_level = 0 # 0 == Not in a transaction, at the top level
         self._autocommit = False
-
-    def connect(self, kwargs, connection_maker=make_COM_connecter):
+        self.executemany_batch_size = 0 # rows per multi-row INSERT in executemany(), 0 == one row at a time
+        self.command_cache_size = defaultCommandCacheSize
+        self._command_cache = OrderedDict() if OrderedDict else {}
+        # {(command text, command type, parameter types, recordset number) : _ColumnInfo,...}, least recently used first
+        self._column_info_cache = OrderedDict() if OrderedDict else {}
+        self.instrumentation = None # an adodbapi.instrumentation.Instrumentation to measure the statements run
+
+    def connect(self, kwargs, connection_maker=make_COM_connecter, command_maker=make_COM_command):
+        """Open the ADO connection.
+
+        connection_maker and command_maker are functions returning new ADODB.Connection
+        and ADODB.Command objects. They may be replaced, for example by the in-memory
+        provider in adodbapi/test/fakeado.py, to run adodbapi without Windows.
+        """
         if verbose > 9:
             print('kwargs=', repr(kwargs))
         try:
@@ -266,6 +518,7 @@ class Connection(object):
         self.kwargs = kwargs
         if verbose:
             print '%s attempting: "%s"' % (version, self.connection_string)
+        self.command_maker = command_maker
         self.connector = connection_maker()
         self.connector.ConnectionTimeout = self.timeout
         self.connector.ConnectionString = self.connection_string
@@ -289,6 +542,10 @@ class Connection(object):
             self._autocommit = True
         if 'paramstyle' in kwargs:
             self.paramstyle = kwargs['paramstyle'] # let setattr do the error checking
+        if 'executemany_batch_size' in kwargs:
+            self.executemany_batch_size = int(kwargs['executemany_batch_size'])
+        if 'command_cache_size' in kwargs and OrderedDict:
+            self.command_cache_size = int(kwargs['command_cache_size'])
         self.messages=[]
         if verbose:
             print 'adodbapi New connection at %X' % id(self)
@@ -321,6 +578,8 @@ class Connection(object):
         """
         for crsr in self.cursors.values()[:]:  # copy the list, then close each one
             crsr.close(dont_tell_me=True)
+        self._command_cache.clear()
+        self._column_info_cache.clear()
         self.messages=[]
         try:
             self._closeAdoConnection()                      #v2.1 Rose
@@ -397,6 +656,8 @@ class Connection(object):
                         'paramstyle="%s" not in:%s' % (value, repr(api.accepted_paramstyles)))
         elif name == 'variantConversions':
             value = copy.copy(value)  # make a new copy -- no changes in the default, please
+        elif name == 'instrumentation':  # cached commands may be wrapped to count COM calls, or not
+            self._forget_commands()
         object.__setattr__(self, name, value)
 
     def __getattr__(self, item):
@@ -429,6 +690,50 @@ class Connection(object):
         except:
             pass
 
+    def _forget_commands(self):
+        "empty the prepared command cache, and stop the cursors returning their commands to it"
+        self._command_cache.clear()
+        for crsr in self.cursors.values():
+            crsr._cmd_cache_key = None
+
+    def _get_cached_command(self, key):
+        "remove and return a (command, parameters) entry from the prepared command cache, or None"
+        return self._command_cache.pop(key, None)
+
+    def _put_cached_command(self, key, entry):
+        "return a (command, parameters) entry to the prepared command cache, dropping the least recently used"
+        if self.connector is None or self.command_cache_size <= 0:
+            return
+        self._command_cache.pop(key, None)  # re-insert as the most recently used
+        self._command_cache[key] = entry
+        while len(self._command_cache) > self.command_cache_size:
+            self._command_cache.popitem(last=False)
+
+    def _get_column_info(self, key):
+        "return the remembered column information of a result set, or None"
+        info = self._column_info_cache.pop(key, None)
+        if info is not None:
+            self._column_info_cache[key] = info  # re-insert as the most recently used
+        return info
+
+    def _put_column_info(self, key, info):
+        "remember the column information of a result set, dropping the least recently used"
+        self._column_info_cache[key] = info
+        while len(self._column_info_cache) > columnInfoCacheSize:
+            if OrderedDict:
+                self._column_info_cache.popitem(last=False)
+            else:
+                self._column_info_cache.clear()
+
+    def clear_column_info_cache(self):
+        """Extension: forget the column layouts of earlier result sets.
+
+        Call this if a table has been changed by some other connection while this one is open:
+        a remembered layout is only checked against the number of columns of a new result set.
+        (Changes made using CREATE, ALTER or DROP statements on this connection are detected automatically.)
+        """
+        self._column_info_cache.clear()
+
     def printADOerrors(self):
         j=self.connector.Errors.Count
         if j:
@@ -511,9 +816,15 @@ class Cursor(object):
 ##   allows the programmer to override the connection's default paramstyle
 ## errorhandler...
 ##   allows the programmer to override the connection's default error handler
+## executemany_batch_size...
+##   number of parameter rows executemany() sends in each multi-row INSERT statement
     
     def __init__(self,connection):
         self.command = None
+        self.commandText = None  # the operation after paramstyle conversion
+        self.cmd = None  # the ADO Command object
+        self._cmd_cache_key = None  # key of self.cmd in the connection's prepared command cache
+        self._cmd_parameters = None  # the ADO Parameter objects of a cached self.cmd
         self._ado_prepared = False
         self.messages=[]
         self.connection = connection
@@ -523,17 +834,50 @@ class Cursor(object):
         self.rs = None  # the ADO recordset for this cursor
         self.converters = []  # conversion function for each column
         self.columnNames = {} # names of columns {lowercase name : number,...}
+        self.columnTypes = [] # ADO type of each column
+        self._column_info = None # the _ColumnInfo of the result set
+        self._column_info_key = None # identifies the command for the connection's column info cache
+        self._recordset_number = 0
+        self._statement_record = None # measurements of the current statement, when instrumented
+        self._readahead = deque() # rows read ahead by __iter__ but not yet returned
         self.numberOfColumns = 0
         self._description = None
         self.rowcount = -1
         self.errorhandler = connection.errorhandler
         self.arraysize = 1
+        self.executemany_batch_size = connection.executemany_batch_size
         connection._i_am_here(self)
         if verbose:
             print '%s New cursor at %X on conn %X' % (version, id(self), id(self.connection))
 
     def __iter__(self):                   # [2.1 Zamarev]
-        return iter(self.fetchone, None)  # [2.1 Zamarev]
+        """Iterate over the rows of the current recordset.
+
+        Rows are read ahead in chunks. The first chunk is arraysize rows, then chunks double in size
+        until they hold about iterationBufferSize bytes, so memory use stays flat for large results.
+        Rows read ahead but not yet returned are kept for the fetch methods, so iteration can be
+        mixed with fetchone() and fetchmany().
+        """
+        self.messages = []
+        buffered = self._readahead
+        size = max(self.arraysize, 1)
+        max_size = None
+        finished = False
+        while True:
+            if not buffered:
+                if finished:
+                    return
+                rows = self._fetch(size)
+                if not rows:
+                    return
+                count = len(rows)
+                if max_size is None:  # estimate the size of a row from the first one
+                    row_bytes = sum([_sizeof(value) for value in rows[0]]) or 1
+                    max_size = max(size, iterationBufferSize // row_bytes)
+                buffered.extend([rows[i] for i in range(count)])
+                finished = count < size  # GetRows found the end of the recordset
+                size = min(size * 2, max_size)
+            yield buffered.popleft()
 
     def prepare(self, operation):
         self.command = operation
@@ -563,7 +907,10 @@ class Cursor(object):
     def build_column_info(self, recordset):
         self.converters = []  # convertion function for each column
         self.columnNames = {} # names of columns {lowercase name : number,...}
+        self.columnTypes = [] # ADO type of each column
+        self._column_info = None
         self._description = None
+        self._readahead.clear()
 
         # if EOF and BOF are true at the same time, there are no records in the recordset
         if (recordset is None) or (recordset.State == adc.adStateClosed):
@@ -572,34 +919,67 @@ class Cursor(object):
             return
         self.rs = recordset        #v2.1.1 bkline
         self.recordset_format = api.RS_ARRAY if api.onIronPython else api.RS_WIN_32
-        self.numberOfColumns = recordset.Fields.Count
+        fields = recordset.Fields
+        self.numberOfColumns = fields.Count
+
+        # a repeated query usually has the same columns as last time, so rather than read the Fields
+        # through COM again, only check the number of columns (see clear_column_info_cache)
+        key = None
+        info = None
+        if self._column_info_key is not None:
+            key = self._column_info_key + (self._recordset_number,)
+            info = self.connection._get_column_info(key)
+            if info is not None and len(info.types) != self.numberOfColumns:
+                info = None
+        if info is None:
+            names = []
+            types = []
+            for i in range(self.numberOfColumns):
+                f = getIndexedValue(fields, i)
+                names.append(f.Name)
+                types.append(f.Type)
+            info = _ColumnInfo(names, types)
+            if key is not None:
+                self.connection._put_column_info(key, info)
+        self._column_info = info
+        self.columnNames.update(info.columnNames)
+        self.columnTypes.extend(info.types)
+
         try:
             varCon = self.connection.variantConversions
         except AttributeError:
             varCon = api.variantConversions
-        for i in range(self.numberOfColumns):
-            f = getIndexedValue(self.rs.Fields, i)
+        for adotype in info.types:
             try:
-                self.converters.append(varCon[f.Type])  # conversion function for this column
+                self.converters.append(varCon[adotype])  # conversion function for this column
             except KeyError:
-                self._raiseCursorError(api.InternalError, 'Data column of Unknown ADO type=%s' % f.Type)
-            self.columnNames[f.Name.lower()] = i  # columnNames lookup
+                self._raiseCursorError(api.InternalError, 'Data column of Unknown ADO type=%s' % adotype)
+
+    def _conversion_needed(self):
+        "False if every column's conversion function would return the value unchanged"
+        if api.onIronPython:  # IronPython NULLs must always be converted
+            return True
+        for converter in self.converters:
+            if converter is not api.identity:
+                return True
+        return False
 
     def _makeDescriptionFromRS(self):
         # Abort if closed or no recordset.
         if self.rs is None:
             self._description = None
             return
-        desc = []
-        for i in range(self.numberOfColumns):
-            f = getIndexedValue(self.rs.Fields, i)
-            if self.rs.EOF or self.rs.BOF:
-                display_size=None
-            else:
-                display_size=f.ActualSize #TODO: Is this the correct defintion according to the DB API 2 Spec ?
-            null_ok= bool(f.Attributes & adc.adFldMayBeNull)          #v2.1 Cole
-            desc.append((f.Name, f.Type, display_size, f.DefinedSize, f.Precision, f.NumericScale, null_ok))
-        self._description = desc
+        info = self._column_info
+        if info.description is None:  # the first time this layout is described: the rest is read through COM
+            desc = []
+            for i, (name, type_code) in enumerate(zip(info.names, info.types)):
+                f = getIndexedValue(self.rs.Fields, i)
+                null_ok= bool(f.Attributes & adc.adFldMayBeNull)          #v2.1 Cole
+                # display_size is None, which the DB API allows: the size of a value in the current row
+                # (Field.ActualSize, which older versions returned) says little about the column.
+                desc.append((name, type_code, None, f.DefinedSize, f.Precision, f.NumericScale, null_ok))
+            info.description = desc
+        self._description = list(info.description)
 
     def get_description(self):
         if not self._description:
@@ -631,7 +1011,9 @@ class Cursor(object):
             return
         if not dont_tell_me:
             self.connection._i_am_closing(self) # take me off the connection's cursors list
+            self._release_command()
         self.messages = []
+        self._readahead.clear()
         if self.rs and self.rs.State != adc.adStateClosed: # rs exists and is open      #v2.1 Rose
             self.rs.Close()                                                         #v2.1 Rose
             self.rs = None # let go of the recordset so ADO will let it be disposed #v2.1 Rose
@@ -645,7 +1027,15 @@ class Cursor(object):
         except:
             pass
 
-    def _new_command(self, command_text, command_type=adc.adCmdText):
+    def _release_command(self):
+        "give a cacheable ADO Command back to the connection for re-use by the next execute()"
+        if self._cmd_cache_key is not None and self.connection is not None:
+            self.connection._put_cached_command(self._cmd_cache_key, (self.cmd, self._cmd_parameters))
+        self._cmd_cache_key = None
+        self._cmd_parameters = None
+
+    def _new_command(self, command_text, command_type=adc.adCmdText, prepared=False):
+        self._release_command()
         self.cmd = None
         self.messages = []
 
@@ -653,12 +1043,14 @@ class Cursor(object):
             self._raiseCursorError(api.InterfaceError, None)
             return
         try:
-            self.cmd = Dispatch("ADODB.Command")
+            self.cmd = self.connection.command_maker()
+            if self.connection.instrumentation:
+                self.cmd = self.connection.instrumentation.wrap(self.cmd)
             self.cmd.ActiveConnection = self.connection.connector
             self.cmd.CommandTimeout = self.connection.timeout
             self.cmd.CommandType = command_type
             self.cmd.CommandText = command_text
-            self.cmd.Prepared = bool(self._ado_prepared)
+            self.cmd.Prepared = prepared or bool(self._ado_prepared)
         except:
             self._raiseCursorError(api.DatabaseError,
                                    'Error creating new ADODB.Command object for "%s"' % repr(command_text))
@@ -666,10 +1058,14 @@ class Cursor(object):
     def _execute_command(self):
         # Stored procedures may have an integer return value
         self.return_value = None
+        self._recordset_number = 0
         recordset = None
         count = -1 #default value
         if verbose:
             print 'Executing command="%s"'%self.command
+        instr = self.connection.instrumentation
+        if instr:
+            token = instr.start()
         try:
             # ----- the actual SQL is executed here ---
             if api.onIronPython:
@@ -679,6 +1075,8 @@ class Cursor(object):
             else: #pywin32
                 recordset, count = self.cmd.Execute()
             # ----- ------------------------------- ---
+            if instr:
+                instr.finish(self, 'execute', token)
         except (Exception), e:
             _message = ""
             if hasattr(e, 'args'): _message += str(e.args)+"\n"
@@ -736,8 +1134,15 @@ class Cursor(object):
         cursor if the sproc defines an integer return value.
         """
         self._parameter_names = []
+        self._column_info_key = (procname, adc.adCmdStoredProc, self._parameter_signature(parameters))
+        instr = self.connection.instrumentation
+        if instr:
+            instr.begin_statement(self, procname)
+            token = instr.start()
         self._new_command(procname, command_type=adc.adCmdStoredProc)
         self._buildADOparameterList(parameters, sproc=True)
+        if instr:
+            instr.finish(self, 'bind', token)
         if verbose > 2:
             print 'Calling Stored Proc with Params=', format_parameters(self.cmd.Parameters, True)
         self._execute_command()
@@ -745,9 +1150,11 @@ class Cursor(object):
 
     def _reformat_operation(self, operation, parameters):
         if self.paramstyle in ('format', 'pyformat'): # convert %s to ?
-            operation, self._parameter_names = api.changeFormatToQmark(operation)
+            operation, names = _qmark_operation(operation, 'format')
+            self._parameter_names = list(names)
         elif self.paramstyle == 'named' or (self.paramstyle == 'dynamic' and isinstance(parameters, Mapping)):
-            operation, self._parameter_names = api.changeNamedToQmark(operation) # convert :name to ?
+            operation, names = _qmark_operation(operation, 'named') # convert :name to ?
+            self._parameter_names = list(names)
         return operation
 
     def _buildADOparameterList(self, parameters, sproc=False):
@@ -829,6 +1236,52 @@ class Cursor(object):
                 if self._ado_prepared == 'setup':
                     self._ado_prepared = True  # parameters will be known next loop
 
+    def _parameter_signature(self, parameters):
+        "Return a tuple of the ADO type of each parameter value, in the order they are bound."
+        if not parameters:
+            return ()
+        if self._parameter_names:
+            values = [parameters[name] for name in self._parameter_names]
+        else:
+            values = parameters
+        return tuple([api.pyTypeToADOType(value) for value in values])
+
+    def _command_cache_key(self, parameters):
+        """Return the key of a prepared ADO Command for the current operation and these parameters.
+
+        The key is made of the converted SQL text, the parameter names and the ADO type of each value.
+        None is returned if the command should not be cached.
+        """
+        if not parameters or self.connection is None or self.connection.command_cache_size <= 0:
+            return None
+        signature = self._parameter_signature(parameters)
+        for adotype in signature:
+            if adotype in api.adoBinaryTypes:  # AppendChunk() would add to the old value
+                return None
+        return (self.commandText, tuple(self._parameter_names), signature)
+
+    def _rebindADOparameterList(self, parameters, signature):
+        """Bind new values to the existing Parameters of a cached ADO Command.
+
+        The Command was built for the same operation and parameter types, so only the values are set.
+        """
+        self.parameters = parameters
+        if self._cmd_parameters is None:
+            self._cmd_parameters = [getIndexedValue(self.cmd.Parameters, i) for i in range(len(signature))]
+        if self._parameter_names:
+            values = [parameters[name] for name in self._parameter_names]
+        else:
+            values = parameters
+        for p, value, adotype in zip(self._cmd_parameters, values, signature):
+            try:
+                _configure_parameter(p, value, adotype, False)
+            except (Exception), e:
+                _message = u'Error Converting Parameter %s: %s, %s <- %s\n' % \
+                               (p.Name, adc.ado_type_name(p.Type), p.Value, repr(value))
+                self._raiseCursorError(api.DataError, _message+'->'+repr(e.args))
+        if self._ado_prepared == 'setup':
+            self._ado_prepared = True
+
     def execute(self, operation, parameters=None):
         """Prepare and execute a database operation (query or command).
 
@@ -856,16 +1309,51 @@ class Cursor(object):
             The term "bound" refers to the process of binding an input value to a database execution buffer.
             In practical terms, this means that the input value is directly used as a value in the operation.
             The client should not be required to "escape" the value so that it can be used -- the value
-            should be equal to the actual database value. """
-        if self.command is not operation or self._ado_prepared == 'setup':
+            should be equal to the actual database value.
+
+            Extension: the ADO Command built for an operation is kept in a per-connection cache
+            (see defaultCommandCacheSize) keyed by the converted SQL and the types of the parameters.
+            When the same SQL is executed again with parameters of the same types, the prepared
+            Command is re-used and only the parameter values are bound. """
+        instr = self.connection.instrumentation
+        if instr:
+            instr.begin_statement(self, operation)
+            token = instr.start()
+        if self.command is not operation or self._ado_prepared == 'setup' or self.commandText is None:
             if self.command is not operation:
                 self._ado_prepared = False
             self.command = operation
             self._parameter_names = []
+            self.commandText = operation
             if parameters and self.paramstyle != 'qmark':
-                operation = self._reformat_operation(operation, parameters)  # if 'named' will set self._parameter_names
-        self._new_command(operation)
-        self._buildADOparameterList(parameters)
+                self.commandText = self._reformat_operation(operation, parameters)  # if 'named' will set self._parameter_names
+        if instr:
+            instr.finish(self, 'reformat', token)
+        self._execute_command_text(parameters)
+
+    def _execute_command_text(self, parameters):
+        "execute self.commandText, using a prepared command from the cache when possible"
+        if _ddl_re.match(self.commandText):  # the columns of a table may be changing
+            self.connection.clear_column_info_cache()
+        self._column_info_key = (self.commandText, adc.adCmdText, self._parameter_signature(parameters))
+        key = self._command_cache_key(parameters)
+        self._release_command()
+        instr = self.connection.instrumentation
+        if instr:
+            token = instr.start()
+        entry = None
+        if key is not None:
+            entry = self.connection._get_cached_command(key)
+        if entry is None:
+            self._new_command(self.commandText, prepared=key is not None)
+            self._buildADOparameterList(parameters)
+        else:  # re-use a prepared command
+            self.messages = []
+            self.cmd, self._cmd_parameters = entry
+            self._rebindADOparameterList(parameters, key[2])
+        self._cmd_cache_key = key
+        if instr:
+            instr.finish(self, 'bind', token)
         if verbose > 3:
             print 'Params=', format_parameters(self.cmd.Parameters, True)
         self._execute_command()
@@ -875,11 +1363,23 @@ class Cursor(object):
         and then execute it against all parameter sequences or mappings found in the sequence seq_of_parameters.
 
             Return values are not defined.
+
+            Extension: if the cursor's executemany_batch_size is greater than one, and the operation is
+            a simple "INSERT INTO ... VALUES (...)" statement, the parameters are sent in groups
+            of that many rows as multi-row "INSERT INTO ... VALUES (...), (...)" statements.
+            The data provider must support that syntax. The rowcount is the total for all groups.
         """
         self.messages = list()                
         total_recordcount = 0
 
         self.prepare(operation)
+        seq_of_parameters = iter(seq_of_parameters)
+        if self.executemany_batch_size > 1:
+            for first in seq_of_parameters:  # peek at the first row
+                seq_of_parameters = itertools.chain([first], seq_of_parameters)
+                if self._executemany_batched(operation, first, seq_of_parameters):
+                    return
+                break
         for params in seq_of_parameters:
             self.execute(self.command, params)
             if self.rowcount == -1:
@@ -888,17 +1388,64 @@ class Cursor(object):
                 total_recordcount += self.rowcount
         self.rowcount = total_recordcount
 
-    def _fetch(self, limit=None):
-        """Fetch rows from the current recordset.
+    def _executemany_batched(self, operation, first, seq_of_parameters):
+        """Execute operation for groups of parameter rows as multi-row INSERT statements.
+
+        Returns False, without executing anything, if the operation cannot be batched.
+        """
+        self._parameter_names = []
+        commandText = operation
+        if self.paramstyle != 'qmark':
+            commandText = self._reformat_operation(operation, first)  # if 'named' will set self._parameter_names
+        parts = _split_insert_values(commandText)
+        if parts is None:
+            return False
+        prefix, row = parts
+        names = self._parameter_names
+        self._parameter_names = []  # the batched parameters are a plain sequence
+        columns = len(names) or len(first) or 1
+        batch_size = max(1, min(self.executemany_batch_size, maxBatchRows, maxBatchParameters // columns))
+
+        total_recordcount = 0
+        try:
+            while True:
+                batch = list(itertools.islice(seq_of_parameters, batch_size))
+                if not batch:
+                    break
+                values = []
+                for params in batch:
+                    if names:
+                        values.extend([params[name] for name in names])
+                    else:
+                        values.extend(params)
+                self.commandText = prefix + ', '.join([row] * len(batch))
+                if self.connection.instrumentation:
+                    self.connection.instrumentation.begin_statement(self, self.commandText)
+                self._execute_command_text(values)
+                if self.rowcount == -1:
+                    total_recordcount = -1
+                if total_recordcount != -1:
+                    total_recordcount += self.rowcount
+        finally:
+            self.commandText = None  # the next execute() must convert its operation again
+        self.rowcount = total_recordcount
+        return True
+
+    def _get_rows(self, limit=None):
+        """Get raw rows from the current recordset.
 
         limit -- Number of rows to fetch, or None (default) to fetch all rows.
+        Returns a tuple of (ado_results, number of rows), or None if the fetch failed.
         """
         if self.connection is None or self.rs is None:
             self._raiseCursorError(api.FetchFailedError, 'fetch() on closed connection or empty query set')
-            return
+            return None
 
         if self.rs.State == adc.adStateClosed or self.rs.BOF or self.rs.EOF:
-            return list()
+            return None, 0
+        instr = self.connection.instrumentation
+        if instr:
+            token = instr.start()
         if limit: # limit number of rows retrieved
             ado_results = self.rs.GetRows(limit)
         else:    # get all rows
@@ -907,9 +1454,103 @@ class Cursor(object):
             length = len(ado_results) // self.numberOfColumns # length of first dimension
         else: #pywin32
             length = len(ado_results[0]) #result of GetRows is tuples in a tuple
+        if instr:
+            instr.finish(self, 'getrows', token, rows=length)
+        return ado_results, length
+
+    def _fetch(self, limit=None):
+        """Fetch rows from the current recordset.
+
+        limit -- Number of rows to fetch, or None (default) to fetch all rows.
+        """
+        got = self._get_rows(limit)
+        if got is None:
+            return
+        ado_results, length = got
+        if not length:
+            return list()
         fetchObject = api.SQLrows(ado_results, length, self) # new object to hold the results of the fetch
+        if not self._conversion_needed():
+            fetchObject.converters = NotImplemented  # rows will return the raw values
+        elif self.connection.instrumentation:
+            fetchObject.converters = self.connection.instrumentation.timed_converters(self, self.converters)
+        return fetchObject
+
+    def _take_readahead(self, limit=None):
+        """Return the rows read ahead by __iter__, then rows from the recordset, as _fetch() does.
+
+        limit -- Number of rows to return, or None (default) to return all rows.
+        """
+        buffered = self._readahead
+        if limit is None or limit >= len(buffered):
+            rows = list(buffered)
+            buffered.clear()
+        else:
+            rows = [buffered.popleft() for i in range(limit)]
+        if limit is None or len(rows) < limit:
+            more = self._fetch(limit and limit - len(rows))
+            if more:
+                rows.extend([more[i] for i in range(len(more))])
+        # one SQLrows of the (already converted) values, so that rows[i, 'column'] works as usual
+        columns = tuple([tuple([row[j] for row in rows]) for j in range(self.numberOfColumns)])
+        fetchObject = api.SQLrows(columns, len(rows), self)
+        fetchObject.recordset_format = api.RS_WIN_32  # one tuple for each column, like pywin32's GetRows
+        fetchObject.converters = NotImplemented
         return fetchObject
 
+    def _fetch_columns(self, limit, numpy_arrays):
+        """Fetch rows from the current recordset as a list of columns."""
+        if self._readahead:  # rows read ahead by __iter__ come first
+            rows = self._take_readahead(limit)
+            return [_make_column(list(values), self.columnTypes[i], numpy_arrays)
+                    for i, values in enumerate(rows.ado_results)]
+        got = self._get_rows(limit)
+        if got is None:
+            return
+        ado_results, length = got
+        if not length:
+            return list()
+        instr = self.connection.instrumentation
+        columns = []
+        for i in range(self.numberOfColumns):
+            if self.recordset_format == api.RS_ARRAY:
+                values = [ado_results[i, j] for j in range(length)]
+            else: #pywin32 -- GetRows already returns one tuple for each column
+                values = ado_results[i]
+            converter = self.converters[i]
+            if converter is not api.identity or api.onIronPython:
+                if instr:
+                    token = instr.start()
+                values = [api.convert_to_python(v, converter) for v in values]
+                if instr:
+                    instr.finish(self, 'convert', token)
+            columns.append(_make_column(values, self.columnTypes[i], numpy_arrays))
+        return columns
+
+    def fetch_columns(self, size=None, numpy_arrays=False):
+        """Extension: Fetch the next set of rows of a query result, returning a list of columns.
+
+        The number of rows is given by size, or the cursor's arraysize.
+        Each column of integer or floating point values is returned as an array.array
+        (or a numpy array, if numpy_arrays is true). Columns of other types, or containing NULL values,
+        are returned as lists. An empty list is returned when no more rows are available.
+
+        No row objects are built, so this is much faster than fetchmany() for large numeric results.
+        Use cursor.columnNames to find the position of a column.
+        """
+        self.messages = []
+        if size is None:
+            size = self.arraysize
+        return self._fetch_columns(size, numpy_arrays)
+
+    def fetchall_columnar(self, numpy_arrays=False):
+        """Extension: Fetch all (remaining) rows of a query result, returning a list of columns.
+
+        See fetch_columns() for the types of the columns.
+        """
+        self.messages = []
+        return self._fetch_columns(None, numpy_arrays)
+
     def fetchone(self):
         """ Fetch the next row of a query result set, returning a single sequence,
             or None when no more data is available.
@@ -918,6 +1559,8 @@ class Cursor(object):
             did not produce any result set or no call was issued yet. 
         """
         self.messages = []                
+        if self._readahead:  # a row read ahead by __iter__
+            return self._readahead.popleft()
         result = self._fetch(1)
         if result: # return record (not list of records)
             return result[0]
@@ -943,6 +1586,8 @@ class Cursor(object):
         self.messages=[]                
         if size is None:
             size = self.arraysize
+        if self._readahead:
+            return self._take_readahead(size)
         return self._fetch(size)
 
     def fetchall(self):
@@ -954,6 +1599,8 @@ class Cursor(object):
             did not produce any result set or no call was issued yet. 
         """
         self.messages=[]                
+        if self._readahead:
+            return self._take_readahead()
         return self._fetch()
 
     def nextset(self):
@@ -985,6 +1632,7 @@ class Cursor(object):
             recordset = rsTuple[0]
         if recordset is None:
             return None
+        self._recordset_number += 1
         self.build_column_info(recordset)
         return True
 
@@ -0,0 +1,259 @@
+"""asynchronous.py - run adodbapi connections on their own worker threads
+
+ADO is synchronous, and its objects belong to the COM apartment of the thread which created them,
+so a slow query blocks the thread which runs it. An AsyncConnection opens its connection on a
+dedicated worker thread (with COM initialized) and runs every operation of that connection,
+and of its cursors, there. Each method returns at once with a future of its result.
+
+Called from a coroutine running in an asyncio event loop, the futures can be awaited:
+    conn = await adodbapi.asynchronous.connect(connection_string)
+    crsr = conn.cursor()
+    await crsr.execute('SELECT name FROM products WHERE price > ?', [10])
+    rows = await crsr.fetchmany(1000)   # results come back one fetch at a time
+    await conn.close()
+
+Called from ordinary threads, they are concurrent.futures style futures:
+    crsr.execute(sql).result()
+
+Many AsyncConnections can work at the same time, each on its own thread.
+Operations on one connection are always run one after another, in the order they were called.
+"""
+import threading
+try:
+    import Queue as queue
+except ImportError:  # Python 3
+    import queue
+try:
+    from concurrent.futures import Future
+except ImportError:  # Python 2 without the "futures" package
+    Future = None
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+import apibase as api
+import adodbapi as adodbapi_module
+
+class _SimpleFuture(object):
+    "the parts of concurrent.futures.Future used here, for Pythons without it"
+    def __init__(self):
+        self._done = threading.Event()
+        self._result = None
+        self._exception = None
+
+    def set_running_or_notify_cancel(self):
+        return True
+
+    def set_result(self, result):
+        self._result = result
+        self._done.set()
+
+    def set_exception(self, exception):
+        self._exception = exception
+        self._done.set()
+
+    def done(self):
+        return self._done.isSet()
+
+    def result(self, timeout=None):
+        self._done.wait(timeout)
+        if not self._done.isSet():
+            raise api.OperationalError('Timed out waiting for the database operation')
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+def _awaitable(future):
+    "let a coroutine await the future if we are called from a running asyncio event loop"
+    if asyncio is not None and Future is not None:
+        get_running_loop = getattr(asyncio, 'get_running_loop', None) or getattr(asyncio, '_get_running_loop', None)
+        try:
+            loop = get_running_loop() if get_running_loop else None
+        except RuntimeError:  # no running loop
+            loop = None
+        if loop is not None:
+            return asyncio.wrap_future(future, loop=loop)
+    return future
+
+class _Worker(threading.Thread):
+    "a thread, with COM initialized, which runs the requests given to it one at a time"
+    def __init__(self):
+        threading.Thread.__init__(self, name='adodbapi worker')
+        self.daemon = True
+        self.requests = queue.Queue()
+        self.stopped = False
+        self.lock = threading.Lock()  # so that no request is queued after the one which stops the thread
+
+    def submit(self, function, *args, **kwargs):
+        future = Future() if Future is not None else _SimpleFuture()
+        with self.lock:
+            if self.stopped:
+                future.set_exception(api.InterfaceError('The connection is closed'))
+            else:
+                self.requests.put((future, function, args, kwargs))
+        return future
+
+    def stop(self):
+        "end the thread after the requests already submitted"
+        with self.lock:
+            if not self.stopped:
+                self.stopped = True
+                self.requests.put(None)
+
+    def run(self):
+        if adodbapi_module.onWin32:
+            adodbapi_module.pythoncom.CoInitialize()
+        try:
+            while True:
+                request = self.requests.get()
+                if request is None:
+                    break
+                future, function, args, kwargs = request
+                if not future.set_running_or_notify_cancel():  # cancelled while waiting
+                    continue
+                try:
+                    result = function(*args, **kwargs)
+                except Exception, e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+        finally:
+            if adodbapi_module.onWin32:
+                adodbapi_module.pythoncom.CoUninitialize()
+
+class AsyncConnection(object):
+    """An adodbapi connection living on its own worker thread.
+
+    Takes the same arguments as adodbapi.connect(), and optionally a connect_function keyword
+    argument to use in place of adodbapi.connect(). The connection is opened in the background;
+    the opened attribute is a future which is done when it is open. If opening fails, the
+    worker thread stops, and the operations requested of the connection fail.
+    """
+    def __init__(self, *args, **kwargs):
+        self._connection = None
+        connect_function = kwargs.pop('connect_function', adodbapi_module.connect)
+        self._worker = _Worker()
+        self._worker.start()
+        self.opened = self._worker.submit(self._open, connect_function, args, kwargs)
+
+    def _open(self, connect_function, args, kwargs):
+        try:
+            self._connection = connect_function(*args, **kwargs)
+        except Exception:
+            self._worker.stop()
+            raise
+        return self
+
+    def _call(self, function, *args, **kwargs):
+        "run function on the worker thread, returning a future of its result"
+        return _awaitable(self._worker.submit(function, *args, **kwargs))
+
+    def _connection_method(self, name, *args):
+        if self._connection is None:
+            raise api.InterfaceError('The connection is not open')
+        return getattr(self._connection, name)(*args)
+
+    def cursor(self):
+        "Return a new AsyncCursor. (The ADO cursor is made on the worker thread.)"
+        return AsyncCursor(self)
+
+    def commit(self):
+        return self._call(self._connection_method, 'commit')
+
+    def rollback(self):
+        return self._call(self._connection_method, 'rollback')
+
+    def get_table_names(self):
+        return self._call(self._connection_method, 'get_table_names')
+
+    def run(self, function, *args, **kwargs):
+        """Run function(connection, *args, **kwargs) on the worker thread.
+
+        Use it for anything not provided by the other methods.
+        """
+        def call_with_connection():
+            return function(self._connection, *args, **kwargs)
+        return self._call(call_with_connection)
+
+    def close(self):
+        "Close the connection and stop the worker thread once the operations already requested are done."
+        def close_connection():
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+        future = self._call(close_connection)
+        self._worker.stop()
+        return future
+
+class AsyncCursor(object):
+    """A cursor of an AsyncConnection.
+
+    The methods match those of an adodbapi Cursor, but return futures.
+    rowcount and description are read on the worker thread after each execute, so they
+    are up to date as soon as the future of the execute is done.
+    """
+    def __init__(self, connection):
+        self.connection = connection
+        self.arraysize = 1
+        self.rowcount = -1
+        self.description = None
+        self._cursor = None
+        self._made = connection._worker.submit(self._make_cursor)
+
+    def _make_cursor(self):
+        self._cursor = self.connection._connection_method('cursor')
+
+    def _run(self, name, *args):
+        "run a method of the adodbapi cursor, then note its results"
+        crsr = self._cursor
+        if crsr is None:
+            made, self._made = self._made, None
+            if made is not None:  # the first call reports why the cursor was not made
+                made.result()
+            raise api.InterfaceError('The cursor is closed')
+        crsr.arraysize = self.arraysize
+        result = getattr(crsr, name)(*args)
+        self.rowcount = crsr.rowcount
+        self.description = crsr.description
+        return result
+
+    def execute(self, operation, parameters=None):
+        return self.connection._call(self._run, 'execute', operation, parameters)
+
+    def executemany(self, operation, seq_of_parameters):
+        return self.connection._call(self._run, 'executemany', operation, list(seq_of_parameters))
+
+    def callproc(self, procname, parameters=None):
+        return self.connection._call(self._run, 'callproc', procname, parameters)
+
+    def fetchone(self):
+        return self.connection._call(self._run, 'fetchone')
+
+    def fetchmany(self, size=None):
+        return self.connection._call(self._run, 'fetchmany', size)
+
+    def fetchall(self):
+        return self.connection._call(self._run, 'fetchall')
+
+    def fetch_columns(self, size=None):
+        return self.connection._call(self._run, 'fetch_columns', size)
+
+    def nextset(self):
+        return self.connection._call(self._run, 'nextset')
+
+    def close(self):
+        def close_cursor():
+            self._made = None
+            if self._cursor is not None:
+                self._cursor.close()
+                self._cursor = None
+        return self.connection._call(close_cursor)
+
+def connect(*args, **kwargs):
+    """Open an AsyncConnection.
+
+    Takes the same arguments as adodbapi.connect(). Returns a future of the open AsyncConnection.
+    """
+    conn = AsyncConnection(*args, **kwargs)
+    return _awaitable(conn.opened)
@@ -0,0 +1,192 @@
+"""instrumentation.py - measure where adodbapi spends its time
+
+An Instrumentation object, set as a connection's instrumentation attribute, records for every
+statement executed by the connection's cursors the time spent in each phase:
+    reformat -- converting the operation's paramstyle to '?' markers
+    bind -- creating the ADO Command and binding the parameters
+    execute -- the ADO Command.Execute() call
+    getrows -- Recordset.GetRows() calls made by the fetch methods
+    convert -- converting fetched values to Python objects
+and the number of calls and property accesses made through COM on the Command, its Parameters,
+and the Recordset. Timings are also collected in histograms for each phase.
+
+call using:
+    import adodbapi.instrumentation
+    conn.instrumentation = adodbapi.instrumentation.Instrumentation()
+    ... run some statements ...
+    print(conn.instrumentation.report())
+    for statement in conn.instrumentation.statements: ...
+
+Instrumentation slows adodbapi down, since every COM access is counted.
+Set conn.instrumentation to None to stop. Setting it empties the connection's prepared command cache,
+so no command made with the old setting is re-used.
+"""
+import sys
+import time
+import math
+import types
+from collections import deque
+
+try:
+    _timer = time.perf_counter
+except AttributeError:  # Python 2
+    if sys.platform == 'win32':
+        _timer = time.clock
+    else:
+        _timer = time.time
+
+PHASES = ('reformat', 'bind', 'execute', 'getrows', 'convert')
+
+# objects of types defined in these modules are values, not COM objects
+_value_modules = ('__builtin__', 'builtins', 'exceptions', 'datetime', 'decimal', 'pywintypes')
+
+class StatementRecord(object):
+    """The measurements of one statement.
+
+    times is a dictionary {phase : seconds}. com_calls counts COM accesses and rows the rows fetched.
+    """
+    def __init__(self, operation):
+        self.operation = operation
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.com_calls = 0
+        self.rows = 0
+
+    def total_time(self):
+        return sum(self.times.values())
+
+    def __repr__(self):
+        phases = ', '.join(['%s=%.6f' % (phase, self.times[phase]) for phase in PHASES])
+        return '<StatementRecord %r: %s, com_calls=%d, rows=%d>' % (self.operation, phases, self.com_calls, self.rows)
+
+class Instrumentation(object):
+    """Collects the measurements of the statements run by the cursors of a connection.
+
+    keep -- the number of most recent StatementRecords kept in the statements attribute.
+    """
+    def __init__(self, keep=1000):
+        self.statements = deque(maxlen=keep)
+        self.com_calls = 0  # total count of COM accesses
+        self.totals = dict.fromkeys(PHASES, 0.0)  # {phase : total seconds}
+        self.counts = dict.fromkeys(PHASES, 0)  # {phase : number of measurements}
+        self._histograms = dict([(phase, {}) for phase in PHASES])  # {phase : {power of two : count}}
+
+    # --- called by adodbapi ---
+    def begin_statement(self, cursor, operation):
+        record = StatementRecord(operation)
+        self.statements.append(record)
+        cursor._statement_record = record
+
+    def start(self):
+        "return a token for finish()"
+        return _timer(), self.com_calls
+
+    def finish(self, cursor, phase, token, rows=0):
+        "add the time (and COM calls) since start() returned token to phase of the cursor's statement"
+        started, com_calls = token
+        self.add(cursor, phase, _timer() - started, self.com_calls - com_calls, rows)
+
+    def add(self, cursor, phase, seconds, com_calls=0, rows=0):
+        self._add(cursor._statement_record, phase, seconds, com_calls, rows)
+
+    def _add(self, record, phase, seconds, com_calls=0, rows=0):
+        if record is not None:
+            record.times[phase] += seconds
+            record.com_calls += com_calls
+            record.rows += rows
+        self.totals[phase] += seconds
+        self.counts[phase] += 1
+        bucket = math.frexp(seconds)[1] if seconds > 0 else None
+        histogram = self._histograms[phase]
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+
+    def timed_converters(self, cursor, converters):
+        """return converters which add their time to the 'convert' phase of the cursor's statement
+
+        Each conversion is one measurement. The rows are converted as they are read, perhaps after the
+        cursor has moved on, so the time goes to the statement which fetched them.
+        """
+        record = cursor._statement_record
+        add = self._add
+        def timed(converter):
+            def convert(value):
+                started = _timer()
+                try:
+                    return converter(value)
+                finally:
+                    add(record, 'convert', _timer() - started)
+            return convert
+        return [timed(converter) for converter in converters]
+
+    def wrap(self, com_object):
+        "return a proxy for an ADO object which counts the COM accesses made through it"
+        return _CountingProxy(com_object, self)
+
+    def _wrap_result(self, value):
+        if isinstance(value, tuple):  # e.g. (recordset, rows affected), or the columns of rows from GetRows
+            return tuple([self._wrap_item(item) for item in value])
+        return self._wrap_item(value)
+
+    def _wrap_item(self, value):
+        "wrap a COM object, returning any other value (including a tuple of fetched data) unchanged"
+        if value is None or type(value).__module__ in _value_modules:
+            return value
+        return _CountingProxy(value, self)
+
+    # --- reports ---
+    def histogram(self, phase):
+        """Return the distribution of the times measured for phase.
+
+        The result is a sorted list of (upper bound in seconds, count), with bounds in powers of two.
+        """
+        result = []
+        for bucket, count in self._histograms[phase].items():
+            result.append((0.0 if bucket is None else math.ldexp(1.0, bucket), count))
+        result.sort()
+        return result
+
+    def report(self):
+        "Return a printable summary of the measurements."
+        lines = ['%-10s %8s %12s %12s' % ('phase', 'count', 'total s', 'mean s')]
+        for phase in PHASES:
+            count = self.counts[phase]
+            mean = self.totals[phase] / count if count else 0.0
+            lines.append('%-10s %8d %12.6f %12.6f' % (phase, count, self.totals[phase], mean))
+            for bound, n in self.histogram(phase):
+                lines.append('%23s <= %.6f s: %d' % ('', bound, n))
+        lines.append('COM calls: %d in %d statements' % (self.com_calls, len(self.statements)))
+        return '\n'.join(lines)
+
+def _unwrap(value):
+    if isinstance(value, _CountingProxy):
+        return value.__dict__['_target']
+    return value
+
+class _CountingProxy(object):
+    "stands in for a COM object, counting each property access and method call"
+    def __init__(self, target, instrumentation):
+        self.__dict__['_target'] = target
+        self.__dict__['_instrumentation'] = instrumentation
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if isinstance(value, types.MethodType):  # finding a method is not a COM call, but calling it is
+            return _CountingProxy(value, self._instrumentation)
+        self._instrumentation.com_calls += 1
+        return self._instrumentation._wrap_result(value)
+
+    def __setattr__(self, name, value):
+        self._instrumentation.com_calls += 1
+        setattr(self._target, name, _unwrap(value))
+
+    def __call__(self, *args):
+        self._instrumentation.com_calls += 1
+        return self._instrumentation._wrap_result(self._target(*[_unwrap(arg) for arg in args]))
+
+    def __iter__(self):
+        for item in self._target:
+            self._instrumentation.com_calls += 1
+            yield self._instrumentation._wrap_result(item)
+
+    def __nonzero__(self):
+        return bool(self._target)
+    __bool__ = __nonzero__
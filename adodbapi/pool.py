@@ -0,0 +1,266 @@
+"""pool.py - re-use open adodbapi connections
+
+Opening an ADO connection is expensive: COM must be initialized, an ADODB.Connection created,
+and the data provider must log in to the database. A ConnectionPool keeps closed connections
+open for re-use by the next connect() with the same connection arguments.
+
+call using:
+    import adodbapi.pool
+    conn = adodbapi.pool.connect(connection_string, timeout=30, pool_max_size=5)
+    ... use it like any other adodbapi connection ...
+    conn.close()  # puts the ADO connection back into the pool
+
+ADO connection objects live in the COM apartment of the thread which created them,
+so each thread has its own set of pooled connections. A connection is only ever handed
+out to, and closed by, the thread which opened it.
+
+When a connection is given back, its cursors are closed, any uncommitted work is rolled back,
+and the settings in _session_attributes (autocommit, paramstyle, timeout...) are put back
+as they were when it was opened, so one user's changes are not seen by the next.
+Before an idle connection is handed out again, a short statement is run to check
+that the server can still be reached (see ConnectionPool's health_check).
+"""
+import copy
+import time
+import threading
+try:
+    from thread import get_ident
+except ImportError:  # Python 3
+    from threading import get_ident
+
+import process_connect_string
+import ado_consts as adc
+import apibase as api
+import adodbapi
+
+# default settings for new pools, may be overridden by pool_... keyword arguments to connect()
+defaultMinSize = 0  # idle connections which are not closed by the idle timeout (per thread)
+defaultMaxSize = 10  # open connections, in use and idle (per thread)
+defaultIdleTimeout = 300  # seconds an idle connection is kept before it is closed
+
+# the statement run by the default health check, by DBMS Name, and for any other database
+pingStatements = {'Oracle': 'SELECT 1 FROM DUAL', 'DB2': 'SELECT 1 FROM SYSIBM.SYSDUMMY1'}
+defaultPingStatement = 'SELECT 1'
+
+# the connection settings a user may change, which are restored when the connection is given back
+_session_attributes = ('autocommit', 'paramstyle', 'timeout', 'variantConversions', 'instrumentation',
+                       'executemany_batch_size', 'command_cache_size', 'errorhandler')
+_missing = object()  # marks a setting the connection did not have (variantConversions is set only on demand)
+
+def _healthy(connection):
+    """the default health check for a connection being taken from the pool
+
+    Runs a short statement, so that a connection which the server (or the network) has dropped is
+    found, and not just one which ADO knows to be closed.
+    """
+    connector = connection.connector
+    if connector is None or connector.State != adc.adStateOpen:
+        return False
+    cmd = connection.command_maker()
+    cmd.ActiveConnection = connector
+    cmd.CommandTimeout = connection.timeout
+    cmd.CommandType = adc.adCmdText
+    cmd.CommandText = pingStatements.get((connection.dbms_name or '').split('/')[0], defaultPingStatement)
+    recordset = cmd.Execute()[0]  # raises an error if the server cannot be reached
+    if recordset is not None and recordset.State == adc.adStateOpen:
+        recordset.Close()
+    return True
+
+def _session_state(connection):
+    "return the settings of a newly opened connection, for _restore_session()"
+    state = {}
+    for name in _session_attributes:
+        value = getattr(connection, name, _missing)
+        if name == 'variantConversions' and value is not _missing:
+            value = copy.copy(value)  # the connection's own copy may be changed in place
+        state[name] = value
+    return state
+
+def _restore_session(connection, state):
+    "put back the settings which have been changed since _session_state(connection) returned state"
+    for name in _session_attributes:
+        value = state[name]
+        if getattr(connection, name, _missing) != value:
+            if value is _missing:
+                del connection.__dict__[name]
+            else:
+                setattr(connection, name, value)
+
+class ConnectionPool(object):
+    """A pool of open connections, all made using the same connection arguments.
+
+    min_size -- idle connections which are not closed by the idle timeout (per thread)
+    max_size -- the largest number of connections open at once (per thread)
+    idle_timeout -- seconds an idle connection may wait for re-use before it is closed
+    health_check -- a function(connection) which returns False (or raises an error) if a pooled
+        connection is no longer usable. The default runs a short statement on the server.
+    connection_maker, command_maker -- as for adodbapi.Connection.connect()
+    """
+    def __init__(self, kwargs, min_size=None, max_size=None, idle_timeout=None, health_check=None,
+                 connection_maker=None, command_maker=None):
+        self.kwargs = kwargs  # connection arguments, as processed by process_connect_string
+        self.min_size = defaultMinSize if min_size is None else min_size
+        self.max_size = defaultMaxSize if max_size is None else max_size
+        self.idle_timeout = defaultIdleTimeout if idle_timeout is None else idle_timeout
+        self.health_check = _healthy if health_check is None else health_check
+        self.connection_maker = connection_maker or adodbapi.make_COM_connecter
+        self.command_maker = command_maker or adodbapi.make_COM_command
+        self._local = threading.local()
+
+    def _thread_state(self):
+        "the idle list and open connection count for the calling thread"
+        local = self._local
+        try:
+            return local.idle, local.counter
+        except AttributeError:
+            local.idle = []  # [(connection, time it was released, settings when opened),...] most recently used last
+            local.counter = [0]  # number of open connections
+            return local.idle, local.counter
+
+    def _discard(self, connection, counter):
+        counter[0] -= 1
+        try:
+            connection.close()
+        except:
+            pass
+
+    def _evict(self, idle, counter):
+        "close connections which have been idle too long"
+        too_old = time.time() - self.idle_timeout
+        while len(idle) > self.min_size and idle[0][1] < too_old:
+            connection, released, state = idle.pop(0)
+            self._discard(connection, counter)
+
+    def connect(self):
+        "Return a PooledConnection, re-using an idle connection when possible."
+        idle, counter = self._thread_state()
+        self._evict(idle, counter)
+        while idle:
+            connection, released, state = idle.pop()
+            try:
+                ok = self.health_check(connection)
+            except Exception:
+                ok = False
+            if ok:
+                return PooledConnection(self, connection, state)
+            self._discard(connection, counter)
+        if counter[0] >= self.max_size:
+            raise api.OperationalError('Connection pool exhausted: %d connections are open in this thread'
+                                       % counter[0])
+        connection = adodbapi._open_connection(dict(self.kwargs), self.connection_maker, self.command_maker)
+        counter[0] += 1
+        return PooledConnection(self, connection, _session_state(connection))
+
+    def _release(self, connection, state):
+        "take back a connection from a PooledConnection which was closed in the thread which opened it"
+        idle, counter = self._thread_state()
+        try:
+            for crsr in list(connection.cursors.values()):
+                crsr.close()
+            _restore_session(connection, state)
+            if connection.supportsTransactions and not connection.autocommit:
+                if connection.transaction_level:
+                    connection._rollback()  # do not let the next user see uncommitted work
+                else:  # autocommit was turned on, and off again by _restore_session()
+                    connection.transaction_level = connection.connector.BeginTrans()
+            connection.messages = []
+        except Exception:
+            self._discard(connection, counter)
+            return
+        idle.append((connection, time.time(), state))
+        self._evict(idle, counter)
+
+    def _forget(self, connection, counter):
+        "a PooledConnection was dropped by another thread -- the Connection will close itself"
+        counter[0] -= 1
+
+    def close(self):
+        "Close the idle connections of the calling thread."
+        idle, counter = self._thread_state()
+        while idle:
+            connection, released, state = idle.pop()
+            self._discard(connection, counter)
+
+class PooledConnection(object):
+    """A connection borrowed from a ConnectionPool.
+
+    It works like the adodbapi Connection it wraps, except that close() returns the connection to the pool.
+    """
+    def __init__(self, pool, connection, state):
+        self.__dict__['_pool'] = pool
+        self.__dict__['_connection'] = connection
+        self.__dict__['_state'] = state  # the connection's settings when it was opened
+        self.__dict__['_thread_id'] = get_ident()
+        self.__dict__['_counter'] = pool._thread_state()[1]
+
+    def __getattr__(self, item):
+        connection = self.__dict__['_connection']
+        if connection is None:
+            raise api.InterfaceError('This pooled connection has been closed')
+        return getattr(connection, item)
+
+    def __setattr__(self, name, value):
+        setattr(self._connection, name, value)
+
+    def close(self):
+        "Return the connection to its pool. The connection will be unusable from this point forward."
+        connection = self.__dict__['_connection']
+        if connection is None:
+            return
+        self.__dict__['_connection'] = None
+        if get_ident() == self._thread_id:
+            self._pool._release(connection, self._state)
+        else:
+            self._pool._forget(connection, self._counter)
+
+    def __enter__(self): # Connections are context managers
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._connection.__exit__(exc_type, exc_val, exc_tb)
+
+    def __del__(self):
+        try:
+            self.close()
+        except:
+            pass
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _pool_key(kwargs):
+    "normalize processed connection arguments into a hashable key"
+    items = [(key, repr(value)) for key, value in kwargs.items()]
+    items.sort()
+    return tuple(items)
+
+def get_pool(*args, **kwargs):
+    """Return the ConnectionPool for these connection arguments, creating it on first use.
+
+    Takes the same arguments as adodbapi.connect(), plus the optional pool settings:
+    pool_min_size, pool_max_size, pool_idle_timeout, pool_health_check, pool_connection_maker
+    and pool_command_maker (see ConnectionPool). The settings are only used when the pool is created.
+    """
+    settings = {}
+    for name in ('min_size', 'max_size', 'idle_timeout', 'health_check', 'connection_maker', 'command_maker'):
+        if 'pool_' + name in kwargs:
+            settings[name] = kwargs.pop('pool_' + name)
+    kwargs = process_connect_string.process(args, kwargs, True)
+    key = _pool_key(kwargs)
+    _pools_lock.acquire()
+    try:
+        try:
+            pool = _pools[key]
+        except KeyError:
+            pool = _pools[key] = ConnectionPool(kwargs, **settings)
+    finally:
+        _pools_lock.release()
+    return pool
+
+def connect(*args, **kwargs):
+    """Connect to a database, re-using a pooled connection when one is available.
+
+    Takes the same arguments as adodbapi.connect() and get_pool().
+    Returns a PooledConnection. Call its close() method to give the connection back to the pool.
+    """
+    return get_pool(*args, **kwargs).connect()
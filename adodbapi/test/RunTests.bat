@@ -14,6 +14,10 @@ REM unit test
 call %PYTHON% adodbapitest.py --all %2 %3
 echo .
 echo .
+REM tests using the fake ADO provider
+call %PYTHON% test_adodbapi_fakeado.py
+echo .
+echo .
 REM generic test
 call %PYTHON% test_adodbapi_dbapi20.py %2
 echo .
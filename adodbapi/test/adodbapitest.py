@@ -467,6 +467,15 @@ class CommonDBTests(unittest.TestCase):
             assert row[0]==i
         self.helpRollbackTblTemp()
         
+    def testIteratorChunks(self):
+        crsr=self.getCursor()
+        self.helpCreateAndPopulateTableTemp(crsr)
+        crsr.arraysize = 2  # chunks of 2, 4 and 8 rows
+        crsr.execute("SELECT fldData FROM xx_%s ORDER BY fldData" % config.tmp)
+        values = [row[0] for row in crsr]
+        assert values == list(range(9)), values
+        self.helpRollbackTblTemp()
+
     def testExecuteMany(self):
         crsr=self.getCursor()
         self.helpCreateAndPopulateTableTemp(crsr)
@@ -482,6 +491,36 @@ class CommonDBTests(unittest.TestCase):
         self.helpRollbackTblTemp()
         
 
+    def testExecuteManyBatched(self):
+        if self.getEngine() in ('MSSQL', 'MySQL', 'PostgreSQL'):  # providers with multi-row INSERT syntax
+            crsr=self.getCursor()
+            self.helpCreateAndPopulateTableTemp(crsr)
+            crsr.executemany_batch_size = 4
+            seq_of_values = [ (100 + i,) for i in range(10) ]  # two full groups and a partial one
+            crsr.executemany("INSERT INTO xx_%s (fldData) VALUES (?)" % config.tmp, seq_of_values)
+            if crsr.rowcount != -1:
+                self.assertEquals( crsr.rowcount,10)
+            crsr.execute("SELECT fldData FROM xx_%s WHERE fldData >= 100" % config.tmp)
+            rs=crsr.fetchall()
+            assert len(rs)==10
+            self.helpRollbackTblTemp()
+
+    def testExecuteReusesCachedCommand(self):
+        if not self.remote:
+            crsr=self.getCursor()
+            self.helpCreateAndPopulateTableTemp(crsr)
+            sql = "INSERT INTO xx_%s (fldData) VALUES (?)" % config.tmp
+            crsr.execute(sql, (111,))
+            first_command = crsr.cmd
+            crsr.execute(sql, [222])
+            assert crsr.cmd is first_command, "Command should have come from the cache"
+            crsr.execute(sql, ['333'])  # a parameter of a different type needs a new Command
+            assert crsr.cmd is not first_command
+            crsr.execute("SELECT fldData FROM xx_%s WHERE fldData > ?" % config.tmp, (100,))
+            rs=crsr.fetchall()
+            assert len(rs)==3
+            self.helpRollbackTblTemp()
+
     def testRowCount(self):      
         crsr=self.getCursor()
         self.helpCreateAndPopulateTableTemp(crsr)
@@ -530,6 +569,32 @@ class CommonDBTests(unittest.TestCase):
         assert len(rs)==0 
         self.helpRollbackTblTemp()
 
+    def testFetchColumns(self):
+        crsr=self.getCursor()
+        self.helpCreateAndPopulateTableTemp(crsr)
+        crsr.execute("SELECT fldData FROM xx_%s ORDER BY fldData" % config.tmp)
+        cols=crsr.fetch_columns(4)
+        assert len(cols)==1
+        assert list(cols[0])==[0,1,2,3]
+        cols=crsr.fetchall_columnar()
+        assert list(cols[0])==[4,5,6,7,8]
+        assert crsr.fetchall_columnar()==[]
+        self.helpRollbackTblTemp()
+
+    def testRepeatedQueryColumnInfo(self):
+        crsr=self.getCursor()
+        self.helpCreateAndPopulateTableTemp(crsr)
+        sql = "SELECT fldData FROM xx_%s ORDER BY fldData" % config.tmp
+        crsr.execute(sql)
+        first_description = crsr.description
+        crsr.execute(sql)  # this time the column layout comes from the connection's cache
+        assert crsr.description == first_description
+        assert crsr.columnNames == {'flddata': 0}
+        rec = crsr.fetchone()
+        assert rec.fldData == 0
+        assert rec[0] == 0
+        self.helpRollbackTblTemp()
+
     def testErrorConnect(self):
         conn = self.getConnection()
         kw = {}
@@ -1016,6 +1081,28 @@ class TestADOwithSQLServer(CommonDBTests):
             assert result[0], result[1]  # incorrect or no exception
         self.conn.rollback()
 
+    def testPooledConnection(self):
+        if self.remote:
+            return
+        import adodbapi.pool
+        args, kwargs = config.connStrSQLServer[0], dict(config.connStrSQLServer[1])
+        kwargs['pool_max_size'] = 2
+        conn = adodbapi.pool.connect(*args, **kwargs)
+        ado_connection = conn.connector
+        with conn.cursor() as crsr:
+            crsr.execute("SELECT 1")
+            assert crsr.fetchone()[0] == 1
+        conn.close()
+        self.assertRaises(api.InterfaceError, conn.cursor)
+        conn = adodbapi.pool.connect(*args, **kwargs)
+        assert conn.connector is ado_connection, 'the pooled connection should have been re-used'
+        another = adodbapi.pool.connect(*args, **kwargs)
+        assert another.connector is not ado_connection
+        self.assertRaises(api.OperationalError, adodbapi.pool.connect, *args, **kwargs)
+        another.close()
+        conn.close()
+        adodbapi.pool.get_pool(*args, **kwargs).close()
+
 class TestADOwithAccessDB(CommonDBTests):
     def setUp(self):
         self.conn = config.dbAccessconnect(*config.connStrAccess[0], **config.connStrAccess[1])
@@ -0,0 +1,181 @@
+"""benchmark_adodbapi.py - time the hot paths of adodbapi using the in-memory fake ADO provider
+
+Runs anywhere Python runs, since no database or COM is used: what is measured is the
+time spent in adodbapi itself.
+
+call using:
+    python benchmark_adodbapi.py [--save results.txt] [--compare results.txt] [--tolerance 0.25]
+
+--save writes the best time of each benchmark to a file.
+--compare reads such a file and exits with status 1 if any benchmark is slower
+  than the saved time by more than the tolerance (a fraction, default 0.25).
+"""
+import sys
+import time
+
+import setuptestframework
+
+pth = setuptestframework.find_ado_path()
+if pth not in sys.path:
+    sys.path.insert(1,pth)
+
+import adodbapi
+import adodbapi.apibase as api
+import adodbapi.ado_consts as adc
+import fakeado
+
+ROWS = 100000  # rows in the fetch benchmark result set
+STATEMENTS = 10000  # statements executed by the execute benchmarks
+REPEAT = 3  # each benchmark is run this many times, and the best time is reported
+
+select_sql = 'SELECT id, name, price FROM products'
+select_columns = [('id', adc.adInteger), ('name', adc.adVarWChar), ('price', adc.adDouble)]
+insert_sql = 'INSERT INTO products (id, name, price) VALUES (?, ?, ?)'
+named_sql = 'INSERT INTO products (id, name, price) VALUES (:id, :name, :price)'
+format_sql = 'INSERT INTO products (id, name, price) VALUES (%s, %s, %s)'
+
+def make_connection(**kwargs):
+    provider = fakeado.FakeProvider()
+    provider.add_result(select_sql, select_columns,
+                        [(i, u'product %d' % i, i * 1.5) for i in range(ROWS)])
+    return fakeado.connect(provider, **kwargs)
+
+def parameter_rows():
+    return [(i, u'product %d' % i, i * 1.5) for i in range(STATEMENTS)]
+
+def bench_execute():
+    conn = make_connection()
+    crsr = conn.cursor()
+    for params in parameter_rows():
+        crsr.execute(insert_sql, params)
+
+def bench_execute_uncached():
+    conn = make_connection(command_cache_size=0)
+    crsr = conn.cursor()
+    for params in parameter_rows():
+        crsr.execute(insert_sql, params)
+
+def bench_execute_named():
+    conn = make_connection(paramstyle='named')
+    crsr = conn.cursor()
+    for i, name, price in parameter_rows():
+        crsr.execute(named_sql, {'id': i, 'name': name, 'price': price})
+
+def bench_executemany():
+    conn = make_connection()
+    crsr = conn.cursor()
+    crsr.executemany(insert_sql, parameter_rows())
+    assert crsr.rowcount == STATEMENTS, crsr.rowcount
+
+def bench_executemany_batched():
+    conn = make_connection(executemany_batch_size=500)
+    crsr = conn.cursor()
+    crsr.executemany(insert_sql, parameter_rows())
+    assert crsr.rowcount == STATEMENTS, crsr.rowcount
+
+def bench_fetchall():
+    conn = make_connection()
+    crsr = conn.cursor()
+    crsr.execute(select_sql)
+    total = 0
+    for row in crsr.fetchall():
+        total += row[0]
+    assert total == ROWS * (ROWS - 1) // 2
+
+def bench_iterate():
+    conn = make_connection()
+    crsr = conn.cursor()
+    crsr.arraysize = 100
+    crsr.execute(select_sql)
+    count = 0
+    for row in crsr:
+        count += 1
+    assert count == ROWS
+
+def bench_fetchall_columnar():
+    conn = make_connection()
+    crsr = conn.cursor()
+    crsr.execute(select_sql)
+    columns = crsr.fetchall_columnar()
+    assert sum(columns[0]) == ROWS * (ROWS - 1) // 2
+
+def bench_changeNamedToQmark():
+    for i in range(STATEMENTS):
+        api.changeNamedToQmark(named_sql)
+
+def bench_changeFormatToQmark():
+    for i in range(STATEMENTS):
+        api.changeFormatToQmark(format_sql)
+
+def bench_to_qmark_named():
+    for i in range(STATEMENTS):
+        adodbapi.adodbapi._to_qmark(named_sql, 'named')
+
+def bench_to_qmark_format():
+    for i in range(STATEMENTS):
+        adodbapi.adodbapi._to_qmark(format_sql, 'format')
+
+benchmarks = [(name[6:], function) for name, function in sorted(globals().items())
+              if name.startswith('bench_')]
+
+def run(function):
+    "return the best time of REPEAT runs"
+    best = None
+    for i in range(REPEAT):
+        start = time.time()
+        function()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def read_results(filename):
+    results = {}
+    f = open(filename)
+    try:
+        for line in f:
+            name, seconds = line.split()
+            results[name] = float(seconds)
+    finally:
+        f.close()
+    return results
+
+def main(args):
+    save = compare = None
+    tolerance = 0.25
+    if '--save' in args:
+        save = args[args.index('--save') + 1]
+    if '--compare' in args:
+        compare = read_results(args[args.index('--compare') + 1])
+    if '--tolerance' in args:
+        tolerance = float(args[args.index('--tolerance') + 1])
+
+    print(adodbapi.version)
+    results = []
+    slower = []
+    for name, function in benchmarks:
+        seconds = run(function)
+        results.append((name, seconds))
+        line = '%-28s %9.4f s' % (name, seconds)
+        if compare and name in compare:
+            change = (seconds - compare[name]) / compare[name]
+            line += '  %+6.1f%%' % (change * 100)
+            if change > tolerance:
+                line += '  SLOWER'
+                slower.append(name)
+        print(line)
+
+    if save:
+        f = open(save, 'w')
+        try:
+            for name, seconds in results:
+                f.write('%s %.6f\n' % (name, seconds))
+        finally:
+            f.close()
+    if slower:
+        print('%d benchmark(s) slower than the saved results: %s' % (len(slower), ', '.join(slower)))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,258 @@
+"""fakeado.py - an in-memory imitation of the ADO object model, for running adodbapi without Windows
+
+It implements just enough of ADODB.Connection, ADODB.Command, Parameters and Recordset,
+with the calling conventions of pywin32, for adodbapi to execute statements and fetch results.
+No SQL is interpreted. A FakeProvider decides what each statement returns:
+    * results registered using add_result() are returned for statements with exactly that text,
+    * an INSERT reports one affected row for each "(...)" group after VALUES,
+    * anything else affects no rows.
+
+call using:
+    import fakeado
+    provider = fakeado.FakeProvider()
+    provider.add_result('SELECT a, b FROM t', [('a', adc.adInteger), ('b', adc.adVarWChar)], rows)
+    conn = fakeado.connect(provider)
+    # conn is a real adodbapi Connection
+"""
+import re
+
+import adodbapi.ado_consts as adc
+import adodbapi.adodbapi as adodbapi_module
+
+_values_group_re = re.compile(r'\)\s*,\s*\(')
+
+class FakeError(Exception):
+    "raised where ADO would raise a COM error"
+
+class _Collection(object):
+    "an ADO collection: call it with an index or name, iterate over it, or ask for its Count"
+    def __init__(self, items=None):
+        self._items = list(items or [])
+
+    def __call__(self, index):
+        if isinstance(index, int):
+            return self._items[index]
+        for item in self._items:
+            if item.Name == index:
+                return item
+        raise FakeError('Item cannot be found in the collection: %r' % (index,))
+
+    def __iter__(self):
+        return iter(self._items)
+
+    @property
+    def Count(self):
+        return len(self._items)
+
+class Property(object):
+    def __init__(self, name, value):
+        self.Name = name
+        self.Value = value
+
+class Parameters(_Collection):
+    def Append(self, parameter):
+        self._items.append(parameter)
+
+    def Refresh(self):
+        raise FakeError('The provider cannot derive parameter information')
+
+class Parameter(object):
+    def __init__(self, name='', type=adc.adEmpty, direction=adc.adParamInput, size=0, value=None):
+        self.Name = name
+        self.Type = type
+        self.Direction = direction
+        self.Size = size
+        self.Value = value
+        self.Precision = 0
+        self.NumericScale = 0
+
+    def AppendChunk(self, value):
+        self.Value = value
+
+class Field(object):
+    def __init__(self, recordset, index, name, adotype, defined_size=0):
+        self._recordset = recordset
+        self._index = index
+        self.Name = name
+        self.Type = adotype
+        self.DefinedSize = defined_size
+        self.Precision = 0
+        self.NumericScale = 0
+        self.Attributes = adc.adFldMayBeNull
+
+    @property
+    def Value(self):
+        return self._recordset._rows[self._recordset._position][self._index]
+
+    @property
+    def ActualSize(self):
+        value = self.Value
+        try:
+            return len(value)
+        except TypeError:
+            return self.DefinedSize
+
+class Recordset(object):
+    """An open (or, for statements returning no rows, closed) recordset.
+
+    rows are sequences of column values, in the order of columns, a list of (name, ado type) pairs.
+    """
+    def __init__(self, columns=None, rows=None, following=None):
+        self._rows = list(rows or [])
+        self._position = 0
+        self._following = following or []  # the results of NextRecordset()
+        if columns is None:
+            self.State = adc.adStateClosed
+            self.Fields = _Collection()
+        else:
+            self.State = adc.adStateOpen
+            self.Fields = _Collection([Field(self, i, name, adotype) for i, (name, adotype) in enumerate(columns)])
+
+    def _check_open(self):
+        if self.State != adc.adStateOpen:
+            raise FakeError('Operation is not allowed when the object is closed.')
+
+    @property
+    def RecordCount(self):
+        self._check_open()
+        return len(self._rows)
+
+    @property
+    def EOF(self):
+        self._check_open()
+        return self._position >= len(self._rows)
+
+    @property
+    def BOF(self):
+        self._check_open()
+        return not self._rows
+
+    def MoveNext(self):
+        self._position += 1
+
+    def GetRows(self, count=-1):
+        "return up to count rows, as pywin32 does: one tuple of values for each column"
+        self._check_open()
+        start = self._position
+        stop = len(self._rows) if count < 0 else min(start + count, len(self._rows))
+        self._position = stop
+        return tuple(zip(*self._rows[start:stop])) or tuple(() for f in self.Fields)
+
+    def NextRecordset(self):
+        self.State = adc.adStateClosed
+        if not self._following:
+            return None, 0
+        recordset = self._following[0]
+        recordset._following = self._following[1:]
+        return recordset, -1
+
+    def Close(self):
+        self.State = adc.adStateClosed
+
+class FakeProvider(object):
+    """Decides the results of the statements executed by the fake Connections using it.
+
+    statements counts the statements executed. If record is true, executed is
+    a list of (command text, parameter values) for every statement.
+    """
+    def __init__(self, record=False, dbms_name='FakeADO', supports_transactions=True):
+        self.results = {}
+        self.record = record
+        self.executed = []
+        self.statements = 0
+        self.dbms_name = dbms_name
+        self.supports_transactions = supports_transactions
+
+    def add_result(self, command_text, columns, rows, *more_results):
+        """Return rows whenever command_text is executed.
+
+        columns is a list of (name, ado type) pairs. more_results are further (columns, rows)
+        pairs to be returned by nextset().
+        """
+        self.results[command_text] = [(columns, rows)] + list(more_results)
+
+    def execute(self, command_text, values):
+        "return (recordset, rows affected) for a statement"
+        self.statements += 1
+        if self.record:
+            self.executed.append((command_text, values))
+        try:
+            results = self.results[command_text]
+        except KeyError:
+            if command_text.lstrip()[:6].upper() == 'INSERT':
+                count = len(_values_group_re.findall(command_text)) + 1
+            else:
+                count = 0
+            return Recordset(), count
+        recordsets = [Recordset(columns, rows) for columns, rows in results]
+        first = recordsets[0]
+        first._following = recordsets[1:]
+        return first, -1
+
+class Command(object):
+    "imitates ADODB.Command"
+    def __init__(self):
+        self.ActiveConnection = None
+        self.CommandTimeout = 30
+        self.CommandType = adc.adCmdText
+        self.CommandText = ''
+        self.Prepared = False
+        self.Parameters = Parameters()
+
+    def CreateParameter(self, name='', type=adc.adEmpty, direction=adc.adParamInput, size=0, value=None):
+        return Parameter(name, type, direction, size, value)
+
+    def Execute(self):
+        connection = self.ActiveConnection
+        if connection is None or connection.State != adc.adStateOpen:
+            raise FakeError('The connection cannot be used to perform this operation.')
+        values = [p.Value for p in self.Parameters]
+        return connection.provider.execute(self.CommandText, values)
+
+class Connection(object):
+    "imitates ADODB.Connection"
+    def __init__(self, provider=None):
+        self.provider = provider or FakeProvider()
+        self.ConnectionTimeout = 30
+        self.ConnectionString = ''
+        self.CursorLocation = adc.adUseClient
+        self.IsolationLevel = adc.adXactReadCommitted
+        self.Attributes = 0
+        self.State = adc.adStateClosed
+        self.Errors = _Collection()
+        self._level = 0
+
+    def Open(self):
+        self.State = adc.adStateOpen
+        self.Properties = _Collection([
+            Property('Transaction DDL', 8 if self.provider.supports_transactions else 0),
+            Property('DBMS Name', self.provider.dbms_name),
+            Property('DBMS Version', '1.0')])
+
+    def Close(self):
+        self.State = adc.adStateClosed
+
+    def BeginTrans(self):
+        self._level += 1
+        return self._level
+
+    def CommitTrans(self):
+        self._level -= 1
+
+    def RollbackTrans(self):
+        self._level -= 1
+
+    def OpenSchema(self, schema):
+        names = sorted(set([text.split()[-1] for text in self.provider.results if ' FROM ' in text]))
+        return Recordset([('TABLE_NAME', adc.adVarWChar)], [(name,) for name in names])
+
+def connect(provider=None, **kwargs):
+    """Return an adodbapi Connection which uses a fake ADO Connection.
+
+    kwargs are the usual adodbapi connection keyword arguments.
+    """
+    provider = provider or FakeProvider()
+    kwargs.setdefault('connection_string', 'Provider=FakeADO')
+    conn = adodbapi_module.Connection()
+    conn.connect(kwargs, connection_maker=lambda: Connection(provider), command_maker=Command)
+    return conn
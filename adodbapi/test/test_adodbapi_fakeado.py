@@ -0,0 +1,312 @@
+"""Unit tests of adodbapi which run without Windows, using the in-memory provider in fakeado.py"""
+import unittest
+import array
+import sys
+
+import setuptestframework
+
+pth = setuptestframework.find_ado_path()
+if pth not in sys.path:
+    sys.path.insert(1,pth)
+
+import adodbapi
+import adodbapi.ado_consts as adc
+import fakeado
+
+select_sql = 'SELECT id, name FROM things'
+insert_sql = 'INSERT INTO things (id, name) VALUES (?, ?)'
+
+class TestWithFakeProvider(unittest.TestCase):
+    def setUp(self):
+        self.provider = fakeado.FakeProvider(record=True)
+        self.provider.add_result(select_sql, [('id', adc.adInteger), ('Name', adc.adVarWChar)],
+                                 [(i, 'thing %d' % i) for i in range(10)])
+        self.conn = fakeado.connect(self.provider)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def testFetch(self):
+        crsr = self.conn.cursor()
+        crsr.execute(select_sql)
+        self.assertEqual(crsr.rowcount, 10)
+        self.assertEqual([d[0] for d in crsr.description], ['id', 'Name'])
+        row = crsr.fetchone()
+        self.assertEqual(row[0], 0)
+        self.assertEqual(row.name, 'thing 0')
+        self.assertEqual(len(crsr.fetchmany(4)), 4)
+        self.assertEqual([row[0] for row in crsr], [5, 6, 7, 8, 9])
+
+    def testIterateThenFetch(self):
+        crsr = self.conn.cursor()
+        crsr.arraysize = 4
+        crsr.execute(select_sql)
+        for row in crsr:
+            if row[0] == 1:
+                break  # rows 2 and 3 have been read ahead
+        self.assertEqual(crsr.fetchone()[0], 2)
+        rows = crsr.fetchmany(3)
+        self.assertEqual([row[0] for row in rows], [3, 4, 5])
+        self.assertEqual(rows[2, 'name'], 'thing 5')  # the same type of result as without iterating
+        self.assertEqual([row[0] for row in crsr.fetchall()], [6, 7, 8, 9])
+
+    def testExecuteReusesCommand(self):
+        crsr = self.conn.cursor()
+        crsr.execute(insert_sql, (1, 'one'))
+        command = crsr.cmd
+        crsr.execute(insert_sql, (2, 'two'))
+        self.assertTrue(crsr.cmd is command)
+        self.assertEqual(self.provider.executed[-1], (insert_sql, [2, 'two']))
+
+    def testExecuteManyBatched(self):
+        crsr = self.conn.cursor()
+        crsr.executemany_batch_size = 4
+        crsr.executemany(insert_sql, [(i, 'x') for i in range(10)])
+        self.assertEqual(crsr.rowcount, 10)
+        self.assertEqual(self.provider.statements, 3)
+        self.assertEqual(len(self.provider.executed[0][1]), 8)
+
+    def testExecuteManyRowLimit(self):
+        crsr = self.conn.cursor()
+        crsr.executemany_batch_size = 2500
+        crsr.executemany('INSERT INTO things (id) VALUES (?)', [(i,) for i in range(2500)])
+        self.assertEqual(crsr.rowcount, 2500)
+        self.assertEqual(self.provider.statements, 3)  # at most maxBatchRows rows in each
+        self.assertEqual(len(self.provider.executed[0][1]), adodbapi.adodbapi.maxBatchRows)
+
+    def testFetchColumns(self):
+        crsr = self.conn.cursor()
+        crsr.execute(select_sql)
+        ids, names = crsr.fetchall_columnar()
+        self.assertTrue(isinstance(ids, array.array))
+        self.assertEqual(list(ids), list(range(10)))
+        self.assertEqual(names[9], 'thing 9')
+
+    def testFetchColumnsWithNulls(self):
+        try:
+            import numpy
+        except ImportError:
+            return  # numpy is optional
+        self.provider.add_result('nulls', [('x', adc.adDouble), ('y', adc.adDouble)],
+                                 [(1.5, 1.0), (None, 2.0)])
+        crsr = self.conn.cursor()
+        crsr.execute('nulls')
+        xs, ys = crsr.fetchall_columnar(numpy_arrays=True)
+        self.assertEqual(xs.dtype, object)
+        self.assertTrue(xs[1] is None)
+        self.assertEqual(ys.dtype, numpy.float64)
+
+    def testColumnInfoRemembered(self):
+        crsr = self.conn.cursor()
+        crsr.execute(select_sql)
+        self.assertEqual(crsr.columnTypes, [adc.adInteger, adc.adVarWChar])
+        self.assertEqual(crsr.description[0], ('id', adc.adInteger, None, 0, 0, 0, True))
+        info = crsr._column_info
+        crsr.execute(select_sql)
+        self.assertTrue(crsr._column_info is info)  # so the description is not read again
+        self.assertEqual(crsr.description, info.description)
+        # the same query, but the table has changed: a different number of columns is noticed...
+        self.provider.add_result(select_sql, [('id', adc.adDouble)], [(1.5,)])
+        crsr.execute(select_sql)
+        self.assertEqual(crsr.columnTypes, [adc.adDouble])
+        self.assertEqual(crsr.fetchone()[0], 1.5)
+        # ...other changes must be announced
+        self.provider.add_result(select_sql, [('id', adc.adVarWChar)], [(u'x',)])
+        self.conn.clear_column_info_cache()
+        crsr.execute(select_sql)
+        self.assertEqual(crsr.columnTypes, [adc.adVarWChar])
+
+    def testNextset(self):
+        self.provider.add_result('two sets', [('a', adc.adInteger)], [(1,)], ([('b', adc.adInteger)], [(2,), (3,)]))
+        crsr = self.conn.cursor()
+        crsr.execute('two sets')
+        self.assertEqual(crsr.fetchall()[0][0], 1)
+        self.assertTrue(crsr.nextset())
+        self.assertEqual([row.b for row in crsr.fetchall()], [2, 3])
+        self.assertEqual(crsr.nextset(), None)
+
+    def testInstrumentation(self):
+        import adodbapi.instrumentation
+        instr = adodbapi.instrumentation.Instrumentation()
+        self.conn.instrumentation = instr
+        crsr = self.conn.cursor()
+        crsr.execute(insert_sql, (1, 'one'))
+        crsr.execute(insert_sql, (2, 'two'))
+        crsr.execute(select_sql)
+        self.assertEqual(len(crsr.fetchall()), 10)
+        self.assertEqual(len(instr.statements), 3)
+        first, second, select = instr.statements
+        self.assertEqual(first.operation, insert_sql)
+        self.assertTrue(first.com_calls > second.com_calls > 0) # the second re-uses the prepared command
+        self.assertEqual(select.rows, 10)
+        self.assertEqual(instr.counts['execute'], 3)
+        self.assertEqual(instr.counts['getrows'], 1)
+        self.assertTrue('COM calls: %d' % instr.com_calls in instr.report())
+        converts = instr.counts['convert']
+        convert = instr.timed_converters(crsr, [int])[0]
+        self.assertEqual(convert('5'), 5)
+        self.assertEqual(instr.counts['convert'], converts + 1) # counted like the other phases
+        self.assertEqual(sum(instr._histograms['convert'].values()), converts + 1)
+        self.conn.instrumentation = None
+        crsr.execute(insert_sql, (3, 'three'))
+        self.assertFalse(isinstance(crsr.cmd, adodbapi.instrumentation._CountingProxy))
+
+class TestAsyncConnection(unittest.TestCase):
+    def testExecuteOnWorkerThread(self):
+        import threading
+        import adodbapi.asynchronous
+        provider = fakeado.FakeProvider()
+        threads = []
+        def remember_thread(connection):
+            threads.append(threading.current_thread())
+        provider.add_result(select_sql, [('id', adc.adInteger), ('name', adc.adVarWChar)], [(1, 'one'), (2, 'two')])
+        conn = adodbapi.asynchronous.AsyncConnection(provider, connect_function=fakeado.connect)
+        conn.opened.result(10)
+        crsr = conn.cursor()
+        crsr.execute(select_sql).result(10)
+        self.assertEqual(crsr.rowcount, 2)
+        self.assertEqual(crsr.description[1][0], 'name')
+        rows = crsr.fetchall().result(10)
+        self.assertEqual([row[0] for row in rows], [1, 2])
+        conn.run(remember_thread).result(10)
+        self.assertTrue(threads[0] is not threading.current_thread())
+        conn.close().result(10)
+
+    def testOpenFails(self):
+        import adodbapi.asynchronous
+        def no_server(*args, **kwargs):
+            raise adodbapi.OperationalError('no server')
+        conn = adodbapi.asynchronous.AsyncConnection(connect_function=no_server)
+        crsr = conn.cursor()
+        execute = crsr.execute(select_sql)
+        self.assertRaises(adodbapi.OperationalError, conn.opened.result, 10)
+        try:
+            execute.result(10)
+        except adodbapi.InterfaceError, e:
+            self.assertTrue('not open' in str(e)) # why the cursor was not made
+        else:
+            self.fail('the cursor was made without a connection')
+        conn._worker.join(10)
+        self.assertFalse(conn._worker.is_alive())
+        self.assertRaises(adodbapi.InterfaceError, conn.commit().result, 10)
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        import adodbapi.pool
+        self.provider = fakeado.FakeProvider()
+        provider = self.provider
+        self.pool = adodbapi.pool.ConnectionPool({'connection_string': 'Provider=FakeADO'}, max_size=2,
+                                                 connection_maker=lambda: fakeado.Connection(provider),
+                                                 command_maker=fakeado.Command)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def testReuse(self):
+        conn = self.pool.connect()
+        ado_connection = conn.connector
+        conn.close()
+        self.assertRaises(adodbapi.InterfaceError, conn.cursor)
+        statements = self.provider.statements
+        conn = self.pool.connect()
+        self.assertTrue(conn.connector is ado_connection)
+        self.assertEqual(self.provider.statements, statements + 1) # the health check reached the "server"
+        another = self.pool.connect()
+        self.assertTrue(another.connector is not ado_connection)
+        self.assertRaises(adodbapi.OperationalError, self.pool.connect)
+        another.close()
+        conn.close()
+
+    def testSettingsRestored(self):
+        conn = self.pool.connect()
+        conn.paramstyle = 'named'
+        conn.timeout = 5
+        conn.executemany_batch_size = 100
+        conn.variantConversions = {}
+        conn.autocommit = True
+        conn.close()
+        conn = self.pool.connect()
+        self.assertEqual(conn.paramstyle, adodbapi.paramstyle)
+        self.assertEqual(conn.timeout, 30)
+        self.assertEqual(conn.executemany_batch_size, 0)
+        self.assertFalse('variantConversions' in conn._connection.__dict__)
+        self.assertFalse(conn.autocommit)
+        self.assertTrue(conn.transaction_level) # a transaction was begun again
+        conn.close()
+
+    def testUnhealthyConnectionReplaced(self):
+        conn = self.pool.connect()
+        ado_connection = conn.connector
+        conn.close()
+        ado_connection.Close()  # as if the server had dropped it
+        conn = self.pool.connect()
+        self.assertTrue(conn.connector is not ado_connection)
+        conn.close()
+
+    def testGetPoolSettings(self):
+        import adodbapi.pool
+        def never(connection):
+            return False
+        pool = adodbapi.pool.get_pool('Provider=FakeADO;Data Source=pool test', pool_health_check=never,
+                                      pool_connection_maker=lambda: fakeado.Connection(self.provider),
+                                      pool_command_maker=fakeado.Command)
+        self.assertTrue(pool.health_check is never)
+        conn = pool.connect()
+        ado_connection = conn.connector
+        conn.close()
+        conn = pool.connect()
+        self.assertTrue(conn.connector is not ado_connection)
+        conn.close()
+        pool.close()
+
+class TestQmarkConversion(unittest.TestCase):
+    def testNamed(self):
+        op, names = adodbapi.adodbapi._to_qmark("SELECT :a, ':b', \"c:d\", :e::int FROM t WHERE x=:a", 'named')
+        self.assertEqual(op, "SELECT ?, ':b', \"c:d\", ?::int FROM t WHERE x=?")
+        self.assertEqual(names, ('a', 'e', 'a'))
+
+    def testFormat(self):
+        op, names = adodbapi.adodbapi._to_qmark("INSERT INTO t VALUES (%s, 'it''s %s', %s)", 'format')
+        self.assertEqual(op, "INSERT INTO t VALUES (?, 'it''s %s', ?)")
+        self.assertEqual(names, ())
+
+    def testPyformat(self):
+        op, names = adodbapi.adodbapi._to_qmark("UPDATE t SET a=%(a)s WHERE b=%(b)s", 'format')
+        self.assertEqual(op, "UPDATE t SET a=? WHERE b=?")
+        self.assertEqual(names, ('a', 'b'))
+        self.assertRaises(adodbapi.ProgrammingError, adodbapi.adodbapi._to_qmark, "a=%(a", 'format')
+        self.assertRaises(adodbapi.ProgrammingError, adodbapi.adodbapi._to_qmark, "a=%(a b)s", 'format')
+
+    def testDoubleQuotes(self):
+        op, names = adodbapi.adodbapi._to_qmark('UPDATE "t%s" SET "a\'b"=%s, c=\'%s\' WHERE d=%(d)s', 'format')
+        self.assertEqual(op, 'UPDATE "t%s" SET "a\'b"=?, c=\'%s\' WHERE d=?')
+        self.assertEqual(names, ('d',))
+        op, names = adodbapi.adodbapi._to_qmark('SELECT ":a" FROM t WHERE b=:b', 'named')
+        self.assertEqual(op, 'SELECT ":a" FROM t WHERE b=?')
+        self.assertEqual(names, ('b',))
+
+    def testCachedConversion(self):
+        first = adodbapi.adodbapi._qmark_operation("SELECT :x", 'named')
+        self.assertEqual(first, ("SELECT ?", ('x',)))
+        self.assertTrue(adodbapi.adodbapi._qmark_operation("SELECT :x", 'named') is first)
+
+    def testCacheThreads(self):
+        import threading
+        errors = []
+        def convert(start):
+            try:
+                for i in range(start, start + 2000):
+                    op = "SELECT :a%d" % (i % 700)
+                    self.assertEqual(adodbapi.adodbapi._qmark_operation(op, 'named'), ("SELECT ?", ('a%d' % (i % 700),)))
+            except Exception:
+                errors.append(sys.exc_info()[1])
+        threads = [threading.Thread(target=convert, args=(n * 100,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertTrue(len(adodbapi.adodbapi._qmark_cache) <= adodbapi.adodbapi.qmarkCacheSize)
+
+if __name__ == '__main__':
+    unittest.main()
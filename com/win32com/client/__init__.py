@@ -495,6 +495,8 @@ def _get_good_object_(obj, obUserName=None, resultCLSID=None):
 	if obj is None:
 		return None
 	elif isinstance(obj, tuple):
+		if dynamic._IsScalarTuple(obj):
+			return dynamic._ConvertScalarTuple(obj)
 		obUserNameTuple = (obUserName,) * len(obj)
 		resultCLSIDTuple = (resultCLSID,) * len(obj)
 		return tuple(map(_get_good_object_, obj, obUserNameTuple, resultCLSIDTuple))
@@ -18,6 +18,12 @@ Example
 import sys
 import traceback
 import types
+import copy
+import threading
+import weakref
+import marshal
+import imp
+import array
 
 import pythoncom
 import winerror
@@ -80,6 +86,290 @@ else:
 	_GoodDispatchTypes=(str, IIDType, unicode)
 _defaultDispatchItem=build.DispatchItem
 
+# Results which are tuples of tuples (eg, a 2 dimensional SAFEARRAY such as
+# the Value of an Excel Range) holding only plain values need no conversion,
+# and are returned as they are - unless scalarTupleConverter is set, in which
+# case those which are 2 dimensional arrays (tuples of tuples of the same
+# length, holding no further tuples) are returned as
+# scalarTupleConverter(result).  See ScalarTupleToArray and
+# ScalarTupleToNumPy.  (Other tuples are never converted, as that is also how
+# methods return their output parameters - eg, ((1, 2, 3), 5).)
+scalarTupleConverter = None
+
+# The types of the values in a result which may need wrapping.
+_objectTypes = frozenset([PyIDispatchType, PyIUnknownType])
+
+def _IsScalarTuple(ob):
+	"Is the tuple ob (and any tuples in it) free of COM objects?"
+	itemTypes = set(map(type, ob))
+	if tuple in itemTypes:
+		itemTypes.discard(tuple)
+		for item in ob:
+			if type(item) is tuple and not _IsScalarTuple(item):
+				return False
+	return itemTypes.isdisjoint(_objectTypes)
+
+def _Is2DArray(ob):
+	"Is the tuple ob made of tuples of the same length, holding no tuples?"
+	if not ob or type(ob[0]) is not tuple:
+		return False
+	length = len(ob[0])
+	for row in ob:
+		if type(row) is not tuple or len(row) != length or tuple in set(map(type, row)):
+			return False
+	return True
+
+def _ConvertScalarTuple(ob):
+	# Called with a result for which _IsScalarTuple is true.
+	if scalarTupleConverter is not None and _Is2DArray(ob):
+		return scalarTupleConverter(ob)
+	return ob
+
+def _ToArray(ob, typecode):
+	if ob and type(ob[0]) is tuple:
+		return [_ToArray(item, typecode) for item in ob]
+	return array.array(typecode, ob)
+
+def ScalarTupleToArray(ob, typecode="d"):
+	"""A scalarTupleConverter which makes a tuple of numbers an array.array,
+	and a tuple of tuples a list of arrays.
+
+	Tuples holding anything but numbers (eg, None for an empty cell) are
+	returned unchanged.
+	"""
+	try:
+		return _ToArray(ob, typecode)
+	except (TypeError, OverflowError):
+		return ob
+
+def ScalarTupleToNumPy(ob):
+	"A scalarTupleConverter which makes a tuple (of tuples) a numpy array."
+	import numpy
+	return numpy.array(ob)
+
+# The olerepr built from the type information of an interface is shared by
+# all the objects implementing that interface - see Dispatch().
+# olereprCacheSize is the number of interfaces remembered; 0 disables sharing.
+olereprCacheSize = 500
+
+class _LRUCache:
+	"""A thread-safe, least-recently-used map, holding at most maxSize()
+	items."""
+	def __init__(self, maxSize):
+		self.maxSize = maxSize
+		self.lock = threading.RLock()
+		self.clear()
+
+	def clear(self):
+		self.lock.acquire()
+		try:
+			self.items = {}
+			self.used = {} # key -> tick of last use.
+			self.tick = 0
+		finally:
+			self.lock.release()
+
+	def get(self, key):
+		self.lock.acquire()
+		try:
+			olerepr = self.items.get(key)
+			if olerepr is not None:
+				self.tick = self.tick + 1
+				self.used[key] = self.tick
+			return olerepr
+		finally:
+			self.lock.release()
+
+	def put(self, key, value):
+		"""Remember value for key, unless another thread got there first.
+		Returns the value to use."""
+		self.lock.acquire()
+		try:
+			existing = self.items.get(key)
+			if existing is not None:
+				return existing
+			maxSize = self.maxSize()
+			if maxSize <= 0:
+				return value
+			while len(self.items) >= maxSize:
+				oldest = min(self.used, key=self.used.get)
+				del self.items[oldest]
+				del self.used[oldest]
+			self._added_(value)
+			self.items[key] = value
+			self.tick = self.tick + 1
+			self.used[key] = self.tick
+			return value
+		finally:
+			self.lock.release()
+
+	def _added_(self, value):
+		pass
+
+	def copy(self):
+		self.lock.acquire()
+		try:
+			return self.items.copy()
+		finally:
+			self.lock.release()
+
+class _OleReprCache(_LRUCache):
+	"""A map of (iid, lcid, lazy) -> olerepr."""
+	def __init__(self):
+		_LRUCache.__init__(self, lambda: olereprCacheSize)
+
+	def _added_(self, olerepr):
+		olerepr._shared_ = 1
+		# guards changes to the olerepr's maps (see CDispatch.__LazyMap__)
+		olerepr._lock_ = threading.Lock()
+
+_oleReprCache = _OleReprCache()
+
+# The maps of an olerepr which may be filled in lazily.
+_oleReprMapNames = "propMap", "propMapGet", "propMapPut", "mapFuncs"
+
+def _CopyOleRepr(olerepr):
+	# A private copy of an olerepr, whose maps can be changed freely.
+	lock = getattr(olerepr, "_lock_", None)
+	if lock is not None:
+		lock.acquire()
+	try:
+		result = copy.copy(olerepr)
+		for name in _oleReprMapNames:
+			setattr(result, name, getattr(olerepr, name).copy())
+		result._builtFunctions_ = getattr(olerepr, "_builtFunctions_", {}).copy()
+	finally:
+		if lock is not None:
+			lock.release()
+	result._shared_ = 0
+	result._lock_ = None
+	return result
+
+def _MergeOleRepr(olerepr, base, changed):
+	# Make the changes to the copy base (now changed) in the shared olerepr.
+	olerepr._lock_.acquire()
+	try:
+		builtFunctions = getattr(olerepr, "_builtFunctions_", {})
+		for name in _oleReprMapNames:
+			baseMap, changedMap, map = getattr(base, name), getattr(changed, name), getattr(olerepr, name)
+			for key, item in changedMap.items():
+				if baseMap.get(key) is not item:
+					map[key] = item
+					if name == "mapFuncs":
+						builtFunctions.pop(key, None)
+			for key in baseMap:
+				if key not in changedMap:
+					map.pop(key, None)
+		if changed.defaultDispatchName != base.defaultDispatchName:
+			olerepr.defaultDispatchName = changed.defaultDispatchName
+	finally:
+		olerepr._lock_.release()
+
+def ClearOleReprCache():
+	"""Forget the shared olereprs - eg, after a type library has been re-registered.
+	Existing objects keep using the olerepr they were created with."""
+	_oleReprCache.clear()
+
+# The compiled code of the methods built by CDispatch._make_method_, keyed by
+# their source.  The functions themselves are kept by the olerepr, so are
+# shared by all objects of an interface; this cache also lets the code
+# survive the olerepr, and can be saved to disk - see SaveMethodCache.
+# methodCodeCacheSize is the number of methods remembered.
+methodCodeCacheSize = 2000
+_methodCodeCache = _LRUCache(lambda: methodCodeCacheSize)
+
+def LoadMethodCache(fileName):
+	"""Load method code saved by SaveMethodCache(), so the first calls of
+	methods on dynamic objects need not compile them.  Returns the number of
+	methods loaded; a missing file, or one saved by a different version of
+	Python, loads nothing."""
+	try:
+		f = open(fileName, "rb")
+	except IOError:
+		return 0
+	try:
+		magic = imp.get_magic()
+		if f.read(len(magic)) != magic:
+			return 0
+		try:
+			code = marshal.load(f)
+		except (EOFError, ValueError, TypeError):
+			return 0
+	finally:
+		f.close()
+	# Ignore a file which doesn't hold what SaveMethodCache writes.
+	if type(code) is not dict:
+		return 0
+	for source, codeObject in code.items():
+		if type(source) not in (str, unicode) or type(codeObject) is not types.CodeType:
+			return 0
+	for source, codeObject in code.items():
+		_methodCodeCache.put(source, codeObject)
+	return len(code)
+
+def SaveMethodCache(fileName):
+	"""Save the code of all methods compiled so far, for LoadMethodCache()"""
+	f = open(fileName, "wb")
+	try:
+		f.write(imp.get_magic())
+		marshal.dump(_methodCodeCache.copy(), f)
+	finally:
+		f.close()
+
+# The DISPIDs of names looked up via GetIDsOfNames, shared by all the objects
+# of a class: {(clsid, iid) : {name : dispid, or None for an unknown name}}
+# The class is found via IPersist when the first name is looked up.  Objects
+# which don't support it share a map with the other objects wrapping the same
+# COM object instead, found by the address of its IUnknown.  Set
+# shareDispIDsByClass to false to keep a map per object - eg, for servers
+# whose objects of one class map names differently (such as WMI).
+shareDispIDsByClass = 1
+_dispidCaches = {}
+# {IUnknown address : map}; the objects using a map keep it alive.
+_dispidCachesByIdentity = weakref.WeakValueDictionary()
+# {id(map) : map} for every map in use, so they can all be invalidated.
+_allDispIDCaches = weakref.WeakValueDictionary()
+
+class _DispIDCache(dict):
+	"A map of names to DISPIDs (which, unlike a dict, can be weakly referenced)"
+	pass
+
+def _ObjectIdentity(ob):
+	# The address of the object's IUnknown, which is the same for every
+	# interface of a COM object (see PyIUnknown.__repr__)
+	unk = ob.QueryInterface(pythoncom.IID_IUnknown)
+	return repr(unk).split(" with obj at ")[-1].rstrip(">")
+
+def InvalidateDispIDCache(clsid=None):
+	"""Forget the DISPIDs looked up for objects of the given CLSID, or for
+	all objects.  Use it if a server adds (or removes) names at runtime."""
+	if clsid is None:
+		caches = list(_allDispIDCaches.values())
+	else:
+		clsid = pythoncom.MakeIID(clsid)
+		caches = [cache for key, cache in list(_dispidCaches.items()) if key[0] == clsid]
+	for cache in caches:
+		cache.clear() # objects hold a reference, so clear in place.
+
+def _GetSharedOleRepr(IDispatch, typeinfo, lazydata):
+	# Returns the olerepr shared by all objects of the typeinfo's interface,
+	# building it if necessary.  The IID, not the object, determines the
+	# members, so anything only discovered via GetIDsOfNames is never added
+	# to a shared olerepr (see CDispatch._UnsharedOleRepr_)
+	if not olereprCacheSize:
+		return MakeOleRepr(IDispatch, typeinfo, lazydata)
+	attr = typeinfo.GetTypeAttr()
+	if attr[0] == pythoncom.IID_NULL: # no way to tell interfaces apart.
+		return MakeOleRepr(IDispatch, typeinfo, lazydata)
+	key = attr[0], attr[1], lazydata is not None
+	olerepr = _oleReprCache.get(key)
+	if olerepr is None:
+		olerepr = MakeOleRepr(IDispatch, typeinfo, lazydata)
+		if olerepr.__class__ is not build.DispatchItem or olerepr.mapFuncs or olerepr.propMap or olerepr.propMapGet or olerepr.propMapPut:
+			# (an empty DispatchItem means the type info could not be used)
+			olerepr = _oleReprCache.put(key, olerepr)
+	return olerepr
+
 def _GetGoodDispatch(IDispatch, clsctx = pythoncom.CLSCTX_SERVER):
 	# quick return for most common case
 	if isinstance(IDispatch, PyIDispatchType):
@@ -140,7 +430,14 @@ def Dispatch(IDispatch, userName = None, createClass = None, typeinfo = None, Un
 				pass
 	except pythoncom.com_error:
 		typeinfo = None
-	olerepr = MakeOleRepr(IDispatch, typeinfo, lazydata)
+	olerepr = None
+	if typeinfo is not None:
+		try:
+			olerepr = _GetSharedOleRepr(IDispatch, typeinfo, lazydata)
+		except pythoncom.com_error:
+			pass
+	if olerepr is None:
+		olerepr = MakeOleRepr(IDispatch, typeinfo, lazydata)
 	return createClass(IDispatch, olerepr, userName, lazydata=lazydata)
 
 def MakeOleRepr(IDispatch, typeinfo, typecomp):
@@ -185,6 +482,7 @@ class CDispatch:
 		self.__dict__['_enum_'] = None
 		self.__dict__['_unicode_to_string_'] = None
 		self.__dict__['_lazydata_'] = lazydata
+		self.__dict__['_dispidcache_'] = None # see __AttrToID__
 
 	def __call__(self, *args):
 		"Provide 'default dispatch' COM functionality - allow instance to be called"
@@ -278,7 +576,7 @@ class CDispatch:
 			return item.desc[4], item.dispid
 
 		try:
-			dispid = self._oleobj_.GetIDsOfNames(0,methodName)
+			dispid = self.__AttrToID__(methodName)
 		except:	### what error?
 			return None, None
 		return pythoncom.DISPATCH_METHOD | pythoncom.DISPATCH_PROPERTYGET, dispid
@@ -312,6 +610,8 @@ class CDispatch:
 		if ob is None: # Quick exit!
 			return None
 		elif isinstance(ob, tuple):
+			if _IsScalarTuple(ob):
+				return _ConvertScalarTuple(ob)
 			return tuple(map(lambda o, s=self, oun=userName, rc=ReturnCLSID: s._get_good_single_object_(o, oun, rc),  ob))
 		else:
 			return self._get_good_single_object_(ob)
@@ -319,21 +619,34 @@ class CDispatch:
 	def _make_method_(self, name):
 		"Make a method object - Assumes in olerepr funcmap"
 		methodName = build.MakePublicAttributeName(name) # translate keywords etc.
-		methodCodeList = self._olerepr_.MakeFuncMethod(self._olerepr_.mapFuncs[name], methodName,0)
+		# The functions are kept by the olerepr, so objects sharing it
+		# (see _GetSharedOleRepr) only build each method once.
+		olerepr = self._olerepr_
+		try:
+			builtFunctions = olerepr._builtFunctions_
+		except AttributeError:
+			builtFunctions = olerepr._builtFunctions_ = {}
+		fn = builtFunctions.get(name)
+		if fn is not None:
+			self._builtMethods_[methodName] = fn
+			return MakeMethod(fn, self, self.__class__)
+		methodCodeList = olerepr.MakeFuncMethod(olerepr.mapFuncs[name], methodName,0)
 		methodCode = "\n".join(methodCodeList)
 		try:
 #			print "Method code for %s is:\n" % self._username_, methodCode
 #			self._print_details_()
-			codeObject = compile(methodCode, "<COMObject %s>" % self._username_,"exec")
+			codeObject = _methodCodeCache.get(methodCode)
+			if codeObject is None:
+				codeObject = compile(methodCode, "<COMObject %s>" % self._username_,"exec")
+				codeObject = _methodCodeCache.put(methodCode, codeObject)
 			# Exec the code object
 			tempNameSpace = {}
 			# "Dispatch" in the exec'd code is win32com.client.Dispatch, not ours.
 			globNameSpace = globals().copy()
 			globNameSpace["Dispatch"] = win32com.client.Dispatch
 			exec codeObject in globNameSpace, tempNameSpace # self.__dict__, self.__dict__
-			name = methodName
 			# Save the function in map.
-			fn = self._builtMethods_[name] = tempNameSpace[name]
+			fn = self._builtMethods_[methodName] = builtFunctions[name] = tempNameSpace[methodName]
 			newMeth = MakeMethod(fn, self, self.__class__)
 			return newMeth
 		except:
@@ -341,6 +654,15 @@ class CDispatch:
 			traceback.print_exc()
 		return None
 		
+	def _UnsharedOleRepr_(self):
+		"""Return an olerepr which may hold names specific to this object,
+		making a private copy of a shared olerepr if necessary."""
+		olerepr = self._olerepr_
+		if getattr(olerepr, "_shared_", 0):
+			olerepr = _CopyOleRepr(olerepr)
+			self.__dict__['_olerepr_'] = olerepr
+		return olerepr
+
 	def _Release_(self):
 		"""Cleanup object - like a close - to force cleanup when you dont 
 		   want to rely on Python's reference counting."""
@@ -352,6 +674,8 @@ class CDispatch:
 			self.__dict__['_oleobj_'] = None
 		if self._olerepr_:
 			self.__dict__['_olerepr_'] = None
+		# (another object may later have the same IUnknown address)
+		self.__dict__['_dispidcache_'] = None
 		self._enum_ = None
 
 	def _proc_(self, name, *args):
@@ -384,19 +708,30 @@ class CDispatch:
 			traceback.print_exc()
 
 	def __LazyMap__(self, attr):
+		olerepr = self._olerepr_
+		if getattr(olerepr, "_shared_", 0):
+			# Other threads may be using a shared olerepr, so bind the name
+			# (which calls COM) into a copy, then only lock to add the result.
+			base = _CopyOleRepr(olerepr)
+			target = _CopyOleRepr(base)
+		else:
+			target = olerepr
 		try:
-			if self._LazyAddAttr_(attr):
+			if self._LazyAddAttr_(attr, target):
+				if target is not olerepr:
+					_MergeOleRepr(olerepr, base, target)
 				debug_attr_print("%s.__LazyMap__(%s) added something" % (self._username_,attr))
 				return 1
 		except AttributeError:
 			return 0
 
 	# Using the typecomp, lazily create a new attribute definition.
-	def _LazyAddAttr_(self,attr):
+	def _LazyAddAttr_(self,attr,olerepr=None):
 		if self._lazydata_ is None: return 0
 		res = 0
 		typeinfo, typecomp = self._lazydata_
-		olerepr = self._olerepr_
+		if olerepr is None:
+			olerepr = self._olerepr_
 		# We need to explicitly check each invoke type individually - simply
 		# specifying '0' will bind to "any member", which may not be the one
 		# we are actually after (ie, we may be after prop_get, but returned
@@ -440,11 +775,57 @@ class CDispatch:
 		"""
 		for name in methodNames:
 			details = build.MapEntry(self.__AttrToID__(name), (name,))
-			self._olerepr_.mapFuncs[name] = details
+			olerepr = self._UnsharedOleRepr_()
+			olerepr.mapFuncs[name] = details
+			getattr(olerepr, "_builtFunctions_", {}).pop(name, None)
+
+	def _InitDispIDCache_(self):
+		# Find the map of names to DISPIDs shared by the objects of our class
+		# (and interface), or else by the objects wrapping the same COM object.
+		cache = None
+		if shareDispIDsByClass:
+			try:
+				clsid = self._oleobj_.QueryInterface(pythoncom.IID_IPersist).GetClassID()
+			except pythoncom.com_error:
+				clsid = None
+			if clsid is not None:
+				key = clsid, getattr(self._olerepr_, "clsid", None)
+				cache = _dispidCaches.get(key)
+				if cache is None:
+					cache = _dispidCaches.setdefault(key, _DispIDCache())
+			else:
+				try:
+					identity = _ObjectIdentity(self._oleobj_)
+				except pythoncom.com_error:
+					identity = None
+				if identity is not None:
+					cache = _dispidCachesByIdentity.get(identity)
+					if cache is None:
+						cache = _dispidCachesByIdentity[identity] = _DispIDCache()
+		if cache is None:
+			cache = _DispIDCache()
+		_allDispIDCaches[id(cache)] = cache
+		self.__dict__['_dispidcache_'] = cache
+		return cache
 
 	def __AttrToID__(self,attr):
-			debug_attr_print("Calling GetIDsOfNames for property %s in Dispatch container %s" % (attr, self._username_))
-			return self._oleobj_.GetIDsOfNames(0,attr)
+			cache = self._dispidcache_
+			if cache is None:
+				cache = self._InitDispIDCache_()
+			try:
+				dispid = cache[attr]
+			except KeyError:
+				debug_attr_print("Calling GetIDsOfNames for property %s in Dispatch container %s" % (attr, self._username_))
+				try:
+					dispid = self._oleobj_.GetIDsOfNames(0,attr)
+				except pythoncom.com_error, details:
+					if details.hresult == winerror.DISP_E_UNKNOWNNAME:
+						cache[attr] = None
+					raise
+				cache[attr] = dispid
+			if dispid is None: # we asked before - see InvalidateDispIDCache.
+				raise pythoncom.com_error(winerror.DISP_E_UNKNOWNNAME, "Unknown name.", None, None)
+			return dispid
 
 	def __getattr__(self, attr):
 		if attr=='__iter__':
@@ -517,7 +898,7 @@ class CDispatch:
 			except pythoncom.com_error, details:
 				if details.hresult in ERRORS_BAD_CONTEXT:
 					# May be a method.
-					self._olerepr_.mapFuncs[attr] = retEntry
+					self._UnsharedOleRepr_().mapFuncs[attr] = retEntry
 					return self._make_method_(attr)
 				raise
 			debug_attr_print("OLE returned ", ret)
@@ -573,7 +954,7 @@ class CDispatch:
 				try:
 					invoke_type = _GetDescInvokeType(entry, pythoncom.INVOKE_PROPERTYPUT)
 					self._oleobj_.Invoke(entry.dispid, 0, invoke_type, 0, value)
-					self._olerepr_.propMap[attr] = entry
+					self._UnsharedOleRepr_().propMap[attr] = entry
 					debug_attr_print("__setattr__ property %s (id=0x%x) in Dispatch container %s" % (attr, entry.dispid, self._username_))
 					return
 				except pythoncom.com_error:
@@ -8,7 +8,10 @@ Implementation
   Each typelib is generated into a filename of format "{guid}x{lcid}x{major}x{minor}.py"
   
   An external persistant dictionary maps from all known IIDs in all known type libraries
-  to the type library itself.
+  to the type library itself.  It is stored in an index file (dicts.idx), with one
+  line for each type library listing the IIDs it supports, and is only read the first
+  time it is needed.  The pickled dictionary used by earlier versions (dicts.dat)
+  is also written, so they can share the cache.
   
   Thus, whenever Python code knows the IID of an object, it can find the IID, LCID and version of
   the type library which supports it.  Given this information, it can find the Python module
@@ -16,11 +19,21 @@ Implementation
   
   If necessary, this support can be generated on the fly.
   
-Hacks, to do, etc
-  Currently just uses a pickled dictionary, but should used some sort of indexed file.
-  Maybe an OLE2 compound file, or a bsddb file?
+  EnsureModule remembers which modules it has validated against their type
+  library, so does not need to check the file system again for
+  validationInterval seconds.
+
+  The compiled code of generated modules can also be written to a single bundle
+  file (see MakeBundle).  Modules in a bundle are imported from it, without
+  reading and compiling a file for each of them.  A bundle named gen_py.bundle
+  in the generated directory is loaded automatically; others are loaded with
+  LoadBundle.
 """
 import pywintypes, os, sys
+import time
+import imp
+import marshal
+import threading
 import pythoncom
 import win32com, win32com.client
 import glob
@@ -34,8 +47,60 @@ except:
 
 bForDemandDefault = 0 # Default value of bForDemand - toggle this to change the world - see also makepy.py
 
+# How many seconds EnsureModule trusts a module it has validated before
+# checking it against the type library again.  None means once is enough for
+# the life of the process; 0 means check every time.
+validationInterval = 60
+
+# The modules validated by EnsureModule - {(typelibCLSID, lcid, major, minor) : (module, time)}
+_validatedModules = {}
+
+class _TypelibIndex(dict):
+	"""The type of clsidToTypelib - a dictionary which reads the index file the
+	first time it is used."""
+	loaded = 0
+	loading = 0 # set while the thread holding lock loads the index.
+	lock = threading.RLock()
+	def _load(self):
+		if self.loaded:
+			return
+		# Other threads wait for the index, rather than see it empty.
+		self.lock.acquire()
+		try:
+			if self.loaded or self.loading:
+				return
+			self.loading = 1
+			try:
+				try:
+					_LoadDicts()
+				except IOError:
+					Rebuild()
+			finally:
+				self.loading = 0
+			self.loaded = 1
+		finally:
+			self.lock.release()
+	def clear(self):
+		if not self.loading:
+			self.loaded = 1 # no need to read what we are about to forget.
+		dict.clear(self)
+
+def _loading(name):
+	method = getattr(dict, name)
+	def load_and_call(self, *args):
+		self._load()
+		return method(self, *args)
+	return load_and_call
+
+for _name in ("__getitem__", "__setitem__", "__delitem__", "__contains__", "__iter__",
+              "__len__", "get", "keys", "values", "items", "iterkeys", "itervalues",
+              "iteritems", "has_key", "pop", "setdefault", "update", "copy"):
+	if hasattr(dict, _name):
+		setattr(_TypelibIndex, _name, _loading(_name))
+del _name
+
 # The global dictionary
-clsidToTypelib = {}
+clsidToTypelib = _TypelibIndex()
 
 # If we have a different version of the typelib generated, this
 # maps the "requested version" to the "generated version".
@@ -56,41 +121,111 @@ import cPickle as pickle
 
 def __init__():
 	# Initialize the module.  Called once explicitly at module import below.
-	try:
-		_LoadDicts()
-	except IOError:
-		Rebuild()
+	# clsidToTypelib loads itself when first used.
+	pass
 
+indexFileName = "dicts.idx"
+indexHeader = "win32com gencache index 1"
+# dicts.dat, the pickled dictionary used by earlier versions, is still written
+# so they can share the generated directory.
+pickleFileName = "dicts.dat"
 pickleVersion = 1
+
 def _SaveDicts():
 	if is_readonly:
 		raise RuntimeError("Trying to write to a readonly gencache ('%s')!" \
 		                    % win32com.__gen_path__)
-	f = open(os.path.join(GetGeneratePath(), "dicts.dat"), "wb")
+	# One line for each type library: "{guid} lcid major minor clsid clsid ..."
+	clsidsByTypelib = {}
+	for clsid, info in clsidToTypelib.iteritems():
+		clsidsByTypelib.setdefault(info, []).append(clsid)
+	lines = [indexHeader]
+	for info, clsids in sorted(clsidsByTypelib.items()):
+		clsids.sort()
+		lines.append("%s %s %s %s %s" % (info + (" ".join(clsids),)))
+	f = open(os.path.join(GetGeneratePath(), indexFileName), "w")
+	try:
+		f.write("\n".join(lines) + "\n")
+	finally:
+		f.close()
+	f = open(os.path.join(GetGeneratePath(), pickleFileName), "wb")
 	try:
 		p = pickle.Pickler(f)
 		p.dump(pickleVersion)
-		p.dump(clsidToTypelib)
+		p.dump(dict(clsidToTypelib.iteritems())) # not a _TypelibIndex
 	finally:
 		f.close()
 
+def _ParseIndex(data):
+	lines = data.splitlines()
+	if not lines or lines[0].strip() != indexHeader:
+		raise IOError("%s is not a gencache index" % (indexFileName,))
+	entries = {}
+	for line in lines[1:]:
+		fields = line.split()
+		if len(fields) < 4:
+			continue
+		info = fields[0], int(fields[1]), int(fields[2]), int(fields[3])
+		for clsid in fields[4:]:
+			entries[clsid] = info
+	return entries
+
+def _ParsePickle(data):
+	import cStringIO as io
+	p = pickle.Unpickler(io.StringIO(data))
+	version = p.load()
+	return p.load()
+
 def _LoadDicts():
-	# Load the dictionary from a .zip file if that is where we live.
+	# NOTE: IOError if there is no index must be caught by caller.
+	_bundleImporter.loadGenPathBundle()
+	data = None
+	if not _PickleIsNewer():
+		data = _ReadGenFile(indexFileName)
+	if data is not None:
+		entries = _ParseIndex(data)
+	else:
+		data = _ReadGenFile(pickleFileName)
+		if data is not None:
+			entries = _ParsePickle(data)
+		elif is_zip:
+			# See _ReadGenFile
+			entries = {}
+		else:
+			raise IOError("No gencache index")
+	for clsid, info in _bundleImporter.index.iteritems():
+		entries.setdefault(clsid, info)
+	dict.clear(clsidToTypelib)
+	dict.update(clsidToTypelib, entries)
+	versionRedirectMap.clear()
+
+def _PickleIsNewer():
+	# An earlier version may have updated dicts.dat since we wrote dicts.idx.
+	if is_zip:
+		return 0
+	try:
+		return os.path.getmtime(os.path.join(win32com.__gen_path__, pickleFileName)) > \
+		       os.path.getmtime(os.path.join(win32com.__gen_path__, indexFileName))
+	except os.error:
+		return 0
+
+def _ReadGenFile(name):
+	# Read a file in the gencache directory, returning None if it doesn't exist.
+	# Load the file from a .zip file if that is where we live.
 	if is_zip:
-		import cStringIO as io
 		loader = win32com.__loader__
 		arc_path = loader.archive
-		dicts_path = os.path.join(win32com.__gen_path__, "dicts.dat")
+		dicts_path = os.path.join(win32com.__gen_path__, name)
 		if dicts_path.startswith(arc_path):
 			dicts_path = dicts_path[len(arc_path)+1:]
 		else:
 			# Hm. See below.
-			return
+			return None
 		try:
-			data = loader.get_data(dicts_path)
+			return loader.get_data(dicts_path)
 		except AttributeError:
 			# The __loader__ has no get_data method.  See below.
-			return
+			return None
 		except IOError:
 			# Our gencache is in a .zip file (and almost certainly readonly)
 			# but no dicts file.  That actually needn't be fatal for a frozen
@@ -103,19 +238,199 @@ def _LoadDicts():
 			# Dynamic objects until the cache is built - so the best answer
 			# for these apps is to call EnsureModule, rather than freezing
 			# the dict)
+			return None
+	try:
+		f = open(os.path.join(win32com.__gen_path__, name), "rb")
+	except IOError:
+		return None
+	try:
+		return f.read()
+	finally:
+		f.close()
+
+# Bundles of compiled generated modules.
+bundleFileName = "gen_py.bundle" # The bundle loaded from the generated directory.
+bundleHeader = "win32com gencache bundle 1\n"
+_genPackagePrefix = "win32com.gen_py."
+
+class _BundleImporter:
+	"""A PEP 302 importer for the generated modules in bundles."""
+	def __init__(self):
+		self.modules = {} # {name in win32com.gen_py : (is_package, code)}
+		self.index = {} # {clsid : (typelibCLSID, lcid, major, minor)}
+		self.genPathNames = {} # the names in modules from our own bundle
+		self.loadedGenPathBundle = 0
+
+	def loadGenPathBundle(self):
+		if self.loadedGenPathBundle:
 			return
-		f = io.StringIO(data)
-	else:
-		# NOTE: IOError on file open must be caught by caller.
-		f = open(os.path.join(win32com.__gen_path__, "dicts.dat"), "rb")
+		self.loadedGenPathBundle = 1
+		data = _ReadGenFile(bundleFileName)
+		if data is not None:
+			try:
+				index, modules = _ParseBundle(data)
+			except ValueError:
+				# Written by a different version of Python - ignore it.
+				return
+			self.add(index, modules)
+			for name in modules.iterkeys():
+				self.genPathNames[name] = 1
+
+	def add(self, index, modules):
+		self.index.update(index)
+		self.modules.update(modules)
+
+	def discard(self, name):
+		"""Forget the modules of the generated file name (and its children),
+		including any already imported from a bundle.  Returns true if any of
+		them came from our own bundle."""
+		bFromGenPath = 0
+		for modName in list(self.modules.keys()):
+			if modName == name or modName.startswith(name + "."):
+				del self.modules[modName]
+				if modName in self.genPathNames:
+					del self.genPathNames[modName]
+					bFromGenPath = 1
+				mod = sys.modules.get(_genPackagePrefix + modName)
+				if getattr(mod, "__loader__", None) is self:
+					del sys.modules[_genPackagePrefix + modName]
+		return bFromGenPath
+
+	def find_module(self, fullname, path=None):
+		if not fullname.startswith(_genPackagePrefix):
+			return None
+		self.loadGenPathBundle()
+		if fullname[len(_genPackagePrefix):] in self.modules:
+			return self
+		return None
+
+	def load_module(self, fullname):
+		mod = sys.modules.get(fullname)
+		if mod is not None:
+			return mod
+		name = fullname[len(_genPackagePrefix):]
+		is_package, code = self.modules[name]
+		mod = imp.new_module(fullname)
+		mod.__file__ = code.co_filename
+		mod.__loader__ = self
+		if is_package:
+			# Children not in the bundle are generated into (and imported
+			# from) the usual directory.
+			mod.__path__ = [os.path.join(win32com.__gen_path__, name)]
+		sys.modules[fullname] = mod
+		try:
+			exec code in mod.__dict__
+		except:
+			del sys.modules[fullname]
+			raise
+		return mod
+
+_bundleImporter = _BundleImporter()
+sys.meta_path.insert(0, _bundleImporter)
+
+def _ParseBundle(data):
+	header = bundleHeader.encode("ascii") + imp.get_magic()
+	if not data.startswith(header):
+		raise ValueError("Not a gencache bundle for this version of Python")
+	return marshal.loads(data[len(header):])
+
+def _CompileGenFile(fname):
+	f = open(fname, "rb")
 	try:
-		p = pickle.Unpickler(f)
-		version = p.load()
-		global clsidToTypelib
-		clsidToTypelib = p.load()
-		versionRedirectMap.clear()
+		source = f.read()
 	finally:
 		f.close()
+	return compile(source, fname, "exec")
+
+def MakeBundle(fileName = None, typelibs = None, bGenerateChildren = 1, verbose = 1):
+	"""Write the compiled code of generated modules to a single bundle file.
+
+	The bundle also holds an index of the CLSIDs the modules support, so
+	GetModuleForCLSID and friends work with only the bundle deployed.
+
+	Params
+	fileName -- The file to write, or None for the bundle in the generated
+	            directory, which is loaded automatically.
+	typelibs -- A list of (typelibCLSID, lcid, major, minor) for the modules
+	            to include, or None for all generated modules.
+	bGenerateChildren -- If true, first generate any interfaces of modules
+	                     generated on demand which have not been generated yet.
+	"""
+	import makepy
+	genPath = GetGeneratePath()
+	if fileName is None:
+		fileName = os.path.join(genPath, bundleFileName)
+	if typelibs is None:
+		typelibs = GetGeneratedInfos()
+	index = {}
+	modules = {}
+	for typelibCLSID, lcid, major, minor in typelibs:
+		info = str(typelibCLSID), lcid, major, minor
+		name = GetGeneratedFileName(*info)
+		if verbose:
+			print "Bundling", name
+		mod = GetModuleForTypelib(*info)
+		for map in (mod.CLSIDToClassMap, mod.CLSIDToPackageMap, mod.VTablesToClassMap, mod.VTablesToPackageMap):
+			for clsid in map.iterkeys():
+				index[clsid] = info
+		dirName = os.path.join(genPath, name)
+		if not os.path.isdir(dirName):
+			modules[name] = 0, _CompileGenFile(dirName + ".py")
+			continue
+		if bGenerateChildren:
+			children = {}
+			for child in mod.CLSIDToPackageMap.itervalues():
+				children[child] = 1
+			for child in mod.VTablesToPackageMap.itervalues():
+				children[child] = 1
+			for child in sorted(children.keys()):
+				if not os.path.isfile(os.path.join(dirName, child + ".py")):
+					makepy.GenerateChildFromTypeLibSpec(child, demandGeneratedTypeLibraries.get(info, info))
+		modules[name] = 1, _CompileGenFile(os.path.join(dirName, "__init__.py"))
+		for fname in glob.glob(os.path.join(dirName, "*.py")):
+			child = os.path.splitext(os.path.basename(fname))[0]
+			if child != "__init__":
+				modules[name + "." + child] = 0, _CompileGenFile(fname)
+	f = open(fileName, "wb")
+	try:
+		f.write(bundleHeader.encode("ascii") + imp.get_magic())
+		f.write(marshal.dumps((index, modules)))
+	finally:
+		f.close()
+	if verbose:
+		print "Wrote %d modules to %s" % (len(modules), fileName)
+
+def LoadBundle(fileName):
+	"""Load a bundle written by MakeBundle.
+
+	The generated modules in the bundle are then imported from it, and the
+	CLSIDs they support are added to the cache (but not saved in the index file).
+	Raises ValueError if the bundle was written by another version of Python.
+	"""
+	f = open(fileName, "rb")
+	try:
+		data = f.read()
+	finally:
+		f.close()
+	index, modules = _ParseBundle(data)
+	_bundleImporter.add(index, modules)
+	clsidToTypelib.update(index)
+
+def DiscardBundledModules(typelibCLSID, lcid, major, minor):
+	"""Stop importing the module for a type library from a bundle.
+
+	Called when the module is regenerated.  If the bundle in the generated
+	directory holds it, that bundle is out of date and is deleted.
+	"""
+	name = GetGeneratedFileName(typelibCLSID, lcid, major, minor)
+	# Nothing may have been imported from our bundle yet, but it must still
+	# not be used after this.
+	_bundleImporter.loadGenPathBundle()
+	if _bundleImporter.discard(name) and not is_readonly:
+		try:
+			os.unlink(os.path.join(win32com.__gen_path__, bundleFileName))
+		except os.error:
+			pass
 
 def GetGeneratedFileName(clsid, lcid, major, minor):
 	"""Given the clsid, lcid, major and  minor for a type lib, return
@@ -385,6 +700,13 @@ def EnsureModule(typelibCLSID, lcid, major, minor, progressInstance = None, bVal
 	bForDemand -- Should a complete generation happen now, or on demand?
 	bBuildHidden -- Should hidden members/attributes etc be generated?
 	"""
+	# If we validated this module recently, don't look again.
+	validatedKey = str(typelibCLSID), lcid, major, minor
+	bRememberValidation = bValidateFile
+	if bValidateFile and validatedKey in _validatedModules:
+		module, validated = _validatedModules[validatedKey]
+		if validationInterval is None or time.time() - validated < validationInterval:
+			return module
 	bReloadNeeded = 0
 	try:
 		try:
@@ -520,6 +842,8 @@ def EnsureModule(typelibCLSID, lcid, major, minor, progressInstance = None, bVal
 		if bReloadNeeded:
 			module = reload(module)
 			AddModuleToCache(typelibCLSID, lcid, major, minor)
+	if bRememberValidation and module is not None:
+		_validatedModules[validatedKey] = module, time.time()
 	return module
 
 def EnsureDispatch(prog_id, bForDemand = 1): # New fn, so we default the new demand feature to on!
@@ -541,9 +865,18 @@ def EnsureDispatch(prog_id, bForDemand = 1): # New fn, so we default the new dem
 			raise TypeError("This COM object can not automate the makepy process - please run makepy manually for this object")
 	return disp
 
+def _ForgetValidatedModule(typelibCLSID, lcid, major, minor):
+	# The module has been (re)generated, so EnsureModule must not return the
+	# module it validated before.
+	clsid = str(typelibCLSID).upper()
+	for key in list(_validatedModules.keys()):
+		if key[0].upper() == clsid and key[1:] == (lcid, major, minor):
+			_validatedModules.pop(key, None)
+
 def AddModuleToCache(typelibclsid, lcid, major, minor, verbose = 1, bFlushNow = not is_readonly):
 	"""Add a newly generated file to the cache dictionary.
 	"""
+	_ForgetValidatedModule(typelibclsid, lcid, major, minor)
 	fname = GetGeneratedFileName(typelibclsid, lcid, major, minor)
 	mod = _GetModule(fname)
 	# if mod._in_gencache_ is already true, then we are reloading this
@@ -631,6 +964,9 @@ def Rebuild(verbose = 1):
 	"""Rebuild the cache indexes from the file system.
 	"""
 	clsidToTypelib.clear()
+	_validatedModules.clear()
+	_bundleImporter.loadGenPathBundle()
+	dict.update(clsidToTypelib, _bundleImporter.index)
 	infos = GetGeneratedInfos()
 	if verbose and len(infos): # Dont bother reporting this when directory is empty!
 		print "Rebuilding cache of generated files for COM support..."
@@ -661,11 +997,12 @@ __init__()
 
 def usage():
 	usageString = """\
-	  Usage: gencache [-q] [-d] [-r]
+	  Usage: gencache [-q] [-d] [-r] [-b]
 	  
 			 -q         - Quiet
 			 -d         - Dump the cache (typelibrary description and filename).
 			 -r         - Rebuild the cache dictionary from the existing .py files
+			 -b         - Write the compiled generated modules to gen_py.bundle
 	"""
 	print usageString
 	sys.exit(1)
@@ -673,7 +1010,7 @@ def usage():
 if __name__=='__main__':
 	import getopt
 	try:
-		opts, args = getopt.getopt(sys.argv[1:], "qrd")
+		opts, args = getopt.getopt(sys.argv[1:], "qrdb")
 	except getopt.error, message:
 		print message
 		usage()
@@ -688,5 +1025,7 @@ if __name__=='__main__':
 			_Dump()
 		if opt=='-r':
 			Rebuild(verbose)
+		if opt=='-b':
+			MakeBundle(verbose = verbose)
 		if opt=='-q':
 			verbose = 0
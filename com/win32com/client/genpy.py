@@ -16,9 +16,12 @@ The makepy command line etc handling is also getting large enough in its own rig
 import os
 import sys
 import time
+import io
+import cPickle as pickle
 import win32com
 
 import pythoncom
+import pywintypes
 import build
 
 error = "makepy.error"
@@ -28,6 +31,18 @@ GEN_FULL="full"
 GEN_DEMAND_BASE = "demand(base)"
 GEN_DEMAND_CHILD = "demand(child)"
 
+# The number of worker processes a Generator uses to build the items of a type
+# library - 0 builds them all in this process.  Each worker loads the type
+# library itself, builds the enumerations and interfaces for its share of the
+# type infos and sends them back pickled.  Everything else, and the writing,
+# is done here, in type info order, so the output matches a serial build.
+# As with any use of multiprocessing, the main module of the program must be
+# safe to import in the workers (ie, guarded by "if __name__=='__main__':")
+defaultWorkers = 0
+# Type libraries with fewer type infos than this are always built serially -
+# starting the workers would cost more than it saves.
+parallelMinTypeInfos = 100
+
 # This map is used purely for the users benefit -it shows the
 # raw, underlying type of Alias/Enums, etc.  The COM implementation
 # does not use this map at runtime - all Alias/Enum have already
@@ -292,7 +307,7 @@ class DispatchItem(build.DispatchItem, WritableItem):
         print >> stream, 'class ' + self.python_name + '(DispatchBaseClass):'
         if doc[1]: print >> stream, '\t' + build._makeDocString(doc[1])
         try:
-            progId = pythoncom.ProgIDFromCLSID(self.clsid)
+            progId = generator.progid_from_clsid(self.clsid)
             print >> stream, "\t# This class is creatable by the name '%s'" % (progId)
         except pythoncom.com_error:
             pass
@@ -311,7 +326,7 @@ class DispatchItem(build.DispatchItem, WritableItem):
         print >> stream, 'class ' + self.python_name + ':'
         if doc[1]: print >> stream, '\t' + build._makeDocString(doc[1])
         try:
-            progId = pythoncom.ProgIDFromCLSID(self.clsid)
+            progId = generator.progid_from_clsid(self.clsid)
             print >> stream, "\t# This class is creatable by the name '%s'" % (progId)
         except pythoncom.com_error:
             pass
@@ -582,7 +597,7 @@ class CoClassItem(build.OleItem, WritableItem):
         # And pretend we have written it - the name is now available as if we had!
         ref.bWritten = 1
     try:
-      progId = pythoncom.ProgIDFromCLSID(self.clsid)
+      progId = generator.progid_from_clsid(self.clsid)
       print >> stream, "# This CoClass is known by the name '%s'" % (progId)
     except pythoncom.com_error:
       pass
@@ -621,6 +636,102 @@ class CoClassItem(build.OleItem, WritableItem):
     self.bWritten = 1
     print >> stream
 
+# Support for building items in worker processes.
+class _TypeAttr(tuple):
+  "A picklable copy of the PyTYPEATTR of an item built by a worker"
+  typekind = property(lambda self: self[5])
+  wTypeFlags = property(lambda self: self[11])
+
+def _PersistentID(ob):
+  # IIDs can't be pickled, so they are sent as strings.
+  if type(ob) is pywintypes.IIDType:
+    return "iid:" + str(ob)
+  return None
+
+def _PersistentLoad(pid):
+  if pid.startswith("iid:"):
+    return pywintypes.IID(pid[4:])
+  raise pickle.UnpicklingError("Unknown persistent id %r" % (pid,))
+
+def _DescTuples(item):
+  """Replace any PyFUNCDESC or PyVARDESC held by an item with a tuple, which can
+  be pickled.  Writing the item only ever indexes the descs, so works the same."""
+  if item is None:
+    return
+  for name in ("mapVars", "propMap", "propMapGet", "propMapPut", "mapFuncs"):
+    for entry in getattr(item, name, {}).itervalues():
+      if entry.desc is not None:
+        entry.desc = tuple(entry.desc)
+  if hasattr(item, "vtableFuncs"):
+    item.vtableFuncs = [(names, dispid, tuple(desc)) for names, dispid, desc in item.vtableFuncs]
+
+def _DumpItems(items):
+  f = io.BytesIO()
+  p = pickle.Pickler(f, 2)
+  p.persistent_id = _PersistentID
+  p.dump(items)
+  return f.getvalue()
+
+def _LoadItems(data):
+  u = pickle.Unpickler(io.BytesIO(data))
+  u.persistent_load = _PersistentLoad
+  return u.load()
+
+_worker_typelib = None
+_worker_error = None
+
+def _InitWorker(sourceFilename, libSpec):
+  global _worker_typelib, _worker_error
+  guid, lcid, major, minor = libSpec
+  try:
+    tlb = None
+    if sourceFilename:
+      try:
+        tlb = pythoncom.LoadTypeLib(sourceFilename)
+        la = tlb.GetLibAttr()
+        if (str(la[0]), la[1], la[3], la[4]) != libSpec:
+          tlb = None
+      except pythoncom.com_error:
+        tlb = None
+    if tlb is None:
+      tlb = pythoncom.LoadRegTypeLib(pywintypes.IID(guid), major, minor, lcid)
+    _worker_typelib = tlb
+  except pythoncom.com_error, details:
+    _worker_error = "Can't load the type library %s - %s" % (guid, details)
+
+def _BuildItemsInWorker(indices):
+  """Build the items for the type infos at indices of the worker's type library.
+
+  Returns a list of (index, pickled items, error), where the pickled items are
+  None (and error says why) if the type info must be built by the caller.
+  """
+  if _worker_typelib is None:
+    raise RuntimeError(_worker_error)
+  gen = Generator(_worker_typelib, None, GeneratorProgress(), workers=0)
+  ret = []
+  for index in indices:
+    info = _worker_typelib.GetTypeInfo(index)
+    infotype = _worker_typelib.GetTypeInfoType(index)
+    doc = _worker_typelib.GetDocumentation(index)
+    attr = info.GetTypeAttr()
+    data = error = None
+    try:
+      if infotype == pythoncom.TKIND_ENUM or infotype == pythoncom.TKIND_MODULE:
+        items = EnumerationItem(info, attr, doc)
+        _DescTuples(items)
+      else:
+        items = gen._Build_Interface((info, infotype, doc, attr))
+        for item in items:
+          _DescTuples(item)
+        if items[0] is not None:
+          items[0].type_attr = _TypeAttr(items[0].type_attr)
+      data = _DumpItems(items)
+    except Exception, details:
+      # The caller builds it again, and reports this.
+      error = "%s: %s" % (details.__class__.__name__, details)
+    ret.append((index, data, error))
+  return ret
+
 class GeneratorProgress:
     def __init__(self):
         pass
@@ -650,8 +761,13 @@ class GeneratorProgress:
         pass
 
 class Generator:
-  def __init__(self, typelib, sourceFilename, progressObject, bBuildHidden=1, bUnicodeToString=None):
+  def __init__(self, typelib, sourceFilename, progressObject, bBuildHidden=1, bUnicodeToString=None, workers=None):
     assert bUnicodeToString is None, "this is deprecated and will go away"
+    if workers is None:
+      workers = defaultWorkers
+    self.workers = workers
+    # Interfaces built by the workers - {iid : (oleItem, vtableItem)}
+    self.builtInterfaces = {}
     self.bHaveWrittenDispatchBaseClass = 0
     self.bHaveWrittenCoClassBaseClass = 0
     self.bHaveWrittenEventBaseClass = 0
@@ -698,10 +814,13 @@ class Generator:
         if refAttr.typekind == pythoncom.TKIND_DISPATCH or \
            (refAttr.typekind == pythoncom.TKIND_INTERFACE and refAttr[11] & pythoncom.TYPEFLAG_FDISPATCHABLE):
           clsid = refAttr[0]
+          builtDispItem, builtVTableItem = self.builtInterfaces.get(clsid, (None, None))
           if clsid in oleItems:
             dispItem = oleItems[clsid]
           else:
-            dispItem = DispatchItem(refType, refAttr, doc)
+            dispItem = builtDispItem
+            if dispItem is None:
+              dispItem = DispatchItem(refType, refAttr, doc)
             oleItems[dispItem.clsid] = dispItem
           dispItem.coclass_clsid = coclass.clsid
           if flags & pythoncom.IMPLTYPEFLAG_FSOURCE:
@@ -711,16 +830,20 @@ class Generator:
             interfaces[dispItem.clsid] = (dispItem, flags)
           # If dual interface, make do that too.
           if clsid not in vtableItems and refAttr[11] & pythoncom.TYPEFLAG_FDUAL:
-            refType = refType.GetRefTypeInfo(refType.GetRefTypeOfImplType(-1))
-            refAttr = refType.GetTypeAttr()
-            assert refAttr.typekind == pythoncom.TKIND_INTERFACE, "must be interface bynow!"
-            vtableItem = VTableItem(refType, refAttr, doc)
+            vtableItem = builtVTableItem
+            if vtableItem is None:
+              refType = refType.GetRefTypeInfo(refType.GetRefTypeOfImplType(-1))
+              refAttr = refType.GetTypeAttr()
+              assert refAttr.typekind == pythoncom.TKIND_INTERFACE, "must be interface bynow!"
+              vtableItem = VTableItem(refType, refAttr, doc)
             vtableItems[clsid] = vtableItem
     coclass.sources = list(sources.values())
     coclass.interfaces = list(interfaces.values())
 
   def _Build_Interface(self, type_info_tuple):
     info, infotype, doc, attr = type_info_tuple
+    if attr[0] in self.builtInterfaces:
+      return self.builtInterfaces[attr[0]]
     oleItem = vtableItem = None
     if infotype == pythoncom.TKIND_DISPATCH or \
        (infotype == pythoncom.TKIND_INTERFACE and attr[11] & pythoncom.TYPEFLAG_FDISPATCHABLE):
@@ -739,18 +862,68 @@ class Generator:
         vtableItem = VTableItem(info, attr, doc)
     return oleItem, vtableItem
 
+  def _BuildItemsInParallel(self, infos):
+    """Build the enumerations and interfaces of infos in worker processes.
+
+    Returns a dictionary of {index in infos : items}, where items is an
+    EnumerationItem or the (oleItem, vtableItem) of an interface.  Anything
+    missing (everything, if the workers can't be used) must be built here.
+    """
+    indices = []
+    for index, (info, infotype, doc, attr) in enumerate(infos):
+      if infotype in [pythoncom.TKIND_ENUM, pythoncom.TKIND_MODULE,
+                      pythoncom.TKIND_DISPATCH, pythoncom.TKIND_INTERFACE]:
+        indices.append(index)
+    if self.workers < 2 or len(indices) < parallelMinTypeInfos:
+      return {}
+    import multiprocessing
+    la = self.typelib.GetLibAttr()
+    libSpec = str(la[0]), la[1], la[3], la[4]
+    # Several chunks per worker, so one slow chunk doesn't hold up the rest.
+    numChunks = self.workers * 4
+    chunks = [indices[i::numChunks] for i in range(numChunks)]
+    self.progress.VerboseProgress("Building %d type infos in %d worker processes" % (len(indices), self.workers))
+    try:
+      pool = multiprocessing.Pool(self.workers, _InitWorker, (self.sourceFilename, libSpec))
+      try:
+        results = pool.map(_BuildItemsInWorker, chunks)
+      finally:
+        pool.terminate()
+    except Exception, details:
+      self.progress.LogWarning("Building in worker processes failed (%s) - building serially" % (details,))
+      return {}
+    ret = {}
+    for chunk in results:
+      for index, data, error in chunk:
+        if data is not None:
+          try:
+            ret[index] = _LoadItems(data)
+            continue
+          except Exception, details:
+            error = "can't load the items sent back - %s: %s" % (details.__class__.__name__, details)
+        self.progress.LogWarning("Type info %d was not built in a worker process (%s) - building it here" % (index, error))
+    return ret
+
   def BuildOleItemsFromType(self):
     assert self.bBuildHidden, "This code doesnt look at the hidden flag - I thought everyone set it true!?!?!"
     oleItems = {}
     enumItems = {}
     recordItems = {}
     vtableItems = {}
-    
-    for type_info_tuple in self.CollectOleItemInfosFromType():
+
+    infos = self.CollectOleItemInfosFromType()
+    built = self._BuildItemsInParallel(infos)
+    for index, items in built.iteritems():
+      if not isinstance(items, EnumerationItem):
+        self.builtInterfaces[infos[index][3][0]] = items
+
+    for index, type_info_tuple in enumerate(infos):
       info, infotype, doc, attr = type_info_tuple
       clsid = attr[0]
       if infotype == pythoncom.TKIND_ENUM or infotype == pythoncom.TKIND_MODULE:
-        newItem = EnumerationItem(info, attr, doc)
+        newItem = built.get(index)
+        if newItem is None:
+          newItem = EnumerationItem(info, attr, doc)
         enumItems[newItem.doc[0]] = newItem
       # We never hide interfaces (MSAccess, for example, nominates interfaces as
       # hidden, assuming that you only ever use them via the CoClass)
@@ -772,9 +945,16 @@ class Generator:
         oleItems[newItem.clsid] = newItem
       else:
         self.progress.LogWarning("Unknown TKIND found: %d" % infotype)
-  
+
+    self.builtInterfaces = {}
     return oleItems, enumItems, recordItems, vtableItems
 
+  def progid_from_clsid(self, clsid):
+    # A type library replayed from a snapshot (see tlbsnapshot) answers from
+    # the snapshot, rather than the registry of this machine.
+    lookup = getattr(self.typelib, "ProgIDFromCLSID", pythoncom.ProgIDFromCLSID)
+    return lookup(clsid)
+
   def open_writer(self, filename, encoding="mbcs"):
     # A place to put code to open a file with the appropriate encoding.
     # Does *not* set self.file - just opens and returns a file.
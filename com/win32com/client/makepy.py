@@ -24,7 +24,7 @@ usageHelp = """ \
 
 Usage:
 
-  makepy.py [-i] [-v|q] [-h] [-u] [-o output_file] [-d] [typelib, ...]
+  makepy.py [-i] [-v|q] [-h] [-u] [-o output_file] [-d] [-j workers] [typelib, ...]
   
   -i    -- Show information for the specified typelib.
   
@@ -47,6 +47,9 @@ Usage:
   -d    -- Generate the base code now and the class code on demand.
            Recommended for large type libraries.
            
+  -j    -- Build the definitions using the specified number of worker
+           processes.  Speeds up very large type libraries.
+           
   typelib -- A TLB, DLL, OCX or anything containing COM type information.
              If a typelib is not specified, a window containing a textbox
              will open from which you can select a registered type
@@ -210,7 +213,7 @@ def GetTypeLibsForSpec(arg):
 		tb = None # Storing tb in a local is a cycle!
 		sys.exit(1)
 
-def GenerateFromTypeLibSpec(typelibInfo, file = None, verboseLevel = None, progressInstance = None, bUnicodeToString=None, bForDemand = bForDemandDefault, bBuildHidden = 1):
+def GenerateFromTypeLibSpec(typelibInfo, file = None, verboseLevel = None, progressInstance = None, bUnicodeToString=None, bForDemand = bForDemandDefault, bBuildHidden = 1, workers = None):
 	assert bUnicodeToString is None, "this is deprecated and will go away"
 	if verboseLevel is None:
 		verboseLevel = 0 # By default, we use no gui and no verbose level!
@@ -252,9 +255,10 @@ def GenerateFromTypeLibSpec(typelibInfo, file = None, verboseLevel = None, progr
 	bToGenDir = (file is None)
 
 	for typelib, info in typelibs:
-		gen = genpy.Generator(typelib, info.dll, progress, bBuildHidden=bBuildHidden)
+		gen = genpy.Generator(typelib, info.dll, progress, bBuildHidden=bBuildHidden, workers=workers)
 
 		if file is None:
+			gencache.DiscardBundledModules(info.clsid, info.lcid, info.major, info.minor)
 			this_name = gencache.GetGeneratedFileName(info.clsid, info.lcid, info.major, info.minor)
 			full_name = os.path.join(gencache.GetGeneratePath(), this_name)
 			if bForDemand:
@@ -327,8 +331,9 @@ def main():
 	verboseLevel = 1
 	doit = 1
 	bForDemand = bForDemandDefault
+	workers = None
 	try:
-		opts, args = getopt.getopt(sys.argv[1:], 'vo:huiqd')
+		opts, args = getopt.getopt(sys.argv[1:], 'vo:huiqdj:')
 		for o,v in opts:
 			if o=='-h':
 				hiddenSpec = 0
@@ -347,6 +352,11 @@ def main():
 				doit = 0
 			elif o=='-d':
 				bForDemand = not bForDemand
+			elif o=='-j':
+				try:
+					workers = int(v)
+				except ValueError:
+					raise getopt.error("-j needs a number of worker processes")
 
 	except (getopt.error, error), msg:
 		sys.stderr.write (str(msg) + "\n")
@@ -377,7 +387,7 @@ def main():
 		f = None
 
 	for arg in args:
-		GenerateFromTypeLibSpec(arg, f, verboseLevel = verboseLevel, bForDemand = bForDemand, bBuildHidden = hiddenSpec)
+		GenerateFromTypeLibSpec(arg, f, verboseLevel = verboseLevel, bForDemand = bForDemand, bBuildHidden = hiddenSpec, workers = workers)
 
 	if f:	
 		f.close()
@@ -0,0 +1,419 @@
+"""Snapshots of type libraries, for benchmarking and testing makepy.
+
+A snapshot records everything genpy and build read from a type library (and
+from the type infos it references in other libraries) - the type attributes,
+function and variable descriptions, names, documentation and references.  It
+can be saved to a file, and a ReplayTypeLib made from it can be handed to
+genpy.Generator in place of the real type library.  The generated code is the
+same, but no type library is loaded and no ITypeInfo method is called, so
+code generation can be profiled and benchmarked without the type library (or
+the application that installs it) being present.
+
+Snapshots hold only plain Python objects (IIDs are kept as strings), so they
+can be loaded, and replayed, without pywin32.  The ProgIDs of the classes are
+captured too, and a replayed type library answers with those rather than the
+registry of the machine it is replayed on.
+
+Usage:
+
+  tlbsnapshot.py -o snapshot_file typelib
+
+    Capture a snapshot of the type library (a file or description, as for
+    makepy.py) into snapshot_file.
+
+  tlbsnapshot.py [-n count] [-o output_file] snapshot_file
+
+    Generate code from the snapshot count times (default 3) and print the
+    time taken.  With -o, the code is written to output_file.
+"""
+
+import sys
+import time
+import cPickle as pickle
+try:
+	from pythoncom import com_error
+	from pywintypes import IID as _IID
+except ImportError:
+	# Without pywin32 a snapshot can still be loaded and replayed.
+	class com_error(Exception):
+		pass
+	_IID = str
+
+snapshotHeader = "win32com typelib snapshot 2\n"
+
+# The pythoncom and winerror constants used here.
+VT_PTR = 26
+VT_SAFEARRAY = 27
+VT_USERDEFINED = 29
+TYPEFLAG_FDUAL = 0x40
+TYPE_E_ELEMENTNOTFOUND = -2147319765
+REGDB_E_CLASSNOTREG = -2147221164
+
+# The fields of the description objects, in the order of their tuple form.
+typeAttrFields = ("iid", "lcid", "memidConstructor", "memidDestructor",
+                  "cbSizeInstance", "typekind", "cFuncs", "cVars", "cImplTypes",
+                  "cbSizeVft", "cbAlignment", "wTypeFlags", "wMajorVerNum",
+                  "wMinorVerNum", "tdescAlias", "idldescType")
+funcDescFields = ("memid", "scodeArray", "args", "funckind", "invkind",
+                  "callconv", "cParamsOpt", "oVft", "rettype", "wFuncFlags")
+varDescFields = ("memid", "value", "elemdescVar", "wVarFlags", "varkind")
+
+def _TypeDescRefs(tdesc, refs):
+	# Add the hrefs of the user defined types in a TYPEDESC to refs.
+	while type(tdesc) == tuple:
+		if tdesc[0] == VT_USERDEFINED:
+			refs.append(tdesc[1])
+			return
+		if tdesc[0] not in (VT_PTR, VT_SAFEARRAY):
+			return
+		tdesc = tdesc[1]
+
+def _PlainAttr(attr):
+	# A TYPEATTR or TLIBATTR as a tuple, with the IID as a string.
+	attr = tuple(attr)
+	return (str(attr[0]),) + attr[1:]
+
+class _Capturer:
+	def __init__(self, typelib):
+		la = typelib.GetLibAttr()
+		self.libKey = str(la[0]), la[1], la[3], la[4]
+		self.snapshot = {"libattr": _PlainAttr(la),
+		                 "doc": typelib.GetDocumentation(-1),
+		                 "infos": [],
+		                 "external": {},
+		                 "progids": {}}
+		self.pending = [] # [(info, entry, bFull)]
+		for i in range(typelib.GetTypeInfoCount()):
+			entry = {"doc": typelib.GetDocumentation(i)}
+			self.snapshot["infos"].append(entry)
+			self.pending.append((typelib.GetTypeInfo(i), entry, 1))
+
+	def capture(self):
+		while self.pending:
+			info, entry, bFull = self.pending.pop()
+			self.captureInfo(info, entry, bFull)
+		# genpy looks up the ProgIDs of our classes and interfaces.
+		import pythoncom
+		progids = self.snapshot["progids"]
+		for entry in self.snapshot["infos"]:
+			iid = entry["attr"][0]
+			try:
+				progids[iid] = pythoncom.ProgIDFromCLSID(iid)
+			except com_error:
+				pass
+		return self.snapshot
+
+	def captureInfo(self, info, entry, bFull):
+		# A "full" entry has everything; others (external type infos only
+		# used to resolve types) just enough to resolve them.
+		if "attr" not in entry:
+			attr = info.GetTypeAttr()
+			entry["attr"] = _PlainAttr(attr)
+			entry["refs"] = {}
+			entry["full"] = 0
+			refs = []
+			_TypeDescRefs(attr.tdescAlias, refs)
+			self.captureRefs(info, entry, refs, 0)
+		if not bFull or entry["full"]:
+			return
+		entry["full"] = 1
+		attr = entry["attr"]
+		funcs = entry["funcs"] = []
+		vars = entry["vars"] = []
+		names = entry["names"] = {}
+		docs = entry["docs"] = {}
+		refs = []
+		for j in range(attr[6]):
+			fdesc = info.GetFuncDesc(j)
+			funcs.append(tuple(fdesc))
+			_TypeDescRefs(fdesc.rettype[0], refs)
+			for arg in fdesc.args:
+				_TypeDescRefs(arg[0], refs)
+			self.captureMember(info, fdesc.memid, names, docs)
+		for j in range(attr[7]):
+			vdesc = info.GetVarDesc(j)
+			vars.append(tuple(vdesc))
+			_TypeDescRefs(vdesc.elemdescVar[0], refs)
+			self.captureMember(info, vdesc.memid, names, docs)
+		self.captureRefs(info, entry, refs, 0)
+		implTypes = entry["implTypes"] = {}
+		implRefs = []
+		indexes = list(range(attr[8]))
+		if attr[11] & TYPEFLAG_FDUAL:
+			indexes.append(-1)
+		for j in indexes:
+			try:
+				href = info.GetRefTypeOfImplType(j)
+				flags = 0
+				if j >= 0:
+					flags = info.GetImplTypeFlags(j)
+			except com_error, details:
+				implTypes[j] = details.hresult
+				continue
+			implTypes[j] = flags, href
+			implRefs.append(href)
+		self.captureRefs(info, entry, implRefs, 1)
+
+	def captureMember(self, info, memid, names, docs):
+		for method, results in ((info.GetNames, names), (info.GetDocumentation, docs)):
+			if memid in results:
+				continue
+			try:
+				results[memid] = method(memid)
+			except com_error, details:
+				results[memid] = details.hresult
+
+	def captureRefs(self, info, entry, refs, bFull):
+		for href in refs:
+			if href in entry["refs"] and not bFull:
+				continue
+			try:
+				refInfo = info.GetRefTypeInfo(href)
+				tlb, index = refInfo.GetContainingTypeLib()
+				la = tlb.GetLibAttr()
+			except com_error, details:
+				entry["refs"][href] = details.hresult
+				continue
+			key = str(la[0]), la[1], la[3], la[4], index
+			if key[:4] == self.libKey:
+				# Our own type infos are all captured anyway.
+				entry["refs"][href] = index
+				continue
+			entry["refs"][href] = key
+			external = self.snapshot["external"]
+			if key not in external:
+				external[key] = {"doc": refInfo.GetDocumentation(-1)}
+			self.pending.append((refInfo, external[key], bFull))
+
+def Capture(typelib):
+	"""Return a snapshot of everything makepy reads from a type library.
+
+	The snapshot is a dictionary of plain Python objects.
+	"""
+	return _Capturer(typelib).capture()
+
+def Save(snapshot, fileName):
+	"""Save a snapshot to a file."""
+	f = open(fileName, "wb")
+	try:
+		f.write(snapshotHeader.encode("ascii"))
+		pickle.dump(snapshot, f, 2)
+	finally:
+		f.close()
+
+def Load(fileName):
+	"""Load a snapshot saved by Save."""
+	f = open(fileName, "rb")
+	try:
+		data = f.read()
+	finally:
+		f.close()
+	header = snapshotHeader.encode("ascii")
+	if not data.startswith(header):
+		raise ValueError("%s is not a type library snapshot" % (fileName,))
+	return pickle.loads(data[len(header):])
+
+def _Error(hresult):
+	return com_error(hresult, "Replayed error", None, None)
+
+class _Desc:
+	"""A mutable description (TYPEATTR, FUNCDESC or VARDESC) which can be
+	used as a sequence or by field name, like the pythoncom objects."""
+	def __init__(self, fields, values):
+		self.__dict__["_fields"] = fields
+		self.__dict__.update(zip(fields, values))
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return tuple(self)[index]
+		return getattr(self, self._fields[index])
+	def __len__(self):
+		return len(self._fields)
+	def __iter__(self):
+		for name in self._fields:
+			yield getattr(self, name)
+	def __repr__(self):
+		return "<%s>" % (", ".join(["%s=%r" % (name, getattr(self, name)) for name in self._fields]),)
+
+class ReplayTypeInfo:
+	"""Stands in for a PyITypeInfo, answering from a snapshot."""
+	def __init__(self, typelib, entry, index):
+		self._typelib = typelib
+		self._entry = entry
+		self._index = index
+
+	def _full(self, what):
+		# Only the external type infos referenced by types are partial - and
+		# makepy never looks inside those.
+		if not self._entry["full"]:
+			raise _Error(TYPE_E_ELEMENTNOTFOUND)
+		return self._entry[what]
+
+	def GetTypeAttr(self):
+		attr = self._entry["attr"]
+		return _Desc(typeAttrFields, (_IID(attr[0]),) + attr[1:])
+
+	def GetDocumentation(self, memid):
+		if memid == -1:
+			return self._entry["doc"]
+		return self._member("docs", memid)
+
+	def GetNames(self, memid):
+		return self._member("names", memid)
+
+	def _member(self, what, memid):
+		result = self._full(what).get(memid, TYPE_E_ELEMENTNOTFOUND)
+		if type(result) == int:
+			raise _Error(result)
+		return result
+
+	def GetFuncDesc(self, index):
+		return _Desc(funcDescFields, self._full("funcs")[index])
+
+	def GetVarDesc(self, index):
+		return _Desc(varDescFields, self._full("vars")[index])
+
+	def _implType(self, index):
+		result = self._full("implTypes").get(index, TYPE_E_ELEMENTNOTFOUND)
+		if type(result) == int:
+			raise _Error(result)
+		return result
+
+	def GetImplTypeFlags(self, index):
+		return self._implType(index)[0]
+
+	def GetRefTypeOfImplType(self, index):
+		return self._implType(index)[1]
+
+	def GetRefTypeInfo(self, href):
+		# A reference is the index of one of our type infos, the key of an
+		# external one, or the (negative) HRESULT of the failure to get it.
+		try:
+			ref = self._entry["refs"][href]
+		except KeyError:
+			raise _Error(TYPE_E_ELEMENTNOTFOUND)
+		if type(ref) == tuple:
+			return self._typelib._GetExternal(ref)
+		if ref < 0:
+			raise _Error(ref)
+		return self._typelib.GetTypeInfo(ref)
+
+	def GetContainingTypeLib(self):
+		if self._index is None:
+			raise _Error(TYPE_E_ELEMENTNOTFOUND)
+		return self._typelib, self._index
+
+class ReplayTypeLib:
+	"""Stands in for a PyITypeLib, answering from a snapshot."""
+	def __init__(self, snapshot):
+		self._snapshot = snapshot
+		self._infos = {}
+
+	def GetLibAttr(self):
+		la = self._snapshot["libattr"]
+		return (_IID(la[0]),) + la[1:]
+
+	def ProgIDFromCLSID(self, clsid):
+		"""Stands in for pythoncom.ProgIDFromCLSID when generating code (see
+		genpy.Generator), answering with the ProgIDs captured."""
+		try:
+			return self._snapshot["progids"][str(clsid)]
+		except KeyError:
+			raise _Error(REGDB_E_CLASSNOTREG)
+
+	def GetDocumentation(self, index):
+		if index == -1:
+			return self._snapshot["doc"]
+		return self._snapshot["infos"][index]["doc"]
+
+	def GetTypeInfoCount(self):
+		return len(self._snapshot["infos"])
+
+	def GetTypeInfoType(self, index):
+		return self._snapshot["infos"][index]["attr"][5]
+
+	def GetTypeInfo(self, index):
+		try:
+			return self._infos[index]
+		except KeyError:
+			info = self._infos[index] = ReplayTypeInfo(self, self._snapshot["infos"][index], index)
+			return info
+
+	def _GetExternal(self, key):
+		try:
+			return self._infos[key]
+		except KeyError:
+			info = self._infos[key] = ReplayTypeInfo(self, self._snapshot["external"][key], None)
+			return info
+
+class _NullWriter:
+	"The file genpy writes to when benchmarking without output"
+	encoding = "mbcs"
+	def write(self, text):
+		pass
+
+def Benchmark(snapshot, count = 3, file = None):
+	"""Generate code from a snapshot count times, returning the times taken.
+
+	The code is written to file (which must have an encoding attribute, as
+	for genpy), or discarded if file is None.
+	"""
+	import genpy
+	times = []
+	for i in range(count):
+		gen = genpy.Generator(ReplayTypeLib(snapshot), None, genpy.GeneratorProgress())
+		start = time.clock()
+		if file is not None and i == 0:
+			gen.generate(file)
+		else:
+			gen.generate(_NullWriter())
+		times.append(time.clock() - start)
+	return times
+
+def usage():
+	sys.stderr.write(__doc__)
+	sys.exit(2)
+
+def main():
+	import getopt
+	try:
+		opts, args = getopt.getopt(sys.argv[1:], "o:n:")
+	except getopt.error, msg:
+		sys.stderr.write(str(msg) + "\n")
+		usage()
+	if len(args) != 1:
+		usage()
+	outputName = None
+	count = None
+	for o, v in opts:
+		if o == "-o":
+			outputName = v
+		elif o == "-n":
+			count = int(v)
+	try:
+		snapshot = Load(args[0])
+	except (IOError, ValueError):
+		snapshot = None
+	if snapshot is None:
+		# Not a snapshot - capture the type library.
+		import makepy
+		if outputName is None:
+			usage()
+		for typelib, spec in makepy.GetTypeLibsForSpec(args[0]):
+			Save(Capture(typelib), outputName)
+			print "Captured '%s' into %s" % (spec.desc, outputName)
+			break
+		return
+	f = None
+	if outputName is not None:
+		import codecs
+		f = codecs.open(outputName, "w", "mbcs")
+	try:
+		times = Benchmark(snapshot, count or 3, f)
+	finally:
+		if f is not None:
+			f.close()
+	print "Generated %d times: best %.3f, mean %.3f seconds" % \
+	      (len(times), min(times), sum(times) / len(times))
+
+if __name__=='__main__':
+	main()
@@ -3,21 +3,43 @@
 This module contains utility functions, used primarily by advanced COM
 programmers, or other COM modules.
 """
+import copy
 import pythoncom
 from win32com.client import Dispatch, _get_good_object_
 
 PyIDispatchType = pythoncom.TypeIIDs[pythoncom.IID_IDispatch]
 
-def WrapEnum(ob, resultCLSID = None):
+# Enumerators are read in batches, so a large collection in another process
+# does not cost a round trip per item.  The first batch is of
+# initialBatchSize items, and each batch is twice the size of the last, up to
+# maxBatchSize - so fetching just the first few items stays cheap.
+initialBatchSize = 1
+maxBatchSize = 1024
+
+def _NextBatch(enum, count):
+	"""Call enum.Next(count), returning (items, count for the next batch).
+
+	Some enumerators can't return more than one item at a time - they are
+	then read one item at a time from then on."""
+	try:
+		items = enum.Next(count)
+	except pythoncom.com_error:
+		if count == 1:
+			raise
+		return enum.Next(1), 1
+	return items, min(count * 2, maxBatchSize)
+
+def WrapEnum(ob, resultCLSID = None, materialize = False):
 	"""Wrap an object in a VARIANT enumerator.  
 
 	All VT_DISPATCHs returned by the enumerator are converted to wrapper objects
 	(which may be either a class instance, or a dynamic.Dispatch type object).
 
+	If materialize is true, every item fetched is kept - see Enumerator.
 	"""
 	if type(ob) != pythoncom.TypeIIDs[pythoncom.IID_IEnumVARIANT]:
 		ob = ob.QueryInterface(pythoncom.IID_IEnumVARIANT)
-	return EnumVARIANT(ob, resultCLSID)
+	return EnumVARIANT(ob, resultCLSID, materialize)
 
 class Enumerator:
 	"""A class that provides indexed access into an Enumerator
@@ -25,14 +47,23 @@ class Enumerator:
 	By wrapping a PyIEnum* object in this class, you can perform
 	natural looping and indexing into the Enumerator.
 
-	Looping is very efficient, but it should be noted that although random 
-	access is supported, the underlying object is still an enumerator, so 
-	this will force many reset-and-seek operations to find the requested index.
+	Looping is very efficient, as items are fetched in batches (see
+	maxBatchSize).  Random access is supported, but the underlying object is
+	still an enumerator - going back beyond the current batch forces a
+	reset-and-seek.  If materialize is true, every item fetched is kept, so
+	any index can be revisited without going back to the enumerator.
 
 	"""
-	def __init__(self, enum):
+	def __init__(self, enum, materialize = False):
 		self._oleobj_ = enum # a PyIEnumVARIANT
-		self.index = -1
+		self.index = -1 # the last index returned.
+		self.materialize = materialize
+		# The items fetched so far which we still have, and the index of the
+		# first.  The underlying enumerator is always positioned just after
+		# the last of them.
+		self._items_ = []
+		self._first_ = 0
+		self._batchSize_ = initialBatchSize
 	def __getitem__(self, index):
 		return self.__GetIndex(index)
 	def __call__(self, index):
@@ -40,45 +71,87 @@ class Enumerator:
 	
 	def __GetIndex(self, index):
 		if type(index)!=type(0): raise TypeError("Only integer indexes are supported for enumerators")
-		# NOTE
-		# In this context, self.index is users purely as a flag to say 
-		# "am I still in sequence".  The user may call Next() or Reset() if they
-		# so choose, in which case self.index will not be correct (although we
-		# still want to stay in sequence)
-		if index != self.index + 1:
-			# Index requested out of sequence.
+		if index < 0: raise IndexError("list index out of range")
+		items = self._items_
+		pos = index - self._first_
+		if pos < 0:
+			# Index before the items we have - start again.
 			self._oleobj_.Reset()
 			if index: self._oleobj_.Skip(index) # if asked for item 1, must skip 1, Python always zero based.
+			self._first_, pos = index, 0
+			self._batchSize_ = initialBatchSize
+			del items[:]
+		elif pos > len(items) and not self.materialize:
+			# Index beyond the items we have - no need to fetch those between.
+			self._oleobj_.Skip(pos - len(items))
+			self._first_, pos = index, 0
+			del items[:]
+		while pos >= len(items):
+			batch, self._batchSize_ = _NextBatch(self._oleobj_, self._batchSize_)
+			if not len(batch):
+				raise IndexError("list index out of range")
+			if not self.materialize:
+				self._first_ = self._first_ + len(items)
+				pos = pos - len(items)
+				del items[:]
+			items.extend(batch)
 		self.index = index
-		result = self._oleobj_.Next(1)
-		if len(result):
-			return self._make_retval_(result[0])
-		raise IndexError("list index out of range")
+		return self._make_retval_(items[pos])
 	def Next(self, count=1):
-		ret = self._oleobj_.Next(count)
+		# Carries on from the last item returned, by Next() or by index.
 		realRets = []
-		for r in ret:
-			realRets.append(self._make_retval_(r))
-		return tuple(realRets) # Convert back to tuple.
+		for index in range(self.index + 1, self.index + 1 + count):
+			try:
+				realRets.append(self.__GetIndex(index))
+			except IndexError:
+				break
+		return tuple(realRets)
 	def Reset(self):
-		return self._oleobj_.Reset()
+		self.index = -1
+		if not self.materialize: # start reading from the enumerator again.
+			self._oleobj_.Reset()
+			self._first_ = 0
+			self._batchSize_ = initialBatchSize
+			del self._items_[:]
 	def Clone(self):
-		return self.__class__( self._oleobj_.Clone(), self.resultCLSID)
+		# The clone starts at our position, with a copy of the items we have.
+		enum = self._oleobj_.Clone()
+		enum.Reset() # we don't know the position of our clone, so seek.
+		skip = self._first_ + len(self._items_)
+		if skip: enum.Skip(skip)
+		clone = copy.copy(self)
+		clone._oleobj_ = enum
+		clone._items_ = self._items_[:]
+		return clone
 	def _make_retval_(self, result):
 		return result
 
 class EnumVARIANT(Enumerator):
-	def __init__(self, enum, resultCLSID = None):
+	def __init__(self, enum, resultCLSID = None, materialize = False):
 		self.resultCLSID = resultCLSID
-		Enumerator.__init__(self, enum)
+		Enumerator.__init__(self, enum, materialize)
 	def _make_retval_(self, result):
 		return _get_good_object_(result, resultCLSID = self.resultCLSID)
 
 class Iterator:
+	"""An iterator over an IEnumVARIANT, fetching the items in batches."""
 	def __init__(self, enum, resultCLSID = None):
 		self.resultCLSID = resultCLSID
-		self._iter_ = iter(enum.QueryInterface(pythoncom.IID_IEnumVARIANT))
+		self._enum_ = enum.QueryInterface(pythoncom.IID_IEnumVARIANT)
+		self._batch_ = ()
+		self._pos_ = 0
+		self._batchSize_ = initialBatchSize
 	def __iter__(self):
 		return self
 	def next(self):
-		return _get_good_object_(self._iter_.next(), resultCLSID = self.resultCLSID)
+		if self._pos_ >= len(self._batch_):
+			if self._enum_ is None:
+				raise StopIteration
+			self._batch_, self._batchSize_ = _NextBatch(self._enum_, self._batchSize_)
+			self._pos_ = 0
+			if not len(self._batch_):
+				self._enum_ = None # done - don't ask again.
+				raise StopIteration
+		item = self._batch_[self._pos_]
+		self._pos_ = self._pos_ + 1
+		return _get_good_object_(item, resultCLSID = self.resultCLSID)
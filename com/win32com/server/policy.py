@@ -72,6 +72,8 @@ import win32api
 import winerror
 import sys
 import types
+import inspect
+import weakref
 import pywintypes
 import win32con, pythoncom
 
@@ -90,6 +92,20 @@ IUnknownType = pythoncom.TypeIIDs[pythoncom.IID_IUnknown]
 from exception import COMException
 error = __name__ + " error"
 
+# The dispatch tables DesignatedWrapPolicy builds for a class of object,
+# shared by every object of that class it wraps.  Only weakly keyed, so
+# classes made on the fly (eg, by WithEvents) can still go away.
+# {object class : {policy class : (name_to_dispid, dispid_to_func, dispid_to_get,
+#                                  dispid_to_put, dispid_to_class_func)}}
+_dispatch_tables = weakref.WeakKeyDictionary()
+
+# The attributes of an object which determine its dispatch tables.  If an
+# object has any of them itself (rather than from its class) it gets its own.
+_dispatch_table_attrs = ('_public_methods_', '_public_attrs_', '_readonly_attrs_',
+                         '_typelib_guid_', '_typelib_version_', '_typelib_lcid_',
+                         '_com_interfaces_', '_dispid_to_func_', '_dispid_to_get_',
+                         '_dispid_to_put_', '_value_', '_NewEnum', '_Evaluate')
+
 regSpec = 'CLSID\\%s\\PythonCOM'
 regPolicy = 'CLSID\\%s\\PythonCOMPolicy'
 regDispatcher = 'CLSID\\%s\\PythonCOMDispatcher'
@@ -451,6 +467,18 @@ class DesignatedWrapPolicy(MappedWrapPolicy):
                   See the COM documentation for details.
   """
   def _wrap_(self, ob):
+    # Objects of the same class share the dispatch tables.
+    klass = self._dispatch_tables_key_(ob)
+    tables = None
+    if klass is not None:
+      tables = _dispatch_tables.get(klass, {}).get(self.__class__)
+    if tables is not None:
+      BasicWrapPolicy._wrap_(self, ob)
+      self._name_to_dispid_, self._dispid_to_func_, self._dispid_to_get_, \
+          self._dispid_to_put_, self._dispid_to_class_func_ = tables
+      self._obj_dict_ = ob.__dict__
+      self._typeinfos_ = None # load these on demand.
+      return
     # If we have nominated universal interfaces to support, load them now
     tlb_guid = getattr(ob, '_typelib_guid_', None)
     if tlb_guid is not None:
@@ -525,6 +553,50 @@ class DesignatedWrapPolicy(MappedWrapPolicy):
         next_dispid = self._allocnextdispid(next_dispid)
       self._dispid_to_func_[dispid] = name
     self._typeinfos_ = None # load these on demand.
+    # dispid -> the method's function (or other descriptor) in the class,
+    # see _invokeex_.  Only kept when the tables are shared.
+    self._dispid_to_class_func_ = None
+    if klass is not None:
+      self._dispid_to_class_func_ = {}
+      self._obj_dict_ = ob.__dict__
+      _dispatch_tables.setdefault(klass, {})[self.__class__] = \
+          (self._name_to_dispid_, self._dispid_to_func_, self._dispid_to_get_,
+           self._dispid_to_put_, self._dispid_to_class_func_)
+
+  def _dispatch_tables_key_(self, ob):
+    """Return the class whose objects share ob's dispatch tables, or None if
+       they can't be shared (ie, the object itself sets attributes used to build
+       them, or may compute attributes on the fly)"""
+    klass = getattr(ob, '__class__', None)
+    if klass is None or hasattr(klass, '__getattr__'):
+      return None
+    try:
+      ob_dict = ob.__dict__
+    except AttributeError:
+      return None
+    for name in _dispatch_table_attrs:
+      if name in ob_dict:
+        return None
+    return klass
+
+  def _find_method_(self, dispid, funcname):
+    """Return the method funcname of the wrapped object.  The function is
+       found in the class once for each dispid, and bound on every call, so an
+       object which sets its own attribute of that name still gets it."""
+    class_funcs = self._dispid_to_class_func_
+    if class_funcs is None or funcname in self._obj_dict_:
+      return getattr(self._obj_, funcname)
+    func = class_funcs.get(dispid)
+    if func is None:
+      for klass in inspect.getmro(self._obj_.__class__):
+        func = klass.__dict__.get(funcname)
+        if func is not None:
+          break
+      if not hasattr(func, '__get__') or hasattr(func, '__set__'):
+        # Not found, or a data descriptor - just ask the object every time.
+        return getattr(self._obj_, funcname)
+      class_funcs[dispid] = func
+    return func.__get__(self._obj_, self._obj_.__class__)
 
   def _build_typeinfos_(self):
     # Can only ever be one for now.
@@ -569,6 +641,7 @@ class DesignatedWrapPolicy(MappedWrapPolicy):
     ### note: lcid is being ignored...
 
     if wFlags & DISPATCH_METHOD:
+      func = None
       try:
         funcname = self._dispid_to_func_[dispid]
       except KeyError:
@@ -576,10 +649,11 @@ class DesignatedWrapPolicy(MappedWrapPolicy):
           raise COMException(scode=winerror.DISP_E_MEMBERNOTFOUND)	# not found
       else:
         try:
-          func = getattr(self._obj_, funcname)
+          func = self._find_method_(dispid, funcname)
         except AttributeError:
           # May have a dispid, but that doesnt mean we have the function!
           raise COMException(scode=winerror.DISP_E_MEMBERNOTFOUND)
+      if func is not None:
         # Should check callable here
         try:
             return func(*args)
@@ -84,6 +84,39 @@ class Tester(win32com.test.util.TestCase):
     def testIDispatchEx(self):
         dispexob = self.ob._oleobj_.QueryInterface(pythoncom.IID_IDispatchEx)
         DispExTest(dispexob)
+    def testSharedDispatchTables(self):
+        from win32com.server.policy import DesignatedWrapPolicy
+        p1 = DesignatedWrapPolicy(PythonSemanticClass())
+        p2 = DesignatedWrapPolicy(PythonSemanticClass())
+        self.failUnless(p1._name_to_dispid_ is p2._name_to_dispid_)
+        self.failUnless(p1._dispid_to_func_ is p2._dispid_to_func_)
+        # An object with its own _public_methods_ gets its own tables.
+        ob = PythonSemanticClass()
+        ob._public_methods_ = ["In", "Add"]
+        p3 = DesignatedWrapPolicy(ob)
+        self.failIf(p3._name_to_dispid_ is p1._name_to_dispid_)
+        self.failUnlessEqual(p3._name_to_dispid_["add"], 10)
+    def testReboundMethod(self):
+        from win32com.server.policy import DesignatedWrapPolicy
+        ob = PythonSemanticClass()
+        p = DesignatedWrapPolicy(ob)
+        p._invokeex_(10, 0, pythoncom.DISPATCH_METHOD, (1,), None, None)
+        self.failUnlessEqual(ob.list, [1])
+        # A method set on the object after it was first called is used.
+        ob.Add = lambda value: ob.list.append(value * 2)
+        p._invokeex_(10, 0, pythoncom.DISPATCH_METHOD, (2,), None, None)
+        self.failUnlessEqual(ob.list, [1, 4])
+    def testTablesReleased(self):
+        import gc
+        from win32com.server.policy import DesignatedWrapPolicy, _dispatch_tables
+        class Temporary(PythonSemanticClass):
+            pass
+        DesignatedWrapPolicy(Temporary())
+        self.failUnless(Temporary in _dispatch_tables)
+        count = len(_dispatch_tables)
+        del Temporary
+        gc.collect()
+        self.failUnlessEqual(len(_dispatch_tables), count - 1)
 
 if __name__=='__main__':
     unittest.main()
@@ -1,6 +1,6 @@
 # Originally contributed by Stefan Schukat as part of this arbitrary-sized
 # arrays patch.
-from win32com.client import gencache
+from win32com.client import gencache, dynamic
 from win32com.test import util
 import unittest
 
@@ -115,6 +115,25 @@ class ArrayTest(util.TestCase):
         self._doTest(OneD2)
     def testLargeD(self):
         self._doTest(LargeD)
+    def testScalarTupleConverter(self):
+        self.arr.Array = TwoD
+        # An array of plain values comes back as it is...
+        result = self.arr.Array
+        self.failUnless(dynamic._IsScalarTuple(result))
+        # ... or converted on request.
+        dynamic.scalarTupleConverter = dynamic.ScalarTupleToArray
+        try:
+            result = self.arr.Array
+        finally:
+            dynamic.scalarTupleConverter = None
+        self.failUnlessEqual([list(row) for row in result], TwoD)
+        self.failUnlessEqual(result[0].typecode, "d")
+    def testOutParamTuple(self):
+        # Output parameters come back in a tuple too, and are never converted.
+        self.failUnless(dynamic._Is2DArray(((1, 2), (3, 4))))
+        self.failIf(dynamic._Is2DArray(((1, 2, 3), 5)))
+        self.failIf(dynamic._Is2DArray(((1, 2, 3), (4, 5))))
+        self.failIf(dynamic._Is2DArray((((1, 2), (3, 4)), (5, 6))))
 
 if __name__ == "__main__":
     try:
@@ -60,6 +60,20 @@ def Test():
             raise error("Dynamic sequences not working! %r/%r" % (repr(v), repr(client.testSequence)))
 
         client.write("This","output","has","come","via","COM")
+        # Names are only looked up once.
+        if "ANewAttr" not in client._dispidcache_:
+            raise error("The DISPID of ANewAttr was not remembered")
+        # Our object doesn't support IPersist, so the DISPIDs are shared by
+        # the objects wrapping it.
+        other = win32com.client.dynamic.Dispatch(iid)
+        if other.ANewAttr != "Hello":
+            raise error("Could not get dynamic property")
+        if other._dispidcache_ is not client._dispidcache_:
+            raise error("The DISPIDs of the same object are not shared")
+        win32com.client.dynamic.InvalidateDispIDCache()
+        if client._dispidcache_:
+            raise error("The DISPIDs were not forgotten")
+        other = None
         # Check our new "_FlagAsMethod" works (kinda!)
         client._FlagAsMethod("NotReallyAMethod")
         if not callable(client.NotReallyAMethod):
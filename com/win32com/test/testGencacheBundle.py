@@ -0,0 +1,93 @@
+# Test bundles of generated modules - gencache.MakeBundle, LoadBundle and
+# the importer which imports modules from them.
+import os
+import sys
+import tempfile
+import unittest
+
+from win32com.client import gencache, makepy
+import win32com.test.util
+
+# stdole2 is always registered.
+stdole_info = ("{00020430-0000-0000-C000-000000000046}", 0, 2, 0)
+stdole_name = gencache.GetGeneratedFileName(*stdole_info)
+stdole_mod_name = "win32com.gen_py." + stdole_name
+
+def _ForgetBundles():
+    # As if in a new process - nothing has been read from any bundle.
+    importer = gencache._bundleImporter
+    importer.modules.clear()
+    importer.index.clear()
+    importer.genPathNames.clear()
+    importer.loadedGenPathBundle = 0
+    sys.modules.pop(stdole_mod_name, None)
+
+class BundleTestCase(win32com.test.util.TestCase):
+    def setUp(self):
+        gencache.EnsureModule(*stdole_info)
+        # Keep any bundle the user already has in the generated directory.
+        self.genPathBundle = os.path.join(gencache.GetGeneratePath(), gencache.bundleFileName)
+        self.savedBundle = None
+        if os.path.isfile(self.genPathBundle):
+            f = open(self.genPathBundle, "rb")
+            try:
+                self.savedBundle = f.read()
+            finally:
+                f.close()
+        fd, self.fileName = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.unlink(self.fileName)
+        if self.savedBundle is None:
+            if os.path.isfile(self.genPathBundle):
+                os.unlink(self.genPathBundle)
+        else:
+            f = open(self.genPathBundle, "wb")
+            try:
+                f.write(self.savedBundle)
+            finally:
+                f.close()
+        _ForgetBundles()
+        gencache.EnsureModule(*stdole_info)
+
+    def testMakeAndLoad(self):
+        gencache.MakeBundle(self.fileName, [stdole_info], verbose = 0)
+        _ForgetBundles()
+        gencache.LoadBundle(self.fileName)
+        self.failUnless(stdole_name in gencache._bundleImporter.modules)
+        mod = gencache.GetModuleForTypelib(*stdole_info)
+        self.failUnless(mod.__loader__ is gencache._bundleImporter)
+        # The index in the bundle finds the module from a CLSID.
+        for clsid in mod.CLSIDToClassMap.iterkeys():
+            self.failUnlessEqual(gencache.GetModuleForCLSID(clsid), mod)
+
+    def testLoadOtherPython(self):
+        f = open(self.fileName, "wb")
+        try:
+            f.write(gencache.bundleHeader.encode("ascii") + "not the magic number")
+        finally:
+            f.close()
+        self.assertRaises(ValueError, gencache.LoadBundle, self.fileName)
+
+    def testGenPathBundle(self):
+        gencache.MakeBundle(None, [stdole_info], verbose = 0)
+        _ForgetBundles()
+        mod = gencache.GetModuleForTypelib(*stdole_info)
+        self.failUnless(mod.__loader__ is gencache._bundleImporter)
+
+    def testRegenerate(self):
+        # Regenerating a module in a new process must delete the bundle in
+        # the generated directory, even though nothing was imported from it.
+        gencache.MakeBundle(None, [stdole_info], verbose = 0)
+        _ForgetBundles()
+        bundled = gencache.EnsureModule(*stdole_info)
+        makepy.GenerateFromTypeLibSpec(stdole_info, verboseLevel = 0)
+        self.failIf(os.path.isfile(self.genPathBundle))
+        mod = gencache.GetModuleForTypelib(*stdole_info)
+        self.failIf(getattr(mod, "__loader__", None) is gencache._bundleImporter)
+        # EnsureModule doesn't return the module it validated before.
+        self.failIf(gencache.EnsureModule(*stdole_info) is bundled)
+
+if __name__=='__main__':
+    unittest.main()
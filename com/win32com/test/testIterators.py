@@ -8,6 +8,7 @@ import unittest
 from win32com.client.gencache import EnsureDispatch
 from win32com.client import Dispatch
 import win32com.server.util
+import win32com.client.util
 import win32com.test.util
 import pythoncom
 
@@ -28,6 +29,20 @@ class _BaseTestCase(win32com.test.util.TestCase):
         for v in yield_iter(iter(i)):
             got.append(v)
         self.assertEquals(got, self.expected_data)
+    def test_batched_iterator(self):
+        ob, i = self.iter_factory()
+        got = list(win32com.client.util.Iterator(i))
+        self.assertEquals(got, self.expected_data)
+    def test_enumerator_index(self):
+        for materialize in (False, True):
+            ob, i = self.iter_factory()
+            e = win32com.client.util.WrapEnum(i, materialize=materialize)
+            self.assertEquals(list(e), self.expected_data)
+            # out of sequence, and back again.
+            self.assertEquals(e[2], self.expected_data[2])
+            self.assertEquals(e[0], self.expected_data[0])
+            self.assertEquals(e.Next(2), tuple(self.expected_data[1:3]))
+            self.assertRaises(IndexError, e.__getitem__, len(self.expected_data))
 
     def _do_test_nonenum(self, object):
         try:
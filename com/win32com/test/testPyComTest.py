@@ -396,6 +396,23 @@ def TestDynamic():
     # if o.ParamProp(0) != 1:
     #    raise RuntimeError, o.paramProp(0)
 
+    # Objects with type info share the olerepr of their interface.
+    o1 = win32com.client.dynamic.Dispatch("PyCOMTest.PyCOMTest")
+    o2 = win32com.client.dynamic.Dispatch("PyCOMTest.PyCOMTest")
+    if o1._olerepr_ is not o2._olerepr_:
+        raise error("Objects of the same interface don't share an olerepr")
+    # but names flagged for one object stay with that object.
+    shared = o2._olerepr_
+    o1._FlagAsMethod("GetSetInt")
+    if o1._olerepr_ is shared or o2._olerepr_ is not shared:
+        raise error("_FlagAsMethod changed the shared olerepr")
+    # Methods are compiled once for all the objects sharing an olerepr.
+    o3 = win32com.client.dynamic.Dispatch("PyCOMTest.PyCOMTest")
+    check_get_set(o2.GetSetInt, 1)
+    check_get_set(o3.GetSetInt, 2)
+    if o2._builtMethods_["GetSetInt"] is not o3._builtMethods_["GetSetInt"]:
+        raise error("Objects sharing an olerepr built their own methods")
+
 
 def TestGenerated():
     # Create an instance of the server.
@@ -0,0 +1,72 @@
+# Test that code generated from a snapshot of a type library matches the
+# code generated from the type library itself.
+import os
+import tempfile
+import unittest
+
+import pythoncom
+from win32com.client import genpy, tlbsnapshot
+import win32com.test.util
+
+class _Writer:
+    encoding = "mbcs"
+    def __init__(self):
+        self.chunks = []
+    def write(self, text):
+        self.chunks.append(text)
+    def getlines(self):
+        # The time of generation will differ.
+        return [l for l in "".join(self.chunks).splitlines() if not l.startswith("# On ")]
+
+def _Generate(typelib):
+    writer = _Writer()
+    genpy.Generator(typelib, None, genpy.GeneratorProgress()).generate(writer)
+    return writer.getlines()
+
+class SnapshotTestCase(win32com.test.util.TestCase):
+    def setUp(self):
+        # stdole2 is always registered.
+        self.typelib = pythoncom.LoadRegTypeLib("{00020430-0000-0000-C000-000000000046}", 2, 0, 0)
+
+    def testReplay(self):
+        snapshot = tlbsnapshot.Capture(self.typelib)
+        self.assertEquals(_Generate(tlbsnapshot.ReplayTypeLib(snapshot)), _Generate(self.typelib))
+
+    def testSaveLoad(self):
+        fd, fname = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            tlbsnapshot.Save(tlbsnapshot.Capture(self.typelib), fname)
+            snapshot = tlbsnapshot.Load(fname)
+        finally:
+            os.unlink(fname)
+        replay = tlbsnapshot.ReplayTypeLib(snapshot)
+        self.assertEquals(replay.GetLibAttr()[0], self.typelib.GetLibAttr()[0])
+        self.assertEquals(_Generate(replay), _Generate(self.typelib))
+        times = tlbsnapshot.Benchmark(snapshot, 2)
+        self.assertEquals(len(times), 2)
+
+    def testPlainObjects(self):
+        # A snapshot can be loaded without pywin32.
+        fd, fname = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            tlbsnapshot.Save(tlbsnapshot.Capture(self.typelib), fname)
+            f = open(fname, "rb")
+            try:
+                data = f.read()
+            finally:
+                f.close()
+        finally:
+            os.unlink(fname)
+        self.failIf("pywintypes" in data or "pythoncom" in data)
+
+    def testProgIDs(self):
+        replay = tlbsnapshot.ReplayTypeLib(tlbsnapshot.Capture(self.typelib))
+        # stdole2 has no creatable classes.
+        iid = replay.GetTypeInfo(0).GetTypeAttr()[0]
+        self.assertRaises(pythoncom.com_error, replay.ProgIDFromCLSID, iid)
+        self.assertRaises(pythoncom.com_error, pythoncom.ProgIDFromCLSID, iid)
+
+if __name__=='__main__':
+    unittest.main()
@@ -89,7 +89,7 @@ unittest_modules = [
           testStreams testWMI policySemantics testShell testROT
           testAXScript testxslt testDictionary testCollections
           testServers errorSemantics.test testvb testArrays
-          testClipboard testMarshal
+          testClipboard testMarshal testTypelibSnapshot testGencacheBundle
         """.split(),
         # Level 2 tests.
         """testMSOffice.TestAll testMSOfficeEvents.test testAccess.test
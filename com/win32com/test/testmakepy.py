@@ -44,7 +44,24 @@ def TestBuildAll(verbose = 1):
                 makepy.GenerateChildFromTypeLibSpec(name, tinfo)
     return num
 
+def TestWorkerItems():
+    # Every enumeration and interface a makepy worker process builds must be
+    # sent back to the parent, rather than built again there.
+    from win32com.client import genpy
+    genpy._InitWorker(None, ("{00020430-0000-0000-C000-000000000046}", 0, 2, 0)) # stdole2
+    try:
+        tlb = genpy._worker_typelib
+        kinds = [pythoncom.TKIND_ENUM, pythoncom.TKIND_DISPATCH, pythoncom.TKIND_INTERFACE]
+        indices = [i for i in range(tlb.GetTypeInfoCount()) if tlb.GetTypeInfoType(i) in kinds]
+        for index, data, error in genpy._BuildItemsInWorker(indices):
+            if data is None:
+                raise RuntimeError("Type info %d was not built in a worker: %s" % (index, error))
+            genpy._LoadItems(data)
+    finally:
+        genpy._worker_typelib = None
+
 def TestAll(verbose = 0):
+    TestWorkerItems()
     num = TestBuildAll(verbose)
     print "Generated and imported", num, "modules"
     win32com.test.util.CheckClean()
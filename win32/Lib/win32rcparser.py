@@ -10,7 +10,7 @@ dialogs and other Windows UI resources.
 __author__="Adam Walker"
 __version__="0.11"
 
-import sys, os, shlex, stat
+import sys, os, re, stat
 import pprint
 import win32con
 import commctrl
@@ -121,6 +121,89 @@ class StringDef:
     def __repr__(self):
         return "StringDef(%r, %r, %r)" % (self.id, self.idNum, self.value)
 
+# The tokens of shlex.shlex (not in posix mode), which this parser was
+# written for: words (which carry on after a comment, and may contain
+# quotes), quoted strings, and any other character on its own, separated
+# by whitespace and by comments to the end of the line.
+#
+# Every match starts where the last one ended (so never in a comment): a
+# comment runs to the end of the line, a character on its own is never
+# whitespace or a comment, and the whitespace and comments at the end of the
+# text are matched with an empty token.
+_token_pattern = r"""
+    (?: [ \t\r\n]+ | [%(commenters)s] [^\n]* (?:\n|\Z) )*
+    ( [A-Za-z0-9_] (?: [A-Za-z0-9_"'] | [%(commenters)s] [^\n]* (?:\n|\Z) )*
+    | "[^"]*" | '[^']*'
+    | [^ \t\r\n%(commenters)s]
+    | \Z )
+"""
+_wordchars = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_"
+_token_res = {} # {commenters: (token re, comment re, word and comment re)}
+
+def _get_token_res(commenters):
+    try:
+        return _token_res[commenters]
+    except KeyError:
+        escaped = re.escape(commenters)
+        res = (re.compile(_token_pattern % {"commenters": escaped}, re.VERBOSE),
+               re.compile(r"[%s][^\n]*\n?" % escaped),
+               re.compile(r"[A-Za-z0-9_\"'][%s]" % escaped))
+        _token_res[commenters] = res
+        return res
+
+def tokenize(text, commenters="/#"):
+    """Split the text of an .rc (or, with commenters "/", .h) file into a
+    list of tokens, in one pass.
+    """
+    token_re, comment_re, word_comment_re = _get_token_res(commenters)
+    tokens = token_re.findall(text)
+    while tokens and not tokens[-1]:
+        del tokens[-1]
+    # a quote on its own didn't start a string
+    if '"' in tokens or "'" in tokens:
+        raise ValueError("No closing quotation")
+    if word_comment_re.search(text) is not None:
+        # there may be words with a comment in them
+        for i, token in enumerate(tokens):
+            if token[0] in _wordchars:
+                tokens[i] = comment_re.sub("", token)
+    return tokens
+
+class Tokens(object):
+    """The tokens of a file, as read by RCParser.
+
+    Like shlex.shlex, get_token() returns the next token, or "" at the end,
+    and lineno is the line reached.
+    """
+    def __init__(self, text, commenters="/#"):
+        self.text = text
+        self.commenters = commenters
+        self.tokens = tokenize(text, commenters)
+        self.index = 0
+
+    def get_token(self):
+        index = self.index
+        if index < len(self.tokens):
+            self.index = index + 1
+            return self.tokens[index]
+        return ""
+
+    @property
+    def lineno(self):
+        # only needed for errors, so the token's offset is found again
+        token_re = _get_token_res(self.commenters)[0]
+        offset = len(self.text)
+        for i, match in enumerate(token_re.finditer(self.text)):
+            if i == self.index:
+                offset = match.start(1)
+                break
+        return self.text.count("\n", 0, offset) + 1
+
+def _read(stream):
+    if isinstance(stream, basestring):
+        return stream
+    return stream.read()
+
 class RCParser:
     next_id = 1001
     dialogs = {}
@@ -145,10 +228,15 @@ class RCParser:
             self.ungot = False
             self.debug("getToken returns (ungot):", self.token)
             return self.token
-        self.token = self.lex.get_token()
-        self.debug("getToken returns:", self.token)
-        if self.token=="":
+        lex = self.lex
+        index = lex.index
+        if index < len(lex.tokens):
+            lex.index = index + 1
+            self.token = lex.tokens[index]
+        else:
             self.token = None
+        if self.debugEnabled:
+            self.debug("getToken returns:", self.token)
         return self.token
 
     def ungetToken(self):
@@ -174,12 +262,12 @@ class RCParser:
     # Return the *current* token as a string literal (ie, self.token will be a
     # quote.  consumes all tokens until the end of the string
     def currentQuotedString(self):
-        # Handle quoted strings - pity shlex doesn't handle it.
+        # Handle quoted strings - the tokenizer (like shlex) doesn't handle it.
         assert self.token.startswith('"'), self.token
         bits = [self.token]
         while 1:
             tok = self.getToken()
-            if not tok.startswith('"'):
+            if tok is None or not tok.startswith('"'):
                 self.ungetToken()
                 break
             bits.append(tok)
@@ -204,34 +292,32 @@ class RCParser:
             self.getToken()
 
     def open(self, rcstream):
-        self.lex = shlex.shlex(rcstream)
-        self.lex.commenters = "//#"
+        self.lex = Tokens(_read(rcstream), "/#")
 
     def parseH(self, file):
-        lex = shlex.shlex(file)
-        lex.commenters = "//"
-        token = " "
-        while token is not None:
-            token = lex.get_token()
-            if token == "" or token is None:
-                token = None
-            else:
-                if token=='define':
-                    n = lex.get_token()
-                    i = int(lex.get_token())
-                    self.ids[n] = i
-                    if i in self.names:
-                        # Dupe ID really isn't a problem - most consumers
-                        # want to go from name->id, and this is OK.
-                        # It means you can't go from id->name though.
-                        pass
-                        # ignore AppStudio special ones
-                        #if not n.startswith("_APS_"):
-                        #    print "Duplicate id",i,"for",n,"is", self.names[i]
-                    else:
-                        self.names[i] = n
-                    if self.next_id<=i:
-                        self.next_id = i+1
+        tokens = tokenize(_read(file), "/")
+        index = 0
+        while index < len(tokens):
+            token = tokens[index]
+            index += 1
+            if token=='define':
+                # like shlex, "" past the end
+                n, i = (tokens[index:index + 2] + ["", ""])[:2]
+                i = int(i)
+                index += 2
+                self.ids[n] = i
+                if i in self.names:
+                    # Dupe ID really isn't a problem - most consumers
+                    # want to go from name->id, and this is OK.
+                    # It means you can't go from id->name though.
+                    pass
+                    # ignore AppStudio special ones
+                    #if not n.startswith("_APS_"):
+                    #    print "Duplicate id",i,"for",n,"is", self.names[i]
+                else:
+                    self.names[i] = n
+                if self.next_id<=i:
+                    self.next_id = i+1
 
     def parse(self):
         noid_parsers = {
@@ -235,18 +235,30 @@ from __future__ import generators
 
 __author__ = 'Jason R. Coombs <jaraco@jaraco.com>'
 
-import _winreg
+try:
+	import _winreg
+	import win32api
+except ImportError:
+	# not on Windows: time zones can only come from a TimeZoneDatabase
+	_winreg = win32api = None
 import struct
 import datetime
-import win32api
 import re
+import json
+import binascii
 import operator
 import warnings
+import bisect
+import array
+import sys
 from itertools import count
 
 import logging
 log = logging.getLogger(__file__)
 
+# the TimeZoneDatabase used instead of the registry (see use_database)
+_database = None
+
 # A couple of objects for working with objects as if they were native C-type
 # structures.
 class _SimpleStruct(object):
@@ -472,18 +484,58 @@ class TimeZoneInfo(datetime.tzinfo):
 			self._LoadFromTZI(param)
 		if isinstance(param, basestring):
 			self.timeZoneName = param
-			self._LoadInfoFromKey()
+			self._LoadInfoFromCache()
 		self.fixedStandardTime = fix_standard_time
 
+	# the state loaded for each time zone name, by (class, name), shared by
+	#  all the instances for that time zone (see clear_cache)
+	_zoneCache = {}
+	# the time zone key names by the "Std" name of the time zones
+	_zoneNamesByStd = None
+
+	def _LoadInfoFromCache(self):
+		"""Loads the information for self.timeZoneName from the time zone key
+		the first time the name is used, or else copies it from the cache.
+
+		>>> TimeZoneInfo('Pacific Standard Time') is TimeZoneInfo('Pacific Standard Time')
+		False
+		>>> TimeZoneInfo('Pacific Standard Time').staticInfo is TimeZoneInfo('Pacific Standard Time').staticInfo
+		True
+		"""
+		cacheKey = self.__class__, self.timeZoneName
+		try:
+			state = TimeZoneInfo._zoneCache[cacheKey]
+		except KeyError:
+			self._LoadInfoFromKey()
+			# the transitions don't depend on fixedStandardTime, so they can
+			#  be shared too.
+			self._transitions = {}
+			state = TimeZoneInfo._zoneCache[cacheKey] = self.__dict__.copy()
+		else:
+			self.__dict__.update(state)
+
+	@staticmethod
+	def clear_cache():
+		"Forget the time zones loaded so far, so they are loaded again when used"
+		TimeZoneInfo._zoneCache.clear()
+		TimeZoneInfo._zoneNamesByStd = None
+
 	def _FindTimeZoneKey(self):
 		"""Find the registry key for the time zone name (self.timeZoneName)."""
 		# for multi-language compatability, match the time zone name in the
 		# "Std" key of the time zone key.
-		zoneNames = dict(self._get_indexed_time_zone_keys('Std'))
+		zoneNames = TimeZoneInfo._zoneNamesByStd
+		if zoneNames is None:
+			if _database is not None:
+				# without decoding every time zone in the database
+				zoneNames = _database.key_names_by_std()
+			else:
+				zoneNames = dict(self._get_indexed_time_zone_keys('Std'))
+			TimeZoneInfo._zoneNamesByStd = zoneNames
 		# Also match the time zone key name itself, to be compatible with
 		# English-based hard-coded time zones.
 		timeZoneName = zoneNames.get(self.timeZoneName, self.timeZoneName)
-		key = _RegKeyDict.open(_winreg.HKEY_LOCAL_MACHINE, self.tzRegKey)
+		key = self._get_time_zone_key()
 		try:
 			result = key.subkey(timeZoneName)
 		except:
@@ -544,7 +596,8 @@ class TimeZoneInfo(datetime.tzinfo):
 		"""
 		try:
 			info = key.subkey('Dynamic DST')
-		except WindowsError:
+		except (EnvironmentError, KeyError):
+			# WindowsError from the registry, KeyError from a TimeZoneDatabase
 			return
 		del info['FirstEntry']
 		del info['LastEntry']
@@ -584,8 +637,10 @@ class TimeZoneInfo(datetime.tzinfo):
 		# Find the greatest year entry in self.dynamicInfo which is for
 		#  a year greater than or equal to our targetYear. If not found,
 		#  default to the earliest year.
-		return self.dynamicInfo.get(targetYear,
-			self.dynamicInfo[RangeMap.last_item])
+		try:
+			return self.dynamicInfo[targetYear]
+		except KeyError:
+			return self.dynamicInfo[RangeMap.last_item]
 
 	def _getStandardBias(self, dt):
 		winInfo = self.getWinInfo(dt.year)
@@ -598,47 +653,153 @@ class TimeZoneInfo(datetime.tzinfo):
 	def utcoffset(self, dt):
 		"Calculates the utcoffset according to the datetime.tzinfo spec"
 		if dt is None: return
-		winInfo = self.getWinInfo(dt.year)
-		return -winInfo.bias + self.dst(dt)
+		transitions = self._getTransitions(dt.year)
+		if not self.fixedStandardTime and transitions.in_dst(dt):
+			return transitions.daylight_offset
+		return transitions.standard_offset
 
 	def dst(self, dt):
 		"Calculates the daylight savings offset according to the datetime.tzinfo spec"
 		if dt is None: return
-		winInfo = self.getWinInfo(dt.year)
-		if not self.fixedStandardTime and self._inDaylightSavings(dt):
-			result = winInfo.daylight_bias
-		else:
-			result = winInfo.standard_bias
-		return -result
+		transitions = self._getTransitions(dt.year)
+		if not self.fixedStandardTime and transitions.in_dst(dt):
+			return transitions.daylight_dst
+		return transitions.standard_dst
 
 	def _inDaylightSavings(self, dt):
-		dt = dt.replace(tzinfo=None)
-		winInfo = self.getWinInfo(dt.year)
+		return self._getTransitions(dt.year).in_dst(dt)
+
+	def _getTransitions(self, year):
+		"""
+		Return the _YearTransitions of this time zone for the given year.
+
+		They are computed the first time a year is needed and cached on the
+		instance, so utcoffset and dst cost a dictionary lookup and a couple
+		of comparisons.
+
+		>>> tzi = TimeZoneInfo('Pacific Standard Time')
+		>>> transitions = tzi._getTransitions(2011)
+		>>> transitions.start, transitions.end
+		(datetime.datetime(2011, 3, 13, 2, 0), datetime.datetime(2011, 11, 6, 1, 0))
+		>>> transitions.standard_offset, transitions.daylight_offset
+		(datetime.timedelta(-1, 57600), datetime.timedelta(-1, 61200))
+		>>> tzi._getTransitions(2011) is transitions
+		True
+
+		The cache is not part of the state compared or pickled.
+		>>> import pickle
+		>>> tzi == pickle.loads(pickle.dumps(tzi))
+		True
+		"""
 		try:
-			dstStart = self.GetDSTStartTime(dt.year)
-			dstEnd = self.GetDSTEndTime(dt.year)
+			return self._transitions[year]
+		except KeyError:
+			pass
+		except AttributeError:
+			self._transitions = {}
+		result = _YearTransitions(self, year)
+		self._transitions[year] = result
+		return result
 
-			# at the end of DST, when clocks are moved back, there's a period
-			#  of daylight_bias where it's ambiguous whether we're in DST or
-			#  not.
-			dstEndAdj = dstEnd + winInfo.daylight_bias
+	def _getState(self):
+		"Return the attributes defining this time zone (without the caches)"
+		state = self.__dict__.copy()
+		state.pop('_transitions', None)
+		return state
 
-			# the same thing could theoretically happen at the start of DST
-			#  if there's a standard_bias (which I suspect is always 0).
-			dstStartAdj = dstStart + winInfo.standard_bias
+	__getstate__ = _getState
 
-			if dstStart < dstEnd:
-				in_dst = dstStartAdj <= dt < dstEndAdj
-			else:
-				# in the southern hemisphere, daylight savings time
-				#  typically ends before it begins in a given year.
-				in_dst = not (dstEndAdj < dt <= dstStartAdj)
-		except ValueError:
-			# there was an error parsing the time zone, which is normal when a
-			#  start and end time are not specified.
-			in_dst = False
+	def local_to_utc_timestamps(self, timestamps):
+		"""
+		Convert local times in this time zone to UTC, as utcoffset would, for
+		many values at once.
+
+		timestamps are seconds since 1970-01-01 (of local and UTC time
+		respectively) in a sequence, an array.array or a numpy array; numpy
+		datetime64 arrays are also accepted. The result is a list, or an
+		array of the same type.
+
+		>>> tzi = TimeZoneInfo('Pacific Standard Time')
+		>>> tzi.local_to_utc_timestamps([1293840000, 1309478400])
+		[1293868800, 1309503600]
+		>>> tzi.local_to_utc_timestamps(array.array('d', [1320541200]))
+		array('d', [1320570000.0])
+		"""
+		return self._convertTimestamps(timestamps, True)
+
+	def utc_to_local_timestamps(self, timestamps):
+		"""
+		Convert UTC times to local times in this time zone, as fromutc would,
+		for many values at once (see local_to_utc_timestamps).
+
+		>>> tzi = TimeZoneInfo('Pacific Standard Time')
+		>>> tzi.utc_to_local_timestamps([1293868800, 1309503600])
+		[1293840000, 1309478400]
+
+		Right at the DST changeover:
+		>>> tzi.utc_to_local_timestamps([1320570000])
+		[1320541200]
+		"""
+		return self._convertTimestamps(timestamps, False)
+
+	def convert_timestamps(self, timestamps, tz):
+		"""
+		Convert local times in this time zone to local times in the time zone
+		tz, as astimezone would, for many values at once (see
+		local_to_utc_timestamps).
+
+		>>> tz_hi = TimeZoneInfo('Hawaiian Standard Time')
+		>>> tz_pac = TimeZoneInfo('Pacific Standard Time')
+		>>> tz_hi.convert_timestamps([1320508740, 1320508800], tz_pac)
+		[1320519540, 1320519600]
+		"""
+		return tz.utc_to_local_timestamps(self.local_to_utc_timestamps(timestamps))
+
+	def _convertTimestamps(self, timestamps, to_utc):
+		numpy = sys.modules.get('numpy')
+		if numpy is not None and isinstance(timestamps, numpy.ndarray):
+			return self._convertTimestampArray(numpy, timestamps, to_utc)
+		if isinstance(timestamps, array.array):
+			typecode = timestamps.typecode
+		else:
+			typecode = None
+			if not isinstance(timestamps, (list, tuple)):
+				timestamps = list(timestamps)
+		if not timestamps:
+			result = []
+		else:
+			table = _TimestampTable(self, min(timestamps), max(timestamps))
+			result = table.convert(timestamps, to_utc)
+		if typecode:
+			result = array.array(typecode, result)
+		return result
 
-		return in_dst
+	def _convertTimestampArray(self, numpy, timestamps, to_utc):
+		scale = 1
+		if timestamps.dtype.kind == 'M':
+			unit, unit_count = numpy.datetime_data(timestamps.dtype)
+			scale = _units_per_second.get(unit, 0)
+			if not scale or scale % unit_count:
+				# units of a minute or more, which the offsets aren't
+				#  a whole number of.
+				timestamps = timestamps.astype('datetime64[s]')
+				scale = 1
+			else:
+				scale //= unit_count
+			dtype = timestamps.dtype
+			values = timestamps.view('i8')
+			not_a_time = values == numpy.iinfo('i8').min
+			valid = values[~not_a_time]
+		else:
+			values = valid = timestamps
+		if not valid.size:
+			return timestamps.copy()
+		table = _TimestampTable(self,
+			float(valid.min()) / scale, float(valid.max()) / scale)
+		result = table.convert_array(numpy, values, scale, to_utc)
+		if timestamps.dtype.kind == 'M':
+			result = numpy.where(not_a_time, values, result).view(dtype)
+		return result
 
 	def GetDSTStartTime(self, year):
 		"Given a year, determines the time when daylight savings time starts"
@@ -649,13 +810,13 @@ class TimeZoneInfo(datetime.tzinfo):
 		return self.getWinInfo(year).locate_standard_start(year)
 
 	def __cmp__(self, other):
-		return cmp(self.__dict__, other.__dict__)
+		return cmp(self._getState(), other._getState())
 
 	def __eq__(self, other):
-		return self.__dict__==other.__dict__
+		return self._getState()==other._getState()
 
 	def __ne__(self, other):
-		return self.__dict__!=other.__dict__
+		return self._getState()!=other._getState()
 
 	@classmethod
 	def local(class_):
@@ -701,8 +862,15 @@ class TimeZoneInfo(datetime.tzinfo):
 	# helper methods for accessing the timezone info from the registry
 	@staticmethod
 	def _get_time_zone_key(subkey=None):
-		"Return the registry key that stores time zone details"
-		key = _RegKeyDict.open(_winreg.HKEY_LOCAL_MACHINE, TimeZoneInfo.tzRegKey)
+		"""Return the registry key that stores time zone details, or the
+		TimeZoneDatabase used instead of it"""
+		if _database is not None:
+			key = _database
+		elif _winreg is None:
+			raise RuntimeError('There is no registry to load time zones from; '
+				'call use_database with a TimeZoneDatabase')
+		else:
+			key = _RegKeyDict.open(_winreg.HKEY_LOCAL_MACHINE, TimeZoneInfo.tzRegKey)
 		if subkey:
 			key = key.subkey(subkey)
 		return key
@@ -749,6 +917,159 @@ class TimeZoneInfo(datetime.tzinfo):
 		zones.sort(key=key)
 		return zones
 
+class _YearTransitions(object):
+	"""
+	The offsets of a TimeZoneInfo in one year and the local times at which
+	daylight savings time starts and ends, as used by utcoffset and dst.
+
+	start and end are None when the time zone does not define daylight
+	savings time for the year.
+	"""
+	__slots__ = ('standard_dst', 'daylight_dst', 'standard_offset',
+		'daylight_offset', 'start', 'end', 'southern')
+
+	def __init__(self, tzi, year):
+		winInfo = tzi.getWinInfo(year)
+		bias = winInfo.bias
+		standard_bias = winInfo.standard_bias
+		daylight_bias = winInfo.daylight_bias
+		self.standard_dst = -standard_bias
+		self.daylight_dst = -daylight_bias
+		self.standard_offset = -bias - standard_bias
+		self.daylight_offset = -bias - daylight_bias
+		self.start = self.end = None
+		self.southern = False
+		try:
+			dstStart = tzi.GetDSTStartTime(year)
+			dstEnd = tzi.GetDSTEndTime(year)
+		except ValueError:
+			# there was an error parsing the time zone, which is normal when a
+			#  start and end time are not specified.
+			return
+		# at the end of DST, when clocks are moved back, there's a period
+		#  of daylight_bias where it's ambiguous whether we're in DST or
+		#  not.
+		self.end = dstEnd + daylight_bias
+		# the same thing could theoretically happen at the start of DST
+		#  if there's a standard_bias (which I suspect is always 0).
+		self.start = dstStart + standard_bias
+		# in the southern hemisphere, daylight savings time
+		#  typically ends before it begins in a given year.
+		self.southern = not dstStart < dstEnd
+
+	def in_dst(self, dt):
+		"Return whether the local time dt (in the year) is in daylight savings"
+		if self.start is None:
+			return False
+		if dt.tzinfo is not None:
+			dt = dt.replace(tzinfo=None)
+		if self.southern:
+			return not (self.end < dt <= self.start)
+		return self.start <= dt < self.end
+
+_epoch = datetime.datetime(1970, 1, 1)
+
+# numpy datetime64 units, by the number of them in a second
+_units_per_second = dict(s=1, ms=10**3, us=10**6, ns=10**9)
+
+def _seconds(delta):
+	"Return a timedelta in seconds (an int, unless there are microseconds)"
+	result = delta.days * 86400 + delta.seconds
+	if delta.microseconds:
+		result += delta.microseconds / 1e6
+	return result
+
+class _TimestampTable(object):
+	"""
+	The _YearTransitions of a TimeZoneInfo for the years around a range of
+	timestamps (seconds since 1970-01-01), for converting timestamps without
+	creating datetime objects.
+
+	year_starts holds the timestamp of the start of each year, and rows the
+	transitions of the year in seconds: (standard offset, daylight offset,
+	standard dst, daylight dst, start, end, southern). start and end are
+	None when there is no daylight savings time in the year.
+	"""
+	def __init__(self, tzi, low, high):
+		# the year either side of the range allows for the offsets
+		year_of = lambda timestamp: (_epoch + datetime.timedelta(seconds=timestamp)).year
+		first_year = max(year_of(low) - 1, datetime.MINYEAR)
+		last_year = min(year_of(high) + 1, datetime.MAXYEAR)
+		self.year_starts = []
+		self.rows = []
+		for year in range(first_year, last_year + 1):
+			self.year_starts.append(_seconds(datetime.datetime(year, 1, 1) - _epoch))
+			transitions = tzi._getTransitions(year)
+			start = end = None
+			if transitions.start is not None and not tzi.fixedStandardTime:
+				start = _seconds(transitions.start - _epoch)
+				end = _seconds(transitions.end - _epoch)
+			self.rows.append((
+				_seconds(transitions.standard_offset),
+				_seconds(transitions.daylight_offset),
+				_seconds(transitions.standard_dst),
+				_seconds(transitions.daylight_dst),
+				start, end, transitions.southern,
+			))
+
+	def convert(self, timestamps, to_utc):
+		"Return a list of the timestamps converted to or from UTC"
+		year_starts = self.year_starts
+		rows = self.rows
+		find = bisect.bisect_right
+		result = []
+		append = result.append
+		for value in timestamps:
+			if not to_utc:
+				# the standard bias for the year of the UTC time, as fromutc
+				standard, daylight, standard_dst = rows[find(year_starts, value) - 1][:3]
+				value += standard - standard_dst
+			standard, daylight, standard_dst, daylight_dst, start, end, southern = \
+				rows[find(year_starts, value) - 1]
+			if start is None:
+				in_dst = False
+			elif southern:
+				in_dst = not (end < value <= start)
+			else:
+				in_dst = start <= value < end
+			if to_utc:
+				append(value - (daylight if in_dst else standard))
+			else:
+				append(value + (daylight_dst if in_dst else standard_dst))
+		return result
+
+	def convert_array(self, numpy, values, scale, to_utc):
+		"""
+		Return the numpy array of timestamps (in units of 1/scale seconds)
+		converted to or from UTC.
+		"""
+		dtype = values.dtype
+		column = lambda items: numpy.array(
+			[(item or 0) * scale for item in items]).astype(dtype)
+		year_starts = column(self.year_starts)
+		(standard, daylight, standard_dst, daylight_dst, start, end,
+			southern) = zip(*self.rows)
+		has_dst = numpy.array([item is not None for item in start])
+		southern = numpy.array(southern)
+		standard, daylight, standard_dst, daylight_dst, start, end = map(column,
+			(standard, daylight, standard_dst, daylight_dst, start, end))
+		last_row = len(self.rows) - 1
+		def find_rows(values):
+			rows = numpy.searchsorted(year_starts, values, side='right') - 1
+			# values out of the range (not-a-time) are masked by the caller
+			return numpy.clip(rows, 0, last_row)
+		if not to_utc:
+			values = values + (standard - standard_dst)[find_rows(values)]
+		rows = find_rows(values)
+		row_start = start[rows]
+		row_end = end[rows]
+		in_dst = has_dst[rows] & numpy.where(southern[rows],
+			~((row_end < values) & (values <= row_start)),
+			(row_start <= values) & (values < row_end))
+		if to_utc:
+			return values - numpy.where(in_dst, daylight[rows], standard[rows])
+		return values + numpy.where(in_dst, daylight_dst[rows], standard_dst[rows])
+
 class _RegKeyDict(dict):
 	def __init__(self, key):
 		dict.__init__(self)
@@ -786,6 +1107,186 @@ class _RegKeyDict(dict):
 		except WindowsError: pass
 
 
+class TimeZoneDatabase(object):
+	"""
+	A copy of the time zones in the registry, which can be saved to a file
+	and used by TimeZoneInfo instead of the registry (see use_database),
+	including on other platforms.
+
+	A database is created from the registry once,
+	>>> import os, tempfile
+	>>> fd, filename = tempfile.mkstemp()
+	>>> os.close(fd)
+	>>> TimeZoneDatabase.from_registry().save(filename)
+
+	and can then be loaded wherever it's needed.  Loading reads the file
+	into memory, but a time zone is only decoded when it's first used.
+	>>> database = TimeZoneDatabase.load(filename)
+	>>> previous = use_database(database)
+	>>> tz_pac = TimeZoneInfo('Pacific Standard Time')
+	>>> use_database(previous) is database
+	True
+	>>> tz_pac == TimeZoneInfo('Pacific Standard Time')
+	True
+	>>> os.remove(filename)
+
+	A database may also be made from a dictionary of time zones by key name,
+	each a dictionary of the values of the registry key; dictionaries in it
+	are the subkeys (such as 'Dynamic DST').
+	"""
+	# the first line of a saved database is a JSON header:
+	#  {"format": format, "version": version, "zones": {name: [start, end, std]}},
+	#  then the time zones follow, one JSON record a line, at the offsets
+	#  given (from the end of the header).  std is the "Std" value of the
+	#  time zone, so TimeZoneInfo can find a zone by it without reading them all.
+	format = 'win32timezone'
+	version = 2
+
+	def __init__(self, zones=None):
+		# {key name: _DatabaseKey, or the (start, end) of its record in _data}
+		self._zones = {}
+		self._data = None
+		# {key name: the "Std" value of the time zone}
+		self._std_names = {}
+		for name, values in (zones or {}).items():
+			self._zones[name] = _DatabaseKey(values)
+			self._std_names[name] = values.get('Std')
+
+	@classmethod
+	def from_registry(class_):
+		"Return a database of the time zones in the registry"
+		root = _RegKeyDict.open(_winreg.HKEY_LOCAL_MACHINE, TimeZoneInfo.tzRegKey)
+		zones = {}
+		for name in list(root.subkeys()):
+			key = root.subkey(name)
+			values = dict(key)
+			for subkey_name in list(key.subkeys()):
+				values[subkey_name] = dict(key.subkey(subkey_name))
+			zones[name] = values
+		return class_(zones)
+
+	@classmethod
+	def load(class_, filename):
+		"Return the database saved in the file"
+		f = open(filename, 'rb')
+		try:
+			data = f.read()
+		finally:
+			f.close()
+		header_end = data.find(b'\n') + 1
+		try:
+			header = json.loads(data[:header_end].decode('ascii'))
+			if header['format'] != class_.format:
+				raise ValueError
+		except (ValueError, KeyError, TypeError):
+			raise ValueError('%s is not a time zone database' % filename)
+		if header['version'] != class_.version:
+			raise ValueError('%s is a version %s time zone database, not %s'
+				% (filename, header['version'], class_.version))
+		result = class_()
+		result._data = data
+		for name, (start, end, std) in header['zones'].items():
+			result._zones[name] = (header_end + start, header_end + end)
+			result._std_names[name] = std
+		return result
+
+	def save(self, filename):
+		"Save the database to the file"
+		names = self.subkeys()
+		records = []
+		index = {}
+		offset = 0
+		for name in names:
+			record = json.dumps(self.subkey(name).encode(), sort_keys=True)
+			record = record.encode('ascii')
+			records.append(record)
+			index[name] = (offset, offset + len(record), self._std_names[name])
+			offset += len(record) + 1
+		header = dict(format=self.format, version=self.version, zones=index)
+		f = open(filename, 'wb')
+		try:
+			f.write(json.dumps(header, sort_keys=True).encode('ascii') + b'\n')
+			f.write(b'\n'.join(records))
+		finally:
+			f.close()
+
+	# the _RegKeyDict methods used by TimeZoneInfo
+	def subkey(self, name):
+		zone = self._zones[name]
+		if isinstance(zone, tuple):
+			start, end = zone
+			record = json.loads(self._data[start:end].decode('ascii'))
+			zone = self._zones[name] = _DatabaseKey.decode(record)
+		return zone
+
+	def subkeys(self):
+		return sorted(self._zones)
+
+	def key_names_by_std(self):
+		'Return the key names of the time zones by their "Std" values'
+		return dict(
+			(std, name) for name, std in self._std_names.items() if std is not None)
+
+class _DatabaseKey(dict):
+	"The values of a time zone (or of one of its subkeys) in a TimeZoneDatabase"
+	def __init__(self, values):
+		dict.__init__(self)
+		self._subkeys = {}
+		for name, value in values.items():
+			if isinstance(value, dict):
+				self._subkeys[name] = value
+			else:
+				self[name] = value
+
+	def subkey(self, name):
+		# a copy, as TimeZoneInfo deletes some of the values
+		return _DatabaseKey(self._subkeys[name])
+
+	def subkeys(self):
+		return sorted(self._subkeys)
+
+	def encode(self):
+		"Return the key as an object that can be written as JSON"
+		encode_values = lambda values: dict(
+			(name, _encode_value(value)) for name, value in values.items())
+		subkeys = dict(
+			(name, encode_values(values)) for name, values in self._subkeys.items())
+		return dict(values=encode_values(self), subkeys=subkeys)
+
+	@classmethod
+	def decode(class_, record):
+		"Return the key encoded as the record"
+		decode_values = lambda values: dict(
+			(name, _decode_value(value)) for name, value in values.items())
+		result = class_(decode_values(record['values']))
+		for name, values in record['subkeys'].items():
+			result._subkeys[name] = decode_values(values)
+		return result
+
+def _encode_value(value):
+	# binary values (such as TZI) are written in hexadecimal
+	if isinstance(value, bytes):
+		return dict(binary=binascii.hexlify(value).decode('ascii'))
+	return value
+
+def _decode_value(value):
+	if isinstance(value, dict):
+		return binascii.unhexlify(value['binary'].encode('ascii'))
+	return value
+
+def use_database(database):
+	"""
+	Make TimeZoneInfo load time zones from the TimeZoneDatabase instead of
+	the registry (or from the registry again, if database is None).
+
+	Return the database used until now.
+	"""
+	global _database
+	previous = _database
+	_database = database
+	TimeZoneInfo.clear_cache()
+	return previous
+
 # for backward compatibility
 def deprecated(func, name='Unknown'):
 	"""This is a decorator which can be used to mark functions
@@ -926,14 +1427,39 @@ class RangeMap(dict):
 	>>> r.get(7, 'not found')
 	'not found'
 
+	The sorted keys are cached until the RangeMap is modified.
+	>>> r[9] = 'c'
+	>>> r[7], r.bounds()
+	('c', (0, 9))
+	>>> del r[6]
+	>>> r[5]
+	'c'
+
 	"""
+	# the keys sorted with sort_params, or None when they must be sorted again
+	_sorted_keys = None
+	# (keys in ascending order, (bisect function, index offset)) when the
+	#  first matching key can be found by bisection, else None
+	_search = None
+
+	# the key_match_comparators, and whether the keys are sorted in reverse,
+	#  for which the first matching key can be found by bisecting the keys in
+	#  ascending order: the bisect function to use and the offset from its
+	#  result to the index of the matching key.
+	_bisect_searches = {
+		(operator.le, False): (bisect.bisect_left, 0),
+		(operator.lt, False): (bisect.bisect_right, 0),
+		(operator.ge, True): (bisect.bisect_right, -1),
+		(operator.gt, True): (bisect.bisect_left, -1),
+	}
+
 	def __init__(self, source, sort_params = {}, key_match_comparator = operator.le):
 		dict.__init__(self, source)
 		self.sort_params = sort_params
 		self.match = key_match_comparator
 
 	def __getitem__(self, item):
-		sorted_keys = sorted(self.keys(), **self.sort_params)
+		sorted_keys = self._get_sorted_keys()
 		if isinstance(item, RangeMap.Item):
 			result = self.__getitem__(sorted_keys[item])
 		else:
@@ -954,20 +1480,75 @@ class RangeMap(dict):
 		except KeyError:
 			return default
 
+	def _get_sorted_keys(self):
+		"Return the keys sorted with sort_params, sorting them only after a change"
+		if self._sorted_keys is None:
+			sorted_keys = sorted(self.keys(), **self.sort_params)
+			params = dict(self.sort_params)
+			reverse = bool(params.pop('reverse', False))
+			search = self._bisect_searches.get((self.match, reverse))
+			if search and not params:
+				ascending_keys = sorted_keys[::-1] if reverse else sorted_keys
+				self._search = ascending_keys, search
+			else:
+				self._search = None
+			self._sorted_keys = sorted_keys
+		return self._sorted_keys
+
 	def _find_first_match_(self, keys, item):
-		is_match = lambda k: self.match(item, k)
-		matches = list(filter(is_match, keys))
-		if matches:
-			return matches[0]
+		if self._search is not None and keys is self._sorted_keys:
+			ascending_keys, (bisect_keys, offset) = self._search
+			index = bisect_keys(ascending_keys, item) + offset
+			if 0 <= index < len(ascending_keys):
+				return ascending_keys[index]
+			raise KeyError(item)
+		for key in keys:
+			if self.match(item, key):
+				return key
 		raise KeyError(item)
 
 	def bounds(self):
-		sorted_keys = sorted(self.keys(), **self.sort_params)
+		sorted_keys = self._get_sorted_keys()
 		return (
 			sorted_keys[RangeMap.first_item],
 			sorted_keys[RangeMap.last_item],
 		)
 
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		state.pop('_sorted_keys', None)
+		state.pop('_search', None)
+		return state
+
+	# the methods modifying the keys discard the sorted keys
+	def __setitem__(self, key, value):
+		dict.__setitem__(self, key, value)
+		self._sorted_keys = None
+
+	def __delitem__(self, key):
+		dict.__delitem__(self, key)
+		self._sorted_keys = None
+
+	def clear(self):
+		dict.clear(self)
+		self._sorted_keys = None
+
+	def pop(self, *args):
+		self._sorted_keys = None
+		return dict.pop(self, *args)
+
+	def popitem(self):
+		self._sorted_keys = None
+		return dict.popitem(self)
+
+	def setdefault(self, key, default=None):
+		self._sorted_keys = None
+		return dict.setdefault(self, key, default)
+
+	def update(self, *args, **kwargs):
+		dict.update(self, *args, **kwargs)
+		self._sorted_keys = None
+
 	# some special values for the RangeMap
 	undefined_value = type(str('RangeValueUndefined'), (object,), {})()
 	class Item(int): pass
@@ -0,0 +1,84 @@
+"""benchmark_win32rcparser.py - time win32rcparser on big resource files
+
+The .rc and .h files are made by repeating the resources of
+win32rcparser/test.rc and test.h, with the IDs renamed in each copy.  The time
+shlex takes just to tokenize the same .rc file is shown for comparison.
+
+call using:
+    python benchmark_win32rcparser.py [--copies 200]
+"""
+import sys
+import os
+import re
+import shlex
+import tempfile
+import time
+
+import win32rcparser
+
+REPEAT = 3  # each benchmark is run this many times, and the best time is reported
+
+test_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "win32rcparser")
+id_re = re.compile(r"\b(ID[A-Z]_\w+)")
+
+def make_files(copies):
+    "write the big .rc and .h files, returning their names"
+    rc_source = open(os.path.join(test_dir, "test.rc")).read()
+    h_source = open(os.path.join(test_dir, "test.h")).read()
+    rc_name = tempfile.mktemp(".rc")
+    h_name = rc_name[:-2] + "h"
+    rc = open(rc_name, "w")
+    h = open(h_name, "w")
+    try:
+        for i in range(copies):
+            rename = lambda match: "%s_%d" % (match.group(1), i)
+            rc.write(id_re.sub(rename, rc_source))
+            h.write(id_re.sub(rename, h_source))
+    finally:
+        rc.close()
+        h.close()
+    return rc_name, h_name
+
+def run(function, *args):
+    "return the best time of REPEAT runs, and the result of the last"
+    best = None
+    for i in range(REPEAT):
+        start = time.time()
+        result = function(*args)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+def shlex_tokenize(rc_name):
+    lex = shlex.shlex(open(rc_name, "rU"))
+    lex.commenters = "//#"
+    count = 0
+    while lex.get_token():
+        count += 1
+    return count
+
+def tokenize(rc_name):
+    return len(win32rcparser.tokenize(open(rc_name, "rU").read()))
+
+def main(args):
+    copies = 200
+    if "--copies" in args:
+        copies = int(args[args.index("--copies") + 1])
+    rc_name, h_name = make_files(copies)
+    try:
+        print("%d copies of test.rc: %d bytes" % (copies, os.path.getsize(rc_name)))
+        seconds, count = run(shlex_tokenize, rc_name)
+        print("%-20s %9.4f s  (%d tokens)" % ("shlex tokenize", seconds, count))
+        seconds, count = run(tokenize, rc_name)
+        print("%-20s %9.4f s  (%d tokens)" % ("tokenize", seconds, count))
+        seconds, resources = run(win32rcparser.Parse, rc_name, h_name)
+        print("%-20s %9.4f s  (%d dialogs, %d strings)" % ("Parse", seconds,
+              len(resources.dialogs), len(resources.stringTable)))
+    finally:
+        os.remove(rc_name)
+        os.remove(h_name)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
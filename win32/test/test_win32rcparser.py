@@ -19,6 +19,10 @@ class TestParser(unittest.TestCase):
             got = self.resources.stringTable[sid].value
             self.assertEqual(got, expected)
 
+    def testHeaderIds(self):
+        self.assertEqual(self.resources.ids["IDD_TEST_DIALOG1"], 101)
+        self.assertEqual(self.resources.names[1000], "IDC_EDIT1")
+
     def testStandardIds(self):
         for idc in "IDOK IDCANCEL".split():
             correct = getattr(win32con, idc)
@@ -62,6 +66,17 @@ class TestGenerated(TestParser):
         exec py_source in globs, globs
         self.resources = globs["FakeParser"]()
 
+class TestTokenize(unittest.TestCase):
+    def testTokens(self):
+        text = 'CAPTION "A ""b"" c",IDC_X // comment\n#include "x.h"\nA//glued\nB |'
+        self.assertEqual(win32rcparser.tokenize(text),
+                         ['CAPTION', '"A "', '"b"', '" c"', ',', 'IDC_X', 'AB', '|'])
+        self.assertEqual(win32rcparser.tokenize('#define X 1 // one', "/"),
+                         ['#', 'define', 'X', '1'])
+
+    def testUnclosedString(self):
+        self.assertRaises(ValueError, win32rcparser.tokenize, 'CAPTION "A')
+
 if __name__=='__main__':
     unittest.main()
 
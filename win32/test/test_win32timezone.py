@@ -1,11 +1,228 @@
 # Test module for win32timezone
 
 import unittest, win32timezone, doctest
+import array, datetime, os, struct, tempfile
 
 class Win32TimeZoneTest(unittest.TestCase):
     def testWin32TZ(self):
         failed, total = doctest.testmod( win32timezone, verbose = False )
         self.failIf( failed )
 
+# The rules for Pacific time since 2007, and from 1987 to 2006.
+pacific_tzi = struct.pack('3l8h8h', 480, 0, -60,
+                          0, 11, 0, 1, 2, 0, 0, 0, 0, 3, 0, 2, 2, 0, 0, 0)
+pacific_2006_tzi = struct.pack('3l8h8h', 480, 0, -60,
+                               0, 10, 0, 5, 2, 0, 0, 0, 0, 4, 0, 1, 2, 0, 0, 0)
+
+def _test_zones():
+    return {
+        u'Pacific Standard Time': {
+            u'Display': u'(UTC-08:00) Pacific Time (US & Canada)',
+            u'Std': u'Pacific Standard Time',
+            u'Dlt': u'Pacific Daylight Time',
+            u'TZI': pacific_tzi,
+            u'Dynamic DST': {
+                u'FirstEntry': 2006,
+                u'LastEntry': 2007,
+                u'2006': pacific_2006_tzi,
+                u'2007': pacific_tzi,
+            },
+        },
+        u'Hawaiian Standard Time': {
+            u'Display': u'(UTC-10:00) Hawaii',
+            u'Std': u'Hawaiian Standard Time',
+            u'Dlt': u'Hawaiian Daylight Time',
+            u'TZI': struct.pack('3l8h8h', 600, 0, -60, *([0] * 16)),
+        },
+    }
+
+class TimeZoneDatabaseTest(unittest.TestCase):
+    # These tests don't use the registry, so they can also run off Windows.
+    def setUp(self):
+        self.database = win32timezone.TimeZoneDatabase(_test_zones())
+        self.previous = win32timezone.use_database(self.database)
+
+    def tearDown(self):
+        win32timezone.use_database(self.previous)
+
+    def _checkPacific(self, tz):
+        self.assertEqual(str(tz), '(UTC-08:00) Pacific Time (US & Canada)')
+        # DST ended on the last Sunday of October in 2006, and on the first
+        # Sunday of November from 2007.
+        hours = datetime.timedelta(hours=1)
+        self.assertEqual(tz.utcoffset(datetime.datetime(2006, 11, 2)), -8 * hours)
+        self.assertEqual(tz.utcoffset(datetime.datetime(2007, 11, 2)), -7 * hours)
+        self.assertEqual(tz.utcoffset(datetime.datetime(2007, 12, 2)), -8 * hours)
+
+    def testTimeZoneInfo(self):
+        self._checkPacific(win32timezone.TimeZoneInfo('Pacific Standard Time'))
+        hawaii = win32timezone.TimeZoneInfo('Hawaiian Standard Time')
+        self.assertEqual(hawaii.utcoffset(datetime.datetime(2007, 7, 1)),
+                         datetime.timedelta(hours=-10))
+        self.assertEqual(getattr(hawaii, 'dynamicInfo', None), None)
+        self.assertRaises(ValueError, win32timezone.TimeZoneInfo, 'Nowhere Standard Time')
+        names = [tz.timeZoneName for tz in win32timezone.TimeZoneInfo.get_all_time_zones()]
+        self.assertEqual(names, ['Hawaiian Standard Time', 'Pacific Standard Time'])
+
+    def testSaveAndLoad(self):
+        fd, filename = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            self.database.save(filename)
+            database = win32timezone.TimeZoneDatabase.load(filename)
+        finally:
+            os.remove(filename)
+        self.assertEqual(database.subkeys(), self.database.subkeys())
+        tz = win32timezone.TimeZoneInfo('Pacific Standard Time')
+        win32timezone.use_database(database)
+        loaded = win32timezone.TimeZoneInfo('Pacific Standard Time')
+        self.assertEqual(loaded, tz)
+        self._checkPacific(loaded)
+
+    def testFindByStdName(self):
+        # the "Std" names are localized, unlike the key names
+        zones = _test_zones()
+        zones[u'W. Europe Standard Time'] = {
+            u'Display': u'(UTC+01:00) Amsterdam, Berlin, Bern, Rom, Stockholm, Wien',
+            u'Std': u'Mitteleurop\xe4ische Zeit',
+            u'Dlt': u'Mitteleurop\xe4ische Sommerzeit',
+            u'TZI': struct.pack('3l8h8h', -60, 0, -60,
+                                0, 10, 0, 5, 3, 0, 0, 0, 0, 3, 0, 5, 2, 0, 0, 0),
+        }
+        fd, filename = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            win32timezone.TimeZoneDatabase(zones).save(filename)
+            database = win32timezone.TimeZoneDatabase.load(filename)
+        finally:
+            os.remove(filename)
+        win32timezone.use_database(database)
+        tz = win32timezone.TimeZoneInfo(u'Mitteleurop\xe4ische Zeit')
+        self.assertEqual(tz.displayName, zones[u'W. Europe Standard Time'][u'Display'])
+        self.assertEqual(tz.utcoffset(datetime.datetime(2011, 7, 1)),
+                         datetime.timedelta(hours=2))
+        # only that time zone has been read from the file
+        self.assertEqual(database.key_names_by_std()[u'Pacific Standard Time'],
+                         u'Pacific Standard Time')
+        self.failUnless(isinstance(database._zones[u'Pacific Standard Time'], tuple))
+        self.failIf(isinstance(database._zones[u'W. Europe Standard Time'], tuple))
+
+    def testLoadOther(self):
+        fd, filename = tempfile.mkstemp()
+        os.write(fd, 'not a database\n'.encode('ascii'))
+        os.close(fd)
+        try:
+            self.assertRaises(ValueError, win32timezone.TimeZoneDatabase.load, filename)
+        finally:
+            os.remove(filename)
+
+    def testInstanceCache(self):
+        first = win32timezone.TimeZoneInfo('Pacific Standard Time')
+        second = win32timezone.TimeZoneInfo('Pacific Standard Time', True)
+        self.failIf(first is second)
+        self.failUnless(first.staticInfo is second.staticInfo)
+        self.failUnless(first._getTransitions(2011) is second._getTransitions(2011))
+        self.assertEqual(second.utcoffset(datetime.datetime(2011, 7, 1)),
+                         datetime.timedelta(hours=-8))
+        win32timezone.TimeZoneInfo.clear_cache()
+        third = win32timezone.TimeZoneInfo('Pacific Standard Time')
+        self.failIf(third.staticInfo is first.staticInfo)
+        self.assertEqual(third, first)
+
+class _UTC(datetime.tzinfo):
+    def utcoffset(self, dt):
+        return datetime.timedelta(0)
+    def dst(self, dt):
+        return datetime.timedelta(0)
+
+def _seconds(dt):
+    delta = dt - datetime.datetime(1970, 1, 1)
+    return delta.days * 86400 + delta.seconds
+
+def _datetime(seconds):
+    return datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=seconds)
+
+class TimestampConversionTest(unittest.TestCase):
+    # Compare the bulk conversions with converting one datetime at a time, in
+    # a northern, a southern and a fixed time zone, around their changeovers.
+    def setUp(self):
+        zones = _test_zones()
+        zones[u'AUS Eastern Standard Time'] = {
+            u'Display': u'(UTC+10:00) Canberra, Melbourne, Sydney',
+            u'Std': u'AUS Eastern Standard Time',
+            u'Dlt': u'AUS Eastern Daylight Time',
+            u'TZI': struct.pack('3l8h8h', -600, 0, -60,
+                                0, 4, 0, 1, 3, 0, 0, 0, 0, 10, 0, 1, 2, 0, 0, 0),
+        }
+        self.previous = win32timezone.use_database(win32timezone.TimeZoneDatabase(zones))
+        self.zones = [win32timezone.TimeZoneInfo(name) for name in sorted(zones)]
+        quarter_hours = range(-12 * 3600, 12 * 3600 + 1, 900)
+        timestamps = set()
+        for tz in self.zones:
+            for year in (2006, 2007, 2011):
+                timestamps.add(_seconds(datetime.datetime(year, 1, 1)))
+                if tz.staticInfo.daylight_start.month:
+                    for changeover in (tz.GetDSTStartTime(year), tz.GetDSTEndTime(year)):
+                        start = _seconds(changeover)
+                        timestamps.update([start + offset for offset in quarter_hours])
+        self.timestamps = sorted(timestamps)
+
+    def tearDown(self):
+        win32timezone.use_database(self.previous)
+
+    def _expectedUTC(self, tz):
+        return [_seconds(_datetime(t) - tz.utcoffset(_datetime(t))) for t in self.timestamps]
+
+    def _expectedLocal(self, tz):
+        utc = _UTC()
+        return [_seconds(_datetime(t).replace(tzinfo=utc).astimezone(tz).replace(tzinfo=None))
+                for t in self.timestamps]
+
+    def testLists(self):
+        utc = _UTC()
+        for tz in self.zones:
+            self.assertEqual(tz.local_to_utc_timestamps(self.timestamps), self._expectedUTC(tz))
+            self.assertEqual(tz.utc_to_local_timestamps(self.timestamps), self._expectedLocal(tz))
+            for other in self.zones:
+                # Go through UTC, as astimezone leaves times in the same zone alone.
+                expected = [_seconds(_datetime(t).replace(tzinfo=tz).astimezone(utc)
+                                     .astimezone(other).replace(tzinfo=None))
+                            for t in self.timestamps]
+                self.assertEqual(tz.convert_timestamps(self.timestamps, other), expected)
+
+    def testArrays(self):
+        values = array.array('d', self.timestamps)
+        for tz in self.zones:
+            result = tz.local_to_utc_timestamps(values)
+            self.assertEqual(result.typecode, 'd')
+            self.assertEqual(result.tolist(), self._expectedUTC(tz))
+            result = tz.utc_to_local_timestamps(values)
+            self.assertEqual(result.tolist(), self._expectedLocal(tz))
+
+    def testNumPy(self):
+        try:
+            import numpy
+        except ImportError:
+            return  # numpy is optional
+        for tz in self.zones:
+            expected_utc = numpy.array(self._expectedUTC(tz), dtype='i8')
+            expected_local = numpy.array(self._expectedLocal(tz), dtype='i8')
+            for dtype in ('i8', 'f8'):
+                values = numpy.array(self.timestamps, dtype=dtype)
+                self.assertEqual(tz.local_to_utc_timestamps(values).tolist(), expected_utc.tolist())
+                self.assertEqual(tz.utc_to_local_timestamps(values).tolist(), expected_local.tolist())
+            # datetime64 arrays keep their unit, and NaT.
+            for unit, scale in (('s', 1), ('ms', 1000), ('us', 1000000)):
+                dtype = 'datetime64[%s]' % unit
+                values = (numpy.array(self.timestamps + [0], dtype='i8') * scale).view(dtype)
+                values[-1] = numpy.datetime64('NaT')
+                result = tz.local_to_utc_timestamps(values)
+                self.assertEqual(result.dtype, values.dtype)
+                self.assertTrue(numpy.isnat(result[-1]) if hasattr(numpy, 'isnat')
+                                else result[-1:].view('i8')[0] == numpy.iinfo('i8').min)
+                self.assertEqual((result[:-1].view('i8') // scale).tolist(), expected_utc.tolist())
+                result = tz.utc_to_local_timestamps(values)
+                self.assertEqual((result[:-1].view('i8') // scale).tolist(), expected_local.tolist())
+
 if __name__ == '__main__':
     unittest.main()